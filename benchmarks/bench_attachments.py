@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from lxml import etree
+
+from benchmarks import bench_migrate, generator
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.fake_jira import FakeJira, attachment_content
+from jira2github.attachments import ContentsBody
+from tests import test_attachments
+
+
+def build(xml_path, github, jira, destination, concurrency):
+    jira_to_github = bench_migrate.build(xml_path, github.url, 'rest', concurrency)
+    jira_to_github.set_custom_jira_message(None)
+    jira_to_github.set_jira_config(jira.url, 'user', 'password')
+    jira_to_github.set_attachments(destination, None, concurrency)
+    return jira_to_github
+
+
+##
+# Add a large attachment to the first item of an export
+#
+def add_large_attachment(xml_path, size):
+    tree = etree.parse(xml_path)
+    item = tree.getroot().find('channel/item')
+    attachments = item.find('attachments')
+    if attachments is None:
+        attachments = etree.SubElement(item, 'attachments')
+    etree.SubElement(attachments, 'attachment', id='large', name='large.log', size=str(size))
+    tree.write(xml_path, encoding='utf-8')
+
+
+##
+# Uploaded contents by file name, from the branch or the release assets
+#
+def uploads(server, destination):
+    if destination == 'release':
+        return {name.split('-', 1)[1]: content for (_, name), content in server.assets.items()}
+
+    return {path.rsplit('/', 1)[1]: content for path, content in server.branches['jira-attachments'].items()}
+
+
+##
+# Migrate the attachments and issues of an export, checking that each
+# distinct file is uploaded once with its content, that issues link to
+# their attachments, that a second run transfers nothing and that a run
+# without the store of the previous ones uploads nothing again
+#
+def measure(xml_path, destination, concurrency):
+    with FakeJira(xml_path) as jira, FakeGitHub() as github:
+        jira_to_github = build(xml_path, github, jira, destination, concurrency)
+        attachments = test_attachments.attachments_of(jira_to_github)
+        distinct = set(attachments.values())
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            jira_to_github.milestones()
+            jira_to_github.labels()
+            jira_to_github.attachments()
+            elapsed = time.perf_counter() - start
+            jira_to_github.migrate()
+
+        uploaded = test_attachments.check_uploads(github, jira_to_github, destination)
+        test_attachments.check_links(github, jira_to_github)
+        downloaded = jira.downloaded_bytes
+        jira_to_github.save_cache_data()
+        test_attachments.check_resumed(xml_path, github, jira, destination, jira_to_github.cache_path, uploaded)
+
+    return {
+        'destination': destination,
+        'attachments': len(attachments),
+        'distinct': len(distinct),
+        'downloaded_mb': downloaded / 1024 / 1024,
+        'uploaded_mb': sum(len(content) for content in uploaded.values()) / 1024 / 1024,
+        'seconds': elapsed,
+    }
+
+
+##
+# Peak memory of downloading a large attachment and of encoding it into
+# a contents api request body
+#
+def measure_memory(xml_path, size):
+    with FakeJira(xml_path) as jira, FakeGitHub() as github:
+        jira_to_github = build(xml_path, github, jira, 'branch', 1)
+
+        tracemalloc.start()
+        path, digest = jira_to_github._download_attachment('large', 'large.log')
+        download_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        try:
+            body = ContentsBody(path, jira_to_github.STREAM_CHUNK_SIZE, {'message': 'm', 'branch': 'b'})
+            length = sum(len(chunk) for chunk in body)
+            encode_peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            os.remove(path)
+
+        assert digest == hashlib.sha256(attachment_content('large.log', size)).hexdigest()
+        assert length == len(body)
+
+    return download_peak / 1024 / 1024, encode_peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the migration of Jira attachments.')
+    generator.add_arguments(parser, items=200)
+    parser.add_argument('--concurrency', type=int, default=4, help='Attachments transferred concurrently')
+    parser.add_argument('--large-size', type=int, default=64, help='Size in MB of a large attachment')
+    parser.set_defaults(attachments=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, **generator.options(args))
+        for destination in ['branch', 'release']:
+            result = measure(xml_path, destination, args.concurrency)
+            print('{destination:>7}: {attachments} attachments, {distinct} distinct, {downloaded_mb:.1f} MB '
+                  'downloaded, {uploaded_mb:.1f} MB uploaded in {seconds:.2f}s'.format(**result))
+
+        size = args.large_size * 1024 * 1024
+        add_large_attachment(xml_path, size)
+        download_peak, encode_peak = measure_memory(xml_path, size)
+        print('{} MB attachment: peak memory {:.1f} MB downloading, {:.1f} MB encoding'.format(
+            args.large_size, download_peak, encode_peak
+        ))
+
+
+if __name__ == '__main__':
+    main()
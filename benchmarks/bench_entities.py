@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+import argparse
+import random
+import time
+
+import jira2github
+from benchmarks.generator import WORDS
+from tests import test_entities
+from tests.test_entities import SAMPLES, legacy_htmlentitydecode
+
+
+def bench(decode, texts):
+    start = time.perf_counter()
+    for text in texts:
+        decode(text)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark html entity decoding.')
+    parser.add_argument('--texts', type=int, default=20000, help='Number of texts to decode')
+    args = parser.parse_args()
+
+    jira_to_github = jira2github.jira2github(None, 'orga', 'repo', None, None, 'token')
+    test_entities.test_legacy_parity()
+
+    # Description sized paragraphs with a few entities
+    rng = random.Random(42)
+    texts = [
+        '<p>{}</p>\n{}'.format(' '.join(rng.choice(WORDS) for _ in range(100)), SAMPLES[i % len(SAMPLES)])
+        for i in range(args.texts)
+    ]
+    legacy = bench(legacy_htmlentitydecode, texts)
+    current = bench(jira_to_github.htmlentitydecode, texts)
+
+    print('   legacy: {:.1f} us/text'.format(legacy / args.texts * 1e6))
+    print('  current: {:.1f} us/text'.format(current / args.texts * 1e6))
+    print('  speedup: {:.1f}x'.format(legacy / current))
+
+
+if __name__ == '__main__':
+    main()
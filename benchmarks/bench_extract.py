@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import generator
+
+
+##
+# Run a single extraction and print its metrics, used in a child process
+# so that peak RSS is measured per mode
+#
+def run_child(mode, xml_path):
+    import jira2github
+
+    jira_to_github = jira2github.jira2github(xml_path, 'orga', 'repo', None, None, 'token')
+    jira_to_github.set_custom_github_message(None)
+    jira_to_github.set_custom_comment_github_message(None)
+    jira_to_github.set_streaming(mode == 'streaming')
+
+    start = time.perf_counter()
+    jira_to_github.extract()
+    elapsed = time.perf_counter() - start
+
+    issues = sum(len(p['Issues']) for p in jira_to_github.projects.values())
+    print(json.dumps({
+        'mode': mode,
+        'issues': issues,
+        'seconds': elapsed,
+        'items_per_second': issues / elapsed if elapsed else 0,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+##
+# Measure extraction of an export in a fresh process
+#
+def measure(mode, xml_path):
+    output = subprocess.check_output(
+        [sys.executable, '-m', 'benchmarks.bench_extract', '--child', mode, xml_path],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+##
+# Projects content independent of the objects, to compare extractions
+#
+def fingerprint(projects):
+    return {
+        proj: (
+            dict(project['Milestones']),
+            dict(project['Components']),
+            dict(project['Labels']),
+            [(record.key, record.labels, record.milestone_name, len(record.comments)) for record in project['Issues']],
+        )
+        for proj, project in projects.items()
+    }
+
+
+##
+# Split items into overlapping exports written into a directory, as Jira
+# caps each export at 1000 items
+#
+def generate_exports(directory, exports, overlap, **options):
+    os.makedirs(directory)
+    size = options['items'] // exports
+    for index in range(exports):
+        start = max(index * size - overlap, 0)
+        generator.generate_file(
+            os.path.join(directory, 'export-{:03d}.xml'.format(index)),
+            **dict(options, items=(index + 1) * size - start, start=start, seed=options['seed'] + index)
+        )
+
+    return exports * size
+
+
+##
+# Extract a directory of exports with a number of parse processes
+#
+def measure_exports(directory, workers, streaming=False):
+    import jira2github
+
+    jira_to_github = jira2github.jira2github(directory, 'orga', 'repo', None, None, 'token')
+    jira_to_github.set_custom_github_message(None)
+    jira_to_github.set_custom_comment_github_message(None)
+    jira_to_github.set_streaming(streaming)
+    jira_to_github.set_parse_workers(workers)
+
+    start = time.perf_counter()
+    jira_to_github.extract()
+    elapsed = time.perf_counter() - start
+
+    issues = sum(len(p['Issues']) for p in jira_to_github.projects.values())
+    return {
+        'workers': workers,
+        'issues': issues,
+        'seconds': elapsed,
+        'items_per_second': issues / elapsed if elapsed else 0,
+        'fingerprint': fingerprint(jira_to_github.projects),
+    }
+
+
+def report(result):
+    print('{mode:>10}: {issues} issues in {seconds:.2f}s ({items_per_second:.0f} items/s), '
+          'peak RSS {peak_rss_mb:.1f} MB'.format(**result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark xml extraction modes.')
+    generator.add_arguments(parser, items=20000)
+    parser.add_argument('--exports', type=int, default=8, help='Number of overlapping exports parsed in parallel')
+    parser.add_argument('--overlap', type=int, default=100, help='Items repeated from the previous export')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='Parse processes')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'XML_PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(*args.child)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, **generator.options(args))
+        print('Export size: {:.1f} MB'.format(os.path.getsize(xml_path) / 1024 / 1024))
+
+        for mode in ['full', 'streaming']:
+            report(measure(mode, xml_path))
+
+        # Every number of processes must give the same projects, without the
+        # items repeated by overlapping exports
+        directory = os.path.join(tmp, 'exports')
+        items = generate_exports(directory, args.exports, args.overlap, **generator.options(args))
+        print('{} exports of {} items, {} overlapping'.format(args.exports, items // args.exports, args.overlap))
+        expected = None
+        for workers in args.workers:
+            result = measure_exports(directory, workers)
+            assert result['issues'] == items, (result['issues'], items)
+            expected = expected or result['fingerprint']
+            assert result['fingerprint'] == expected, 'extraction depends on the number of processes'
+            print('{workers:>3} processes: {issues} issues in {seconds:.2f}s ({items_per_second:.0f} items/s)'.format(
+                **result
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import tempfile
+import time
+
+import jira2github
+from benchmarks import bench_migrate, generator
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.fake_jira import FakeJira
+from tests import test_jira
+
+
+def build(jira_url, api_url, page_size, jira_concurrency, concurrency):
+    jira_to_github = jira2github.jira2github(None, 'orga', 'repo', None, None, 'token')
+    jira_to_github.set_cache_path(os.path.join(
+        tempfile.gettempdir(),
+        'cache-jira-{}-{}.json'.format(jira_concurrency, time.time()),
+    ))
+    jira_to_github.set_github_api_url(api_url)
+    jira_to_github.set_concurrency(concurrency)
+    jira_to_github.set_http_config(max(10, concurrency), None, None)
+    jira_to_github.set_rate_limit(float('inf'), max(concurrency, 1))
+    jira_to_github.set_aliases_path(None)
+    jira_to_github.set_custom_github_message(None)
+    jira_to_github.set_custom_comment_github_message(None)
+    jira_to_github.set_custom_jira_message(None)
+    jira_to_github.set_jira_config(jira_url, 'user', 'password')
+    jira_to_github.set_jira_source('order by key', page_size, jira_concurrency)
+
+    return jira_to_github
+
+
+##
+# Created issues by title, with milestone titles instead of numbers since
+# milestones are created in a different order when fetching from Jira, and
+# links to the fake Jira replaced with the links of the generated export
+#
+def created_issues(server, jira_url=None):
+    def link(body):
+        return body.replace(jira_url, generator.JIRA_URL) if jira_url else body
+
+    milestones = {milestone['number']: title for title, milestone in server.milestones.items()}
+    return {
+        issue['title']: (
+            link(issue['body']),
+            sorted(issue['labels']),
+            milestones.get(issue['milestone']),
+            [link(comment) for comment in issue['comments']],
+        )
+        for issue in server.issues.values()
+    }
+
+
+##
+# Migrate issues fetched from a fake Jira, checking that GitHub ends up
+# with the same issues as when migrating the xml export
+#
+def measure(xml_path, expected, page_size=100, jira_concurrency=1, concurrency=1, latency=0.02):
+    with FakeJira(xml_path, latency=latency, max_results=page_size) as jira, FakeGitHub(latency=latency) as server:
+        jira_to_github = build(jira.url, server.url, page_size, jira_concurrency, concurrency)
+
+        start = time.perf_counter()
+        jira_to_github.extract()
+        jira_to_github.milestones()
+        jira_to_github.labels()
+        jira_to_github.migrate()
+        elapsed = time.perf_counter() - start
+
+        test_jira.check_migrated(jira, server, expected)
+
+    return {
+        'page_size': page_size,
+        'jira_concurrency': jira_concurrency,
+        'concurrency': concurrency,
+        'fetch_seconds': jira_to_github.metrics.phases['jira_fetch'],
+        'seconds': elapsed,
+        'issues_per_second': len(server.issues) / elapsed,
+    }
+
+
+##
+# Only fetch issues from a fake Jira
+#
+def measure_fetch(xml_path, page_size=100, jira_concurrency=1, latency=0.02):
+    with FakeJira(xml_path, latency=latency, max_results=page_size) as jira:
+        jira_to_github = build(jira.url, None, page_size, jira_concurrency, 1)
+
+        start = time.perf_counter()
+        jira_to_github.extract()
+        jira_to_github._join_jira()
+        elapsed = time.perf_counter() - start
+        test_jira.check_fetched(jira, jira_to_github)
+
+    items = len(jira.issues)
+
+    return {
+        'page_size': page_size,
+        'jira_concurrency': jira_concurrency,
+        'seconds': elapsed,
+        'items_per_second': items / elapsed,
+    }
+
+
+##
+# Migrate the xml export, giving the expected issues
+#
+def expected_issues(xml_path):
+    with FakeGitHub() as server:
+        jira_to_github = bench_migrate.build(xml_path, server.url, 'rest', 8)
+        jira_to_github.milestones()
+        jira_to_github.labels()
+        jira_to_github.migrate()
+
+        return created_issues(server)
+
+
+def report(result):
+    print('jira concurrency {jira_concurrency:>2}, concurrency {concurrency:>2}: fetched in {fetch_seconds:.2f}s, '
+          'migrated in {seconds:.2f}s ({issues_per_second:.0f} issues/s)'.format(**result))
+
+
+def report_fetch(result):
+    print('jira concurrency {jira_concurrency:>2}: fetched in {seconds:.2f}s ({items_per_second:.0f} items/s)'.format(
+        **result
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fetching issues from a fake Jira api.')
+    generator.add_arguments(parser, items=1000)
+    parser.add_argument('--latency', type=float, default=0.02, help='Fake apis latency in seconds')
+    parser.add_argument('--page-size', type=int, default=50, help='Issues per Jira search page')
+    parser.add_argument('--jira-concurrency', type=int, nargs='+', default=[1, 4, 8], help='Jira concurrency levels')
+    parser.add_argument('--concurrency', type=int, default=8, help='GitHub concurrency')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, **generator.options(args))
+        expected = expected_issues(xml_path)
+        report(measure(xml_path, expected, args.page_size, max(args.jira_concurrency), args.concurrency, args.latency))
+
+        for jira_concurrency in args.jira_concurrency:
+            report_fetch(measure_fetch(xml_path, args.page_size, jira_concurrency, args.latency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import argparse
+import random
+import re
+import time
+
+from benchmarks.generator import WORDS
+from jira2github.markup import JiraMarkup
+from tests import test_markup
+
+
+##
+# Naive conversion, one regex substitution per construct over the whole
+# text, not keeping code blocks verbatim
+#
+LEGACY_SUBSTITUTIONS = [
+    (r'\{code(?::([^}]*))?\}(.*?)\{code\}', lambda m: '```{}\n{}\n```'.format(m.group(1) or '', m.group(2)), re.S),
+    (r'\{noformat\}(.*?)\{noformat\}', r'```\n\1\n```', re.S),
+    (r'^h([1-6])\.\s*(.*)$', lambda m: '#' * int(m.group(1)) + ' ' + m.group(2), re.M),
+    (r'^bq\.\s*(.*)$', r'> \1', re.M),
+    (r'^\*\s+', '- ', re.M),
+    (r'^#\s+', '1. ', re.M),
+    (r'^----\s*$', '---', re.M),
+    (r'\[([^|\]]+)\|([^\]]+)\]', r'[\1](\2)', 0),
+    (r'\{\{(.+?)\}\}', r'`\1`', 0),
+    (r'(?<!\w)\*(\S.*?\S|\S)\*(?!\w)', r'**\1**', 0),
+    (r'(?<!\w)-(\S.*?\S|\S)-(?!\w)', r'~~\1~~', 0),
+    (r'(?<!\w)\+(\S.*?\S|\S)\+(?!\w)', r'<ins>\1</ins>', 0),
+    (r'(?<!\w)\^(\S.*?\S|\S)\^(?!\w)', r'<sup>\1</sup>', 0),
+    (r'(?<!\w)~(\S.*?\S|\S)~(?!\w)', r'<sub>\1</sub>', 0),
+    (r'\?\?(\S.*?\S|\S)\?\?', r'<cite>\1</cite>', 0),
+    (r'\{color(?::[^}]*)?\}', '', 0),
+    (r'^\|\|(.*)\|\|\s*$', lambda m: '| ' + m.group(1).replace('||', ' | ') + ' |', re.M),
+]
+
+
+def legacy_convert(text):
+    for pattern, replacement, flags in LEGACY_SUBSTITUTIONS:
+        text = re.sub(pattern, replacement, text, flags=flags)
+    return text
+
+
+##
+# Random comment sized bodies mixing every construct
+#
+def body(rng, paragraphs):
+    def sentence(words=15):
+        return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+    blocks = []
+    for _ in range(paragraphs):
+        blocks.append(rng.choice([
+            lambda: 'h2. ' + sentence(4),
+            lambda: '{} *{}* {} _{}_ {} [{}|http://example.com/{}]'.format(
+                sentence(), sentence(2), sentence(), sentence(2), sentence(), sentence(2), rng.randrange(1000)
+            ),
+            lambda: '\n'.join('* ' + sentence(6) for _ in range(4)),
+            lambda: '{{code:java}}\n{}\n{{code}}'.format('\n'.join('int *a* = b; // ' + sentence(5) for _ in range(5))),
+            lambda: '||A||B||C||\n' + '\n'.join('|{}|*{}*|{}|'.format(sentence(2), sentence(1), sentence(2))
+                                                for _ in range(4)),
+            lambda: 'bq. ' + sentence() + ' {{' + sentence(2) + '}}',
+        ])())
+
+    return '\n\n'.join(blocks)
+
+
+def bench(convert, texts, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            convert(text)
+    return (time.perf_counter() - start) / repeat
+
+
+def megabytes(texts):
+    return sum(len(text) for text in texts) / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Jira markup conversion.')
+    parser.add_argument('--texts', type=int, default=20000, help='Number of comment sized texts to convert')
+    parser.add_argument('--large-size', type=int, default=4, help='Size in MB of the largest single text')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    test_markup.test_golden()
+
+    markup = JiraMarkup()
+    rng = random.Random(args.seed)
+    texts = [body(rng, 4) for _ in range(args.texts)]
+    legacy = bench(legacy_convert, texts)
+    current = bench(markup.convert, texts)
+    print('comments: {} texts, {:.1f} MB'.format(len(texts), megabytes(texts)))
+    print('   legacy: {:.1f} us/text ({:.1f} MB/s)'.format(legacy / len(texts) * 1e6, megabytes(texts) / legacy))
+    print('  current: {:.1f} us/text ({:.1f} MB/s)'.format(current / len(texts) * 1e6, megabytes(texts) / current))
+    print('  speedup: {:.1f}x'.format(legacy / current))
+
+    # Conversion time must grow linearly with the size of a single text,
+    # including texts full of unbalanced markers
+    size = args.large_size * 1024 * 1024
+    large = '\n\n'.join(texts)
+    samples = {
+        'mixed': large,
+        'unbalanced': ' '.join('*a -b +c ^d ~e ??f {{g [h|i !j' for _ in range(size // 30)),
+        'long line': ' '.join(rng.choice(WORDS) + rng.choice(['*', '_', '-', '']) for _ in range(size // 6)),
+    }
+    for name, text in samples.items():
+        text = (text * (size // len(text) + 1))[:size]
+        rates = []
+        for fraction in [4, 2, 1]:
+            part = text[:len(text) // fraction]
+            rates.append(len(part) / 1024 / 1024 / bench(markup.convert, [part]))
+        print('{:>10}: {} MB/s'.format(name, ' '.join('{:.1f}'.format(rate) for rate in rates)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import tempfile
+import time
+
+import jira2github
+from benchmarks import generator
+from benchmarks.fake_github import FakeGitHub
+
+
+def build(xml_path, api_url, backend, concurrency, max_rate=float('inf')):
+    jira_to_github = jira2github.jira2github(xml_path, 'orga', 'repo', None, None, 'token')
+    jira_to_github.set_cache_path(os.path.join(
+        os.path.dirname(xml_path),
+        'cache-{}-{}-{}.json'.format(backend, concurrency, time.time()),
+    ))
+    jira_to_github.set_github_api_url(api_url)
+    jira_to_github.set_backend(backend)
+    jira_to_github.set_concurrency(concurrency)
+    jira_to_github.set_http_config(max(10, concurrency), None, None)
+    jira_to_github.set_rate_limit(max_rate, max(concurrency, 1))
+    jira_to_github.set_aliases_path(None)
+    jira_to_github.set_custom_github_message(None)
+    jira_to_github.set_custom_comment_github_message(None)
+    jira_to_github.extract()
+
+    return jira_to_github
+
+
+##
+# Check that every issue exists once with its comments in order
+#
+def verify(server, jira_to_github):
+    for proj, project in jira_to_github.projects.items():
+        for record in project['Issues']:
+            number = int(jira_to_github.cached_data[proj][record.key].rsplit('/', 1)[1])
+            created = server.issues[number]
+            comments = jira_to_github._render_comments(record)
+            assert created['title'] == record.title, record.key
+            assert set(created['labels']) <= set(server.labels), record.key
+            assert created['milestone'] == server.milestones[record.milestone_name]['number'], record.key
+            assert created['comments'] == [comment['body'] for comment in comments], record.key
+
+    assert len(server.issues) == sum(len(project['Issues']) for project in jira_to_github.projects.values())
+
+
+##
+# Run a whole migration against a fresh fake server and check its result
+#
+def measure(xml_path, backend='rest', concurrency=1, max_rate=float('inf'), **server_options):
+    with FakeGitHub(**server_options) as server:
+        jira_to_github = build(xml_path, server.url, backend, concurrency, max_rate)
+
+        start = time.perf_counter()
+        jira_to_github.milestones()
+        jira_to_github.labels()
+        jira_to_github.migrate()
+        elapsed = time.perf_counter() - start
+        verify(server, jira_to_github)
+
+    return {
+        'backend': backend,
+        'concurrency': concurrency,
+        'requests': server.requests,
+        'rejected': server.rejected,
+        'seconds': elapsed,
+        'requests_per_second': server.requests / elapsed,
+        'issues_per_second': len(server.issues) / elapsed,
+    }
+
+
+def report(result):
+    print('{backend:>6} concurrency {concurrency:>3}: {requests} requests ({rejected} rate limited) in '
+          '{seconds:.2f}s ({requests_per_second:.0f} requests/s, {issues_per_second:.0f} issues/s)'.format(**result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark migrate() throughput against a fake GitHub api.')
+    generator.add_arguments(parser, items=200)
+    parser.add_argument('--latency', type=float, default=0.02, help='Fake api latency in seconds')
+    parser.add_argument('--rate-limit', type=int, help='Fake api requests allowed per hour')
+    parser.add_argument('--secondary-limit', type=int, help='Fake api POST requests allowed per minute')
+    parser.add_argument('--max-request-rate', type=float, default=float('inf'), help='Client requests per second')
+    parser.add_argument('--backend', choices=['rest', 'import'], default='rest', help='Migration backend')
+    parser.add_argument('--import-delay', type=float, default=0, help='Seconds before a fake import is done')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8], help='Concurrency levels')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, **generator.options(args))
+
+        for concurrency in args.concurrency:
+            report(measure(
+                xml_path,
+                args.backend,
+                concurrency,
+                args.max_request_rate,
+                latency=args.latency,
+                rate_limit=args.rate_limit,
+                secondary_limit=args.secondary_limit,
+                import_delay=args.import_delay,
+            ))
+
+
+if __name__ == '__main__':
+    main()
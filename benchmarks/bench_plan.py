@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import jira2github
+from benchmarks import generator
+from benchmarks.fake_github import FakeGitHub
+
+
+def build(xml_path, cache_path, api_url, concurrency, window, tokens):
+    jira_to_github = jira2github.jira2github(
+        xml_path, 'orga', 'repo', None, None, ['token-{}'.format(i) for i in range(tokens)]
+    )
+    jira_to_github.GITHUB_RATE_LIMIT_WINDOW = window
+    jira_to_github.set_cache_path(cache_path)
+    jira_to_github.set_github_api_url(api_url)
+    jira_to_github.set_concurrency(concurrency)
+    jira_to_github.set_http_config(max(10, concurrency), None, None)
+    jira_to_github.set_rate_limit(float('inf'), max(concurrency, 1))
+    jira_to_github.set_aliases_path(None)
+    jira_to_github.set_custom_github_message(None)
+    jira_to_github.set_custom_comment_github_message(None)
+    jira_to_github.extract()
+
+    return jira_to_github
+
+
+##
+# Migrate the first project, plan the migration of the others, then
+# migrate them, comparing the planned requests and time with the
+# requests received by the fake api and the measured time
+#
+def measure(xml_path, tmp, concurrency, rate_limit, window, tokens, latency):
+    cache_path = os.path.join(tmp, 'cache-plan-{}.json'.format(time.time()))
+    with FakeGitHub(latency=latency, rate_limit=rate_limit, rate_limit_window=window) as server:
+        jira_to_github = build(xml_path, cache_path, server.url, concurrency, window, tokens)
+        first = next(iter(jira_to_github.projects))
+        jira_to_github.projects = {first: jira_to_github.projects[first]}
+        with contextlib.redirect_stdout(io.StringIO()):
+            jira_to_github.milestones()
+            jira_to_github.labels()
+            jira_to_github.migrate()
+        jira_to_github.save_cache_data()
+
+        jira_to_github = build(xml_path, cache_path, server.url, concurrency, window, tokens)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            plan = jira_to_github.plan()
+
+        # Requests rejected by the rate limit are retried, only accepted ones count
+        posts = server.method_requests.get('POST', 0) - server.rejected
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            jira_to_github.milestones()
+            jira_to_github.labels()
+            jira_to_github.migrate()
+        elapsed = time.perf_counter() - start
+        posts = server.method_requests['POST'] - server.rejected - posts
+
+        assert posts == plan['requests'], (posts, plan['requests'])
+
+    return {
+        'tokens': tokens,
+        'concurrency': concurrency,
+        'requests': plan['requests'],
+        'planned_seconds': plan['seconds'],
+        'seconds': elapsed,
+        'output': output.getvalue(),
+    }
+
+
+def report(result):
+    print('{tokens} tokens, concurrency {concurrency}: {requests} requests planned in {planned_seconds:.1f}s, '
+          'done in {seconds:.1f}s ({error:+.0%})'.format(
+              error=result['planned_seconds'] / result['seconds'] - 1,
+              **result
+          ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare migration plans with the actual migration.')
+    generator.add_arguments(parser, items=400)
+    parser.add_argument('--latency', type=float, default=0.01, help='Fake api latency in seconds')
+    parser.add_argument('--rate-limit', type=int, default=200, help='Requests per rate limit window and token')
+    parser.add_argument('--window', type=int, default=10, help='Rate limit window in seconds')
+    parser.add_argument('--tokens', type=int, nargs='+', default=[1, 2], help='Numbers of tokens')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrency')
+    parser.set_defaults(projects=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, **generator.options(args))
+        for tokens in args.tokens:
+            result = measure(xml_path, tmp, args.concurrency, args.rate_limit, args.window, tokens, args.latency)
+            print(result['output'])
+            report(result)
+
+
+if __name__ == '__main__':
+    main()
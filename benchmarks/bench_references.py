@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+
+import jira2github
+from benchmarks import generator
+from benchmarks.generator import WORDS
+from tests import test_references
+
+
+##
+# Previous approach, one regex substitution per migrated key
+#
+def legacy_rewrite(text, references):
+    for key, reference in references.items():
+        text = re.sub(r'\b{}\b'.format(re.escape(key)), reference, text)
+    return text
+
+
+##
+# Texts mentioning a few of the keys, and keys which were not migrated
+#
+def texts(rng, keys, count):
+    def sentence(words=20):
+        return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+    return [
+        '{} {} {}, see also OTHER-{} and {}'.format(
+            sentence(), rng.choice(keys), sentence(), rng.randrange(1000), rng.choice(keys)
+        )
+        for _ in range(count)
+    ]
+
+
+def bench(rewrite, texts, references):
+    start = time.perf_counter()
+    for text in texts:
+        rewrite(text, references)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rewriting Jira keys into GitHub issue references.')
+    generator.add_arguments(parser, items=200)
+    parser.add_argument('--texts', type=int, default=10000, help='Number of texts to rewrite')
+    parser.add_argument('--keys', type=int, nargs='+', default=[100, 1000, 10000, 100000, 500000],
+                        help='Numbers of migrated keys')
+    parser.add_argument('--legacy-keys', type=int, default=1000, help='Largest number of keys for the legacy approach')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrency of the rewrite')
+    args = parser.parse_args()
+
+    test_references.test_golden()
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, **generator.options(args))
+        print('Rewrote {} issues and comments'.format(
+            test_references.rewrite_migration(xml_path, args.concurrency)
+        ))
+
+    jira_to_github = jira2github.jira2github(None, 'orga', 'repo', None, None, 'token')
+    rng = random.Random(args.seed)
+    for count in args.keys:
+        keys = ['PROJ-{}'.format(i + 1) for i in range(count)]
+        references = {key: '#{}'.format(i + 1) for i, key in enumerate(keys)}
+        sample = texts(rng, keys, args.texts)
+        current = bench(jira_to_github._rewrite_references, sample, references)
+        line = '{:>7} keys: {:.1f} us/text'.format(count, current / len(sample) * 1e6)
+        if count <= args.legacy_keys:
+            legacy = bench(legacy_rewrite, sample[:100], references) * len(sample) / 100
+            line += ', legacy {:.1f} us/text ({:.0f}x)'.format(legacy / len(sample) * 1e6, legacy / current)
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from benchmarks import bench_migrate, generator
+from benchmarks.fake_github import FakeGitHub
+from tests import test_retry
+
+
+def build(xml_path, server, concurrency, errors_path, backoff):
+    jira_to_github = bench_migrate.build(xml_path, server.url, 'rest', concurrency)
+    jira_to_github.errors_path = errors_path
+    jira_to_github.RETRY_BACKOFF = backoff
+    return jira_to_github
+
+
+##
+# Migrate with injected failures, then retry the recorded errors, checking
+# that only transient errors are retried, that the errors file keeps the
+# remaining errors with their attempts, and that the retry lasts in
+# proportion of the failures rather than of the whole migration
+#
+def measure(xml_path, tmp, concurrency, failures, backoff, seed):
+    errors_path = os.path.join(tmp, 'errors-{}.json'.format(time.time()))
+    with FakeGitHub() as server:
+        jira_to_github = build(xml_path, server, concurrency, errors_path, backoff)
+        keys = sorted(record.key for project in jira_to_github.projects.values() for record in project['Issues'])
+        failed, invalid, lasting = test_retry.inject_failures(server, keys, failures, seed)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            jira_to_github.milestones()
+            jira_to_github.labels()
+            jira_to_github.migrate()
+            jira_to_github.save_errors_data()
+        migrate_seconds = time.perf_counter() - start
+        jira_to_github.save_cache_data()
+        assert len(server.issues) == len(keys) - len(failed), len(server.issues)
+
+        jira_to_github = build(xml_path, server, concurrency, errors_path, backoff)
+        posts = server.method_requests['POST']
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            jira_to_github.milestones()
+            jira_to_github.labels()
+            jira_to_github.retry_errors()
+            jira_to_github.save_errors_data()
+        retry_seconds = time.perf_counter() - start
+        posts = server.method_requests['POST'] - posts
+
+        test_retry.check_retried(server, jira_to_github, keys, invalid, lasting)
+
+    return {
+        'issues': len(keys),
+        'failures': failures,
+        'posts': posts,
+        'migrate_seconds': migrate_seconds,
+        'retry_seconds': retry_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark retrying the issues recorded in the errors file.')
+    generator.add_arguments(parser, items=500)
+    parser.add_argument('--failures', type=int, nargs='+', default=[10, 50], help='Numbers of failed issues')
+    parser.add_argument('--backoff', type=float, default=0.05, help='Backoff of the first retry round in seconds')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrency')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, **generator.options(args))
+        for failures in args.failures:
+            result = measure(xml_path, tmp, args.concurrency, failures, args.backoff, args.seed)
+            print('{failures}/{issues} failed issues: migrated in {migrate_seconds:.2f}s, '
+                  'retried with {posts} requests in {retry_seconds:.2f}s'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import time
+
+import requests
+
+import jira2github
+from benchmarks.fake_github import FakeGitHub
+
+
+##
+# Previous behaviour: a new connection for every request
+#
+class unpooled_jira2github(jira2github.jira2github):
+
+    def _send_request(self, method, url, data, headers):
+        return requests.request(
+            method,
+            url,
+            data=data,
+            headers=dict(self.session.headers, **(headers or {})),
+            timeout=self.http_timeout,
+        )
+
+
+def run(cls, api_url, count):
+    jira_to_github = cls(None, 'orga', 'repo', None, None, 'token')
+    jira_to_github.set_github_api_url(api_url)
+    jira_to_github.set_rate_limit(float('inf'), count)
+
+    body = json.dumps({'title': 'Title', 'body': 'Body'})
+    start = time.perf_counter()
+    for _ in range(count):
+        jira_to_github._execute_request(jira_to_github.METHOD_POST, jira_to_github.github_url + '/issues', body)
+
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark GitHub request latency with and without pooling.')
+    parser.add_argument('--requests', type=int, default=1000, help='Number of requests')
+    args = parser.parse_args()
+
+    with FakeGitHub() as server:
+        unpooled = run(unpooled_jira2github, server.url, args.requests)
+        pooled = run(jira2github.jira2github, server.url, args.requests)
+
+    print('  unpooled: {:.3f} ms/request'.format(unpooled * 1000))
+    print('    pooled: {:.3f} ms/request'.format(pooled * 1000))
+    print('     saved: {:.3f} ms/request'.format((unpooled - pooled) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+import argparse
+import base64
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+##
+# Minimal stand-in for the GitHub issues api, recording created issues
+# and comments so the migration result can be checked
+#
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+
+        # Conditional GET, 304 responses not counting against the rate limit
+        etag = None
+        if self.command == 'GET' and status == 200:
+            etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+            if self.headers.get('If-None-Match') == etag:
+                self.server.not_modified(self._token())
+                status = 304
+                body = b''
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        for name, value in self.server.rate_limit_headers(self._token()).items():
+            self.send_header(name, value)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _token(self):
+        return self.headers.get('Authorization')
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'null')
+
+    ##
+    # Count the request, apply latency and rate limits, returning False
+    # when the request has been rejected
+    #
+    def _begin(self, method):
+        time.sleep(self.server.latency)
+        rejected = self.server.check_limits(method, self._token())
+        if rejected is None:
+            return True
+
+        status, message, headers = rejected
+        self._send_json(status, {'message': message}, headers)
+        return False
+
+    ##
+    # Send one page of a list, with a Link header to the next page
+    #
+    def _send_page(self, items):
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        per_page = int(query.get('per_page', 30))
+        page = int(query.get('page', 1))
+        headers = {}
+        if page * per_page < len(items):
+            query['page'] = page + 1
+            headers['Link'] = '<{}{}?{}>; rel="next"'.format(self.server.url, url.path, urlencode(query))
+
+        self._send_json(200, items[(page - 1) * per_page:page * per_page], headers)
+
+    def do_GET(self):
+        if not self._begin('GET'):
+            return
+
+        path = urlsplit(self.path).path
+        if path.endswith('/import/issues'):
+            self.server.import_polls += 1
+            return self._send_json(200, self.server.list_imports())
+
+        if path.endswith('/milestones'):
+            return self._send_page(self.server.list('milestones'))
+
+        if path.endswith('/labels'):
+            return self._send_page(self.server.list('labels'))
+
+        if path.endswith('/issues'):
+            return self._send_page(self.server.list_issues())
+
+        if path.endswith('/issues/comments'):
+            return self._send_page(self.server.list_comments())
+
+        if path.endswith('/rate_limit'):
+            return self._send_json(200, {'resources': {'core': self.server.rate_limit_status(self._token())}})
+
+        match = re.search(r'/contents/(.+)$', path)
+        if match:
+            ref = parse_qs(urlsplit(self.path).query).get('ref', ['main'])[-1]
+            found = self.server.get_file(unquote(match.group(1)), ref)
+            if found is None:
+                return self._send_json(404, {'message': 'Not Found'})
+            return self._send_json(200, found)
+
+        match = re.search(r'/repos/[^/]+/[^/]+(?:/(branches|git/ref/heads|releases/tags)/(.+))?$', path)
+        if match:
+            found = self.server.get_ref(match.group(1), unquote(match.group(2) or ''))
+            if found is None:
+                return self._send_json(404, {'message': 'Not Found'})
+            return self._send_json(200, found)
+
+        self._send_json(200, [])
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        match = re.search(r'/releases/(\d+)/assets$', url.path)
+        if match:
+            return self._upload_asset(int(match.group(1)), parse_qs(url.query)['name'][-1])
+
+        data = self._read_json()
+        if not self._begin('POST'):
+            return
+
+        if self.path.endswith('/git/refs'):
+            created = self.server.create_branch(data)
+            if created is None:
+                return self._send_json(422, {'message': 'Reference already exists'})
+            return self._send_json(201, created)
+
+        if self.path.endswith('/releases'):
+            return self._send_json(201, self.server.create_release(data))
+
+        if self.path.endswith('/labels'):
+            return self._send_json(201, self.server.create_label(data))
+
+        if self.path.endswith('/milestones'):
+            milestone = self.server.create_milestone(data)
+            if milestone is None:
+                return self._send_json(422, {'message': 'Validation Failed'})
+            return self._send_json(201, milestone)
+
+        if self.path.endswith('/import/issues'):
+            return self._send_json(202, self.server.import_issue(data))
+
+        if self.path.endswith('/issues'):
+            status = self.server.injected_failure(data['title'])
+            if status is not None:
+                return self._send_json(status, {'message': 'Injected failure'})
+            return self._send_json(201, self.server.create_issue(data))
+
+        match = re.search(r'/issues/(\d+)/comments$', self.path)
+        if match:
+            comment = self.server.create_comment(int(match.group(1)), data)
+            if comment is None:
+                return self._send_json(404, {'message': 'Not Found'})
+            return self._send_json(201, comment)
+
+        self._send_json(404, {'message': 'Not Found'})
+
+    def do_PUT(self):
+        data = self._read_json()
+        if not self._begin('PUT'):
+            return
+
+        match = re.search(r'/contents/(.+)$', urlsplit(self.path).path)
+        if match is None:
+            return self._send_json(404, {'message': 'Not Found'})
+
+        path = unquote(match.group(1))
+        created = self.server.create_file(path, data)
+        if created is None:
+            return self._send_json(404, {'message': 'Branch not found'})
+        if created is False:
+            return self._send_json(422, {'message': '"sha" wasn\'t supplied.'})
+        self._send_json(201, created)
+
+    def _upload_asset(self, release_id, name):
+        content = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not self._begin('POST'):
+            return
+
+        asset = self.server.upload_asset(release_id, name, content)
+        if asset is None:
+            return self._send_json(422, {'message': 'Validation Failed', 'errors': [{'code': 'already_exists'}]})
+        self._send_json(201, asset)
+
+    def do_PATCH(self):
+        data = self._read_json()
+        if not self._begin('PATCH'):
+            return
+
+        match = re.search(r'/issues/(comments/)?(\d+)$', self.path)
+        if match:
+            if match.group(1):
+                updated = self.server.update_comment(int(match.group(2)), data)
+            else:
+                updated = self.server.update_issue(int(match.group(2)), data)
+            if updated is not None:
+                return self._send_json(200, updated)
+
+        self._send_json(404, {'message': 'Not Found'})
+
+
+##
+# Fake GitHub api server with a configurable latency, a primary rate limit
+# of rate_limit requests per rate_limit_window seconds, and a secondary
+# limit of secondary_limit POST, PATCH and PUT requests per minute, both
+# limits applying to each token
+#
+class FakeGitHub(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=('127.0.0.1', 0),
+        latency=0,
+        rate_limit=None,
+        rate_limit_window=3600,
+        secondary_limit=None,
+        import_delay=0,
+    ):
+        super().__init__(address, FakeGitHubHandler)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.secondary_limit = secondary_limit
+        self.lock = threading.Lock()
+        self.issues = {}
+        self.imports = {}
+        self.import_delay = import_delay
+        self._imported_at = {}
+        self.import_polls = 0
+        self.milestones = {}
+        self.labels = {}
+        self.comments = {}
+        # Statuses returned by the next issue creations, by Jira key
+        self.failures = {}
+        # Files of each branch by path, and release assets by name
+        self.branches = {'main': {}}
+        self.releases = {}
+        self.assets = {}
+        self.patches = 0
+        self.requests = 0
+        self.rejected = 0
+        self.not_modified_count = 0
+        self.token_requests = {}
+        self.method_requests = {}
+        self._used = {}
+        self._reset = {}
+        self._posts = {}
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def rate_limit_headers(self, token=None):
+        if self.rate_limit is None:
+            return {}
+
+        with self.lock:
+            self._start_window(token, time.time())
+            return {
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(max(self.rate_limit - self._used[token], 0)),
+                'X-RateLimit-Reset': str(int(self._reset[token])),
+            }
+
+    def rate_limit_status(self, token=None):
+        headers = self.rate_limit_headers(token)
+        if not headers:
+            return {}
+
+        return {
+            'limit': int(headers['X-RateLimit-Limit']),
+            'remaining': int(headers['X-RateLimit-Remaining']),
+            'reset': int(headers['X-RateLimit-Reset']),
+        }
+
+    def _start_window(self, token, now):
+        if now >= self._reset.get(token, 0):
+            self._used[token] = 0
+            self._reset[token] = now + self.rate_limit_window
+
+    ##
+    # Count a request of a token against the limits, returning the rejection
+    # status, message and headers when it exceeds one of them
+    #
+    def check_limits(self, method, token=None):
+        now = time.time()
+        with self.lock:
+            self.requests += 1
+            self.method_requests[method] = self.method_requests.get(method, 0) + 1
+            self.token_requests[token] = self.token_requests.get(token, 0) + 1
+            self._start_window(token, now)
+
+            if self.rate_limit is not None and self._used[token] >= self.rate_limit:
+                self.rejected += 1
+                return 403, 'API rate limit exceeded', {}
+            self._used[token] += 1
+
+            posts = self._posts.setdefault(token, deque())
+            if method in ('POST', 'PATCH', 'PUT') and self.secondary_limit is not None:
+                while posts and posts[0] <= now - 60:
+                    posts.popleft()
+                if len(posts) >= self.secondary_limit:
+                    self.rejected += 1
+                    retry_after = math.ceil(posts[0] + 60 - now)
+                    return 403, 'You have exceeded a secondary rate limit', {'Retry-After': str(retry_after)}
+                posts.append(now)
+
+    ##
+    # Give back the budget used by a request answered with 304
+    #
+    def not_modified(self, token=None):
+        with self.lock:
+            self.not_modified_count += 1
+            self._used[token] = max(self._used.get(token, 0) - 1, 0)
+
+    def list_issues(self):
+        with self.lock:
+            return [
+                dict(
+                    {k: v for k, v in issue.items() if k != 'comments'},
+                    comments=len(issue['comments']),
+                    state='open',
+                )
+                for issue in self.issues.values()
+            ]
+
+    def list_comments(self):
+        with self.lock:
+            return [
+                {
+                    'id': comment_id,
+                    'issue_url': '{}/repos/orga/repo/issues/{}'.format(self.url, number),
+                    'body': self.issues[number]['comments'][index],
+                }
+                for comment_id, (number, index) in sorted(self.comments.items())
+            ]
+
+    def list(self, name):
+        with self.lock:
+            return list(getattr(self, name).values())
+
+    ##
+    # Status of an injected failure of the creation of an issue titled
+    # after a Jira key, each failure being returned once
+    #
+    def injected_failure(self, title):
+        match = re.match(r'\[([^\]]+)\]', title or '')
+        with self.lock:
+            statuses = self.failures.get(match.group(1)) if match else None
+            if not statuses:
+                return None
+            return statuses.pop(0)
+
+    def create_issue(self, data):
+        with self.lock:
+            number = len(self.issues) + 1
+            self.issues[number] = {
+                'number': number,
+                'html_url': 'https://github.com/orga/repo/issues/{}'.format(number),
+                'title': data['title'],
+                'body': data['body'],
+                'milestone': data.get('milestone'),
+                'labels': data.get('labels', []),
+                'comments': [],
+            }
+            return {k: v for k, v in self.issues[number].items() if k != 'comments'}
+
+    def create_comment(self, number, data):
+        with self.lock:
+            if number not in self.issues:
+                return None
+            self.issues[number]['comments'].append(data['body'])
+            comment_id = len(self.comments) + 1
+            self.comments[comment_id] = (number, len(self.issues[number]['comments']) - 1)
+            return {'id': comment_id, 'body': data['body']}
+
+    def update_issue(self, number, data):
+        with self.lock:
+            if number not in self.issues:
+                return None
+            self.patches += 1
+            self.issues[number]['body'] = data['body']
+            return {k: v for k, v in self.issues[number].items() if k != 'comments'}
+
+    def update_comment(self, comment_id, data):
+        with self.lock:
+            if comment_id not in self.comments:
+                return None
+            self.patches += 1
+            number, index = self.comments[comment_id]
+            self.issues[number]['comments'][index] = data['body']
+            return {'id': comment_id, 'body': data['body']}
+
+    ##
+    # Repository, branch, head of a branch or release found by name
+    #
+    def get_ref(self, kind, name):
+        with self.lock:
+            if kind is None:
+                return {'name': 'repo', 'default_branch': 'main'}
+            if kind == 'releases/tags':
+                return self.releases.get(name)
+            if name not in self.branches:
+                return None
+            if kind == 'branches':
+                return {'name': name}
+            return {'ref': 'refs/heads/' + name, 'object': {'sha': hashlib.sha1(name.encode()).hexdigest()}}
+
+    def create_branch(self, data):
+        name = data['ref'][len('refs/heads/'):]
+        with self.lock:
+            if name in self.branches:
+                return None
+            self.branches[name] = {}
+            return {'ref': data['ref'], 'object': {'sha': data['sha']}}
+
+    ##
+    # Create a file on a branch, None when the branch does not exist and
+    # False when the file already exists
+    #
+    def create_file(self, path, data):
+        content = base64.b64decode(data['content'])
+        with self.lock:
+            files = self.branches.get(data.get('branch', 'main'))
+            if files is None:
+                return None
+            if path in files:
+                return False
+            files[path] = content
+            return {'content': {'path': path, 'sha': hashlib.sha1(content).hexdigest()}}
+
+    ##
+    # File of a branch, None when the branch or the file does not exist
+    #
+    def get_file(self, path, branch):
+        with self.lock:
+            content = self.branches.get(branch, {}).get(path)
+            if content is None:
+                return None
+            return {'type': 'file', 'path': path, 'sha': hashlib.sha1(content).hexdigest()}
+
+    def create_release(self, data):
+        with self.lock:
+            release_id = len(self.releases) + 1
+            self.releases[data['tag_name']] = {
+                'id': release_id,
+                'tag_name': data['tag_name'],
+                'upload_url': '{}/repos/orga/repo/releases/{}/assets{{?name,label}}'.format(self.url, release_id),
+            }
+            return self.releases[data['tag_name']]
+
+    def upload_asset(self, release_id, name, content):
+        with self.lock:
+            if (release_id, name) in self.assets:
+                return None
+            self.assets[(release_id, name)] = content
+            tag = next(tag for tag, release in self.releases.items() if release['id'] == release_id)
+            return {
+                'name': name,
+                'size': len(content),
+                'browser_download_url': 'https://github.com/orga/repo/releases/download/{}/{}'.format(tag, name),
+            }
+
+    def create_label(self, data):
+        with self.lock:
+            self.labels[data['name']] = data
+            return data
+
+    def create_milestone(self, data):
+        with self.lock:
+            if data['title'] in self.milestones:
+                return None
+            number = len(self.milestones) + 1
+            self.milestones[data['title']] = {'number': number, 'title': data['title']}
+            return self.milestones[data['title']]
+
+    ##
+    # Imports are processed synchronously, statuses stay available for polling
+    #
+    def import_issue(self, data):
+        issue = self.create_issue(data['issue'])
+        with self.lock:
+            self.issues[issue['number']]['comments'] = [comment['body'] for comment in data['comments']]
+            for index in range(len(data['comments'])):
+                self.comments[len(self.comments) + 1] = (issue['number'], index)
+            status = {
+                'id': len(self.imports) + 1,
+                'status': 'imported',
+                'issue_url': '{}/repos/orga/repo/issues/{}'.format(self.url, issue['number']),
+            }
+            self.imports[status['id']] = status
+            self._imported_at[status['id']] = time.monotonic() + self.import_delay
+            return self._import_status(status)
+
+    ##
+    # Statuses of the imports, each one being pending until import_delay
+    # seconds after its submission
+    #
+    def list_imports(self):
+        with self.lock:
+            return [self._import_status(status) for status in self.imports.values()]
+
+    def _import_status(self, status):
+        if time.monotonic() >= self._imported_at[status['id']]:
+            return status
+
+        return {'id': status['id'], 'status': 'pending'}
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a fake GitHub api server.')
+    parser.add_argument('--port', type=int, default=8000, help='Listening port')
+    parser.add_argument('--latency', type=float, default=0, help='Latency added to every request in seconds')
+    parser.add_argument('--rate-limit', type=int, help='Requests allowed per rate limit window')
+    parser.add_argument('--rate-limit-window', type=int, default=3600, help='Rate limit window in seconds')
+    parser.add_argument('--secondary-limit', type=int, help='POST requests allowed per minute')
+    args = parser.parse_args()
+
+    server = FakeGitHub(
+        ('127.0.0.1', args.port),
+        args.latency,
+        args.rate_limit,
+        args.rate_limit_window,
+        args.secondary_limit,
+    )
+    print('Fake GitHub api listening on {}'.format(server.url))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
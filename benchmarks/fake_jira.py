@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qs, unquote, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lxml import etree
+
+
+##
+# Minimal stand-in for the Jira rest api, serving the issues of an xml
+# export through the search api and recording added comments
+#
+class FakeJiraHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self.server.count(url.path)
+
+        if url.path.endswith('/serverInfo'):
+            return self._send_json(200, {'deploymentType': 'Server', 'version': '8.0.0', 'versionNumbers': [8, 0, 0]})
+
+        if url.path.endswith('/field'):
+            return self._send_json(200, [])
+
+        if url.path.startswith('/secure/attachment/'):
+            return self._send_attachment(unquote(url.path.split('/')[3]))
+
+        if url.path.endswith('/search'):
+            return self._send_json(200, self.server.search(
+                int(query.get('startAt', 0)),
+                int(query.get('maxResults', 50)),
+            ))
+
+        self._send_json(404, {'errorMessages': ['Not Found']})
+
+    ##
+    # Send the content of an attachment in chunks
+    #
+    def _send_attachment(self, attachment_id):
+        if attachment_id not in self.server.attachments:
+            return self._send_json(404, {'errorMessages': ['Not Found']})
+
+        name, size = self.server.attachments[attachment_id]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        for chunk in attachment_chunks(name, size):
+            self.wfile.write(chunk)
+        self.server.downloaded(size)
+
+    def do_POST(self):
+        data = self._read_json()
+        time.sleep(self.server.latency)
+        path = urlsplit(self.path).path
+        self.server.count(path)
+
+        if path.endswith('/comment'):
+            comment = self.server.add_comment(unquote(path.rstrip('/').split('/')[-2]), data['body'])
+            if comment is None:
+                return self._send_json(503, {'errorMessages': ['Service Unavailable']})
+            return self._send_json(201, comment)
+
+        self._send_json(404, {'errorMessages': ['Not Found']})
+
+
+##
+# Fake Jira server with a configurable latency, serving at most
+# max_results issues per search page like a real Jira instance and the
+# attachments of the issues, and failing the first comment_failures added
+# comments. The last created issues are left out of the total of the first
+# search page, as if they were created while the issues are fetched.
+#
+class FakeJira(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(
+        self, xml_path, address=('127.0.0.1', 0), latency=0, max_results=100, comment_failures=0, created=0
+    ):
+        super().__init__(address, FakeJiraHandler)
+        self.latency = latency
+        self.max_results = max_results
+        self.comment_failures = comment_failures
+        self.created = created
+        self.lock = threading.Lock()
+        self.issues, self.names, self.schema, self.attachments = load_issues(xml_path, self.url)
+        self.comments = {}
+        self.requests = {}
+        self.downloaded_bytes = 0
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def count(self, path):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def downloaded(self, size):
+        with self.lock:
+            self.downloaded_bytes += size
+
+    def search(self, start, max_results):
+        max_results = min(max_results, self.max_results)
+        return {
+            'startAt': start,
+            'maxResults': max_results,
+            'total': len(self.issues) - (self.created if start == 0 else 0),
+            'issues': self.issues[start:start + max_results],
+            'names': self.names,
+            'schema': self.schema,
+        }
+
+    def add_comment(self, key, body):
+        with self.lock:
+            if self.comment_failures > 0:
+                self.comment_failures -= 1
+                return None
+
+            comments = self.comments.setdefault(key, [])
+            comments.append(body)
+            return {
+                'id': str(len(comments)),
+                'body': body,
+                'self': '{}/rest/api/2/issue/{}/comment'.format(self.url, key),
+            }
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+##
+# Deterministic content of an attachment, identical for attachments with
+# the same name and size
+#
+def attachment_chunks(name, size, chunk_size=64 * 1024):
+    block = hashlib.sha256(name.encode('utf-8')).digest() * (chunk_size // 32)
+    for start in range(0, size, chunk_size):
+        yield block[:min(chunk_size, size - start)]
+
+
+def attachment_content(name, size):
+    return b''.join(attachment_chunks(name, size))
+
+
+##
+# Convert the items of an xml export into Jira rest api issues, with the
+# field names and schemas of their custom fields and the name and size of
+# every attachment
+#
+def load_issues(xml_path, url):
+    issues = []
+    names = {}
+    schema = {}
+    attachments = {}
+
+    def date(element):
+        return parsedate_to_datetime(element).strftime('%Y-%m-%dT%H:%M:%S.000%z')
+
+    def named(elements):
+        return [{'name': element.text} for element in elements]
+
+    for item in etree.parse(xml_path).getroot().iterfind('channel/item'):
+        key = item.findtext('key')
+        fields = {
+            'summary': item.findtext('title')[len(key) + 3:],
+            'project': {'key': item.find('project').get('key'), 'name': item.findtext('project')},
+            'issuetype': {'name': item.findtext('type')},
+            'priority': {'name': item.findtext('priority')} if item.find('priority') is not None else None,
+            'status': {'name': item.findtext('status')},
+            'reporter': {'name': item.find('reporter').get('username')},
+            'created': date(item.findtext('created')),
+            'resolutiondate': date(item.findtext('resolved')) if item.find('resolved') is not None else None,
+            'description': item.findtext('description'),
+            'versions': named(item.iterfind('version')),
+            'fixVersions': named(item.iterfind('fixVersion')),
+            'components': named(item.iterfind('component')),
+            'labels': [label.text for label in item.iterfind('labels/label')],
+            'attachment': [
+                {
+                    'id': attachment.get('id'),
+                    'filename': attachment.get('name'),
+                    'size': int(attachment.get('size')),
+                    'content': '{}/secure/attachment/{}/{}'.format(url, attachment.get('id'), attachment.get('name')),
+                }
+                for attachment in item.iterfind('attachments/attachment')
+            ],
+            'comment': {'comments': [
+                {
+                    'id': comment.get('id'),
+                    'author': {'name': comment.get('author')},
+                    'created': date(comment.get('created')),
+                    'body': comment.text,
+                }
+                for comment in item.iterfind('comments/comment')
+            ]},
+        }
+        for attachment in fields['attachment']:
+            attachments[attachment['id']] = (attachment['filename'], attachment['size'])
+        rendered = {
+            'description': fields['description'],
+            'comment': {'comments': [{'body': comment['body']} for comment in fields['comment']['comments']]},
+        }
+
+        for customfield in item.iterfind('customfields/customfield'):
+            field_id = customfield.get('id')
+            names[field_id] = customfield.findtext('customfieldname')
+            schema[field_id] = {'custom': customfield.get('key')}
+            value = customfield.findtext('customfieldvalues/customfieldvalue')
+            if customfield.get('key').endswith(':float'):
+                fields[field_id] = float(value)
+            else:
+                fields[field_id] = value
+                rendered[field_id] = value
+
+        issues.append({
+            'id': item.find('key').get('id'),
+            'key': key,
+            'self': '{}/rest/api/2/issue/{}'.format(url, item.find('key').get('id')),
+            'fields': fields,
+            'renderedFields': rendered,
+        })
+
+    return issues, names, schema, attachments
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve an xml export through a fake Jira rest api.')
+    parser.add_argument('xml_path', type=str, help='Jira xml export served by the api')
+    parser.add_argument('--port', type=int, default=8080, help='Listening port')
+    parser.add_argument('--latency', type=float, default=0, help='Latency added to every request in seconds')
+    parser.add_argument('--max-results', type=int, default=100, help='Maximum issues per search page')
+    parser.add_argument('--comment-failures', type=int, default=0, help='Number of added comments failing first')
+    args = parser.parse_args()
+
+    server = FakeJira(
+        args.xml_path,
+        ('127.0.0.1', args.port),
+        args.latency,
+        args.max_results,
+        args.comment_failures,
+    )
+    print('Fake Jira api listening on {}'.format(server.url))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
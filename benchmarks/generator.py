@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+import argparse
+import random
+from xml.sax.saxutils import escape, quoteattr
+
+
+STATUSES = ['Open', 'In Progress', 'Resolved', 'Closed']
+TYPES = ['Bug', 'Improvement', 'New Feature', 'Task']
+PRIORITIES = ['Trivial', 'Minor', 'Major', 'Critical']
+COMPONENTS = ['Core', 'Back office', 'Front office', 'Installer']
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+    'incididunt ut labore et dolore magna aliqua'
+).split()
+JIRA_URL = 'https://jira.example.com'
+TYPE_FLOAT = 'com.atlassian.jira.plugin.system.customfieldtypes:float'
+TYPE_TEXTAREA = 'com.atlassian.jira.plugin.system.customfieldtypes:textarea'
+SHARED_LOGS = 10
+
+
+##
+# Write a deterministic Jira RSS/XML export into fp, items being written
+# one at a time so that exports of millions of items can be generated.
+# Keys are numbered from start, so that overlapping exports can be made.
+#
+def generate(
+    fp, projects=1, items=1000, comments=2, custom_fields=1, labels=5, versions=8, seed=42, start=0, attachments=0
+):
+    rng = random.Random(seed)
+    label_names = ['label-{}'.format(i) for i in range(labels)]
+
+    def sentence(count):
+        return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+    fp.write('<!-- RSS generated by JIRA -->\n<rss version="0.92">\n<channel>\n')
+    fp.write('<title>Generated Jira export</title>\n')
+    for index in range(start, start + items):
+        proj = 'P{}'.format(index % projects)
+        key = '{}-{}'.format(proj, index // projects + 1)
+        link = '{}/browse/{}'.format(JIRA_URL, key)
+        description = '<p>{} &amp; {}</p>'.format(sentence(30), sentence(10))
+        # Half of the attachments are logs shared by many issues, the others
+        # are screenshots shown in the description
+        files = []
+        for attachment in range(attachments):
+            if rng.random() < 0.5:
+                log = rng.randrange(SHARED_LOGS)
+                files.append(('build-{}.log'.format(log), 20000 + log * 1000))
+            else:
+                files.append(('screenshot-{}-{}.png'.format(index, attachment), rng.randrange(5000, 50000)))
+                description += '\n!{}|thumbnail!'.format(files[-1][0])
+        status = rng.choice(STATUSES)
+        fp.write('<item>\n')
+        fp.write('<title>[{}] {}</title>\n'.format(key, escape(sentence(6))))
+        fp.write('<link>{}</link>\n'.format(link))
+        fp.write('<project id="{}" key="{}">{}</project>\n'.format(index % projects, proj, proj))
+        fp.write('<description>{}</description>\n'.format(escape(description)))
+        fp.write('<key id="{}">{}</key>\n'.format(index, key))
+        fp.write('<type id="1">{}</type>\n'.format(rng.choice(TYPES)))
+        fp.write('<priority id="1">{}</priority>\n'.format(rng.choice(PRIORITIES)))
+        fp.write('<status id="1">{}</status>\n'.format(status))
+        fp.write('<reporter username="user{}">User</reporter>\n'.format(rng.randrange(50)))
+        fp.write('<created>Mon, 1 Jan 2018 10:00:00 +0100</created>\n')
+        if status in ['Resolved', 'Closed']:
+            fp.write('<resolved>Wed, 3 Jan 2018 10:00:00 +0100</resolved>\n')
+        if versions:
+            fp.write('<version>1.7.{}.0</version>\n'.format(rng.randrange(versions)))
+            fp.write('<fixVersion>1.7.{}</fixVersion>\n'.format(rng.randrange(versions)))
+        fp.write('<component>{}</component>\n'.format(rng.choice(COMPONENTS)))
+        if labels:
+            fp.write('<labels>{}</labels>\n'.format(''.join(
+                '<label>{}</label>'.format(label)
+                for label in rng.sample(label_names, min(labels, rng.randint(1, 3)))
+            )))
+        if files:
+            fp.write('<attachments>\n')
+            for attachment, (name, size) in enumerate(files):
+                fp.write('<attachment id="{}" name={} size="{}" author="user{}" created="{}"/>\n'.format(
+                    index * attachments + attachment,
+                    quoteattr(name),
+                    size,
+                    rng.randrange(50),
+                    'Tue, 2 Jan 2018 10:00:00 +0100',
+                ))
+            fp.write('</attachments>\n')
+        if custom_fields:
+            fp.write('<customfields>\n')
+            fp.write(
+                '<customfield id="customfield_10002" key="{}">'
+                '<customfieldname>Story Points</customfieldname>'
+                '<customfieldvalues><customfieldvalue>{}.0</customfieldvalue></customfieldvalues>'
+                '</customfield>\n'.format(TYPE_FLOAT, rng.choice([1, 2, 3, 5, 8]))
+            )
+            for field in range(1, custom_fields):
+                name = 'How to reproduce the issue ?' if field == 1 else 'Field {}'.format(field)
+                fp.write(
+                    '<customfield id="customfield_{}" key="{}">'
+                    '<customfieldname>{}</customfieldname>'
+                    '<customfieldvalues><customfieldvalue>{}</customfieldvalue></customfieldvalues>'
+                    '</customfield>\n'.format(10100 + field, TYPE_TEXTAREA, escape(name), escape(sentence(12)))
+                )
+            fp.write('</customfields>\n')
+        if comments:
+            fp.write('<comments>\n')
+            for comment in range(comments):
+                fp.write('<comment id={} author="user{}" created="{}">{}</comment>\n'.format(
+                    quoteattr(str(index * comments + comment)),
+                    rng.randrange(50),
+                    'Tue, 2 Jan 2018 10:00:00 +0100',
+                    escape('<p>{}</p>'.format(sentence(20))),
+                ))
+            fp.write('</comments>\n')
+        fp.write('</item>\n')
+    fp.write('</channel>\n</rss>\n')
+
+
+##
+# Generate an export file
+#
+def generate_file(path, **options):
+    with open(path, 'w', encoding='utf-8') as fp:
+        generate(fp, **options)
+
+
+##
+# Export options shared by the benchmarks command lines
+#
+def add_arguments(parser, items=1000):
+    parser.add_argument('--projects', type=int, default=1, help='Number of projects')
+    parser.add_argument('--items', type=int, default=items, help='Number of items')
+    parser.add_argument('--comments', type=int, default=2, help='Comments per item')
+    parser.add_argument('--custom-fields', type=int, default=1, help='Custom fields per item')
+    parser.add_argument('--labels', type=int, default=5, help='Number of distinct labels')
+    parser.add_argument('--versions', type=int, default=8, help='Number of distinct versions')
+    parser.add_argument('--attachments', type=int, default=0, help='Attachments per item')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+
+def options(args):
+    return {
+        'projects': args.projects,
+        'items': args.items,
+        'comments': args.comments,
+        'custom_fields': args.custom_fields,
+        'labels': args.labels,
+        'versions': args.versions,
+        'seed': args.seed,
+        'attachments': args.attachments,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Jira xml export.')
+    parser.add_argument('output', type=str, help='Output xml path')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    generate_file(args.output, **options(args))
+
+
+if __name__ == '__main__':
+    main()
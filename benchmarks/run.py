@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks import bench_extract, bench_migrate, generator
+
+
+##
+# Metrics where a higher value is better, compared against a baseline
+#
+HIGHER_IS_BETTER = ['items_per_second', 'requests_per_second', 'issues_per_second']
+LOWER_IS_BETTER = ['peak_rss_mb']
+
+
+##
+# Compare results with a baseline, returning regressions above the tolerance
+#
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            if metric not in result or metric not in baseline[name]:
+                continue
+
+            before = baseline[name][metric]
+            after = result[metric]
+            change = (after - before) / before if before else 0
+            if metric in LOWER_IS_BETTER:
+                change = -change
+            if change < -tolerance:
+                regressions.append('{} {}: {:.1f} -> {:.1f} ({:+.0%})'.format(name, metric, before, after, change))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the extract() and migrate() benchmark suite.')
+    generator.add_arguments(parser, items=10000)
+    parser.add_argument('--migrate-items', type=int, default=200, help='Number of items migrated')
+    parser.add_argument('--latency', type=float, default=0.02, help='Fake api latency in seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8], help='Concurrency levels')
+    parser.add_argument('--output', type=str, help='Write results into this json file')
+    parser.add_argument('--baseline', type=str, help='Compare results with a previous json output')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative regression')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, **generator.options(args))
+        print('Export: {} items, {:.1f} MB'.format(args.items, os.path.getsize(xml_path) / 1024 / 1024))
+
+        for mode in ['full', 'streaming']:
+            results['extract-' + mode] = bench_extract.measure(mode, xml_path)
+            bench_extract.report(results['extract-' + mode])
+
+        migrate_path = os.path.join(tmp, 'migrate.xml')
+        generator.generate_file(migrate_path, **dict(generator.options(args), items=args.migrate_items))
+        for backend in ['rest', 'import']:
+            for concurrency in args.concurrency:
+                name = 'migrate-{}-{}'.format(backend, concurrency)
+                results[name] = bench_migrate.measure(migrate_path, backend, concurrency, latency=args.latency)
+                bench_migrate.report(results[name])
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fp:
+            regressions = compare(results, json.load(fp), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
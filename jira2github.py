@@ -4,28 +4,139 @@ import getpass
 import jira2github
 
 
+##
+# Parse a shard selector such as 2/8 into (index, count)
+#
+def shard(value):
+    try:
+        index, count = [int(part) for part in value.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('Shard must be written as index/count, e.g. 0/4')
+
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError('Shard index must be between 0 and count - 1')
+
+    return index, count
+
+
 def main():
     parser = argparse.ArgumentParser(description='Migrate Jira Issues to github.')
     parser.add_argument('--aliases-path', type=str, help='Labels aliases path')
     parser.add_argument('--cache-path', type=str, help='Cache path')
-    parser.add_argument('--xml-path', type=str, help='Jira xml path')
+    parser.add_argument('--xml-path', type=str, help='Jira xml path, or directory or glob of xml exports')
     parser.add_argument('--jira-url', type=str, help='Jira url')
     parser.add_argument('--jira-user', type=str, help='Jira user')
     parser.add_argument('--jira-password', type=str, help='Jira user password')
+    parser.add_argument('--jira-jql', type=str, help='Fetch issues matching this JQL query instead of the xml')
+    parser.add_argument('--jira-page-size', type=int, help='Issues fetched per Jira request (default: 100)')
+    parser.add_argument('--jira-concurrency', type=int, help='Number of Jira pages fetched concurrently (default: 1)')
+    parser.add_argument('--jira-workers', type=int, help='Number of workers adding Jira backlinks (default: 2)')
     parser.add_argument('--github-orga', type=str, help='GitHub organisation')
     parser.add_argument('--github-repo', type=str, help='GitHub repository')
     parser.add_argument('--github-user', type=str, help='GitHub user')
     parser.add_argument('--github-password', type=str, help='GitHub password')
-    parser.add_argument('--github-token', type=str, help='GitHub Token')
+    parser.add_argument(
+        '--github-token',
+        type=str,
+        nargs='+',
+        help='GitHub tokens, requests being spread over the budget of every token'
+    )
+    parser.add_argument('--github-api-url', type=str, help='GitHub api url (default: https://api.github.com)')
     parser.add_argument('--custom-github-message', type=str, help='Custom message when creating GitHub issue')
     parser.add_argument('--custom-comment-github-message', type=str, help='Custom comment message when creating GitHub comment')
     parser.add_argument('--custom-jira-message', type=str, help='Custom message when adding a comment into Jira')
+    parser.add_argument('--max-request-rate', type=float, help='Maximum GitHub requests per second (default: 1)')
+    parser.add_argument('--request-burst', type=int, help='Number of GitHub requests allowed in a burst (default: 1)')
+    parser.add_argument(
+        '--backend',
+        choices=['rest', 'import'],
+        help='Create issues with the rest api or with the issue import api (default: rest)'
+    )
+    parser.add_argument('--concurrency', type=int, help='Number of issues migrated concurrently (default: 1)')
+    parser.add_argument(
+        '--attachments',
+        choices=['branch', 'release'],
+        help='Upload Jira attachments to a branch or to the assets of a release of the repository'
+    )
+    parser.add_argument(
+        '--attachments-ref',
+        type=str,
+        help='Branch or release tag receiving the attachments (default: jira-attachments)'
+    )
+    parser.add_argument(
+        '--attachment-concurrency',
+        type=int,
+        help='Number of attachments transferred concurrently (default: concurrency)'
+    )
+    parser.add_argument(
+        '--http-pool-size',
+        type=int,
+        help='Maximum number of kept-alive GitHub connections (default: max(10, concurrency))'
+    )
+    parser.add_argument(
+        '--http-timeout',
+        type=float,
+        help='GitHub and Jira attachment request timeout in seconds (default: 30)'
+    )
+    parser.add_argument(
+        '--http-retries',
+        type=int,
+        help='Transport retries for idempotent GitHub requests (default: 3)'
+    )
+    parser.add_argument(
+        '--metrics-path',
+        type=str,
+        help='Write timings and request metrics to this json file, or Prometheus textfile if it ends with .prom'
+    )
+    parser.add_argument('--metrics-interval', type=int, help='Seconds between metrics exports (default: 60)')
+    parser.add_argument('--shard', type=shard, help='Only migrate the shard index/count of the issues, e.g. 0/4')
+    parser.add_argument(
+        '--shard-by',
+        choices=['issue', 'project'],
+        help='Assign issues to shards by issue key or by project key (default: issue)'
+    )
+    parser.add_argument('--merge-shards', type=int, help='Merge the caches and errors of this number of shards')
+    parser.add_argument('--snapshot-path', type=str, help='Cache extracted projects into this file between runs')
+    parser.add_argument('--streaming', action='store_const', const=True, help='Parse the xml export incrementally')
+    parser.add_argument('--parse-workers', type=int, help='Processes parsing several xml exports (default: cores)')
     parser.add_argument('--prettify', action='store_const', const=True, help='show prettify projects')
     parser.add_argument('--dry-run', action='store_const', const=True, help='Enable or disable dry-run')
     parser.add_argument('--check-rate-limit', action='store_const', const=True, help='Check rate limit')
+    parser.add_argument(
+        '--plan',
+        action='store_const',
+        const=True,
+        help='Count the remaining GitHub requests and estimate when the migration will be done'
+    )
+    parser.add_argument(
+        '--reconcile',
+        action='store_const',
+        const=True,
+        help='Rebuild the cache from the issues existing on GitHub'
+    )
+    parser.add_argument(
+        '--rewrite-references',
+        action='store_const',
+        const=True,
+        help='Rewrite Jira keys mentioned by migrated issues and comments into links to their GitHub issue'
+    )
+    parser.add_argument(
+        '--retry-errors',
+        action='store_const',
+        const=True,
+        help='Only migrate again the issues recorded in the errors file with a transient error'
+    )
+    parser.add_argument(
+        '--replay-backlinks',
+        action='store_const',
+        const=True,
+        help='Only add the Jira backlinks not added by previous runs'
+    )
     args = parser.parse_args()
 
-    xml_path = args.xml_path if args.xml_path else input('Jira xml path:')
+    xml_path = args.xml_path
+    if not (xml_path or args.jira_jql or args.replay_backlinks or args.merge_shards or args.rewrite_references):
+        xml_path = input('Jira xml path:')
     github_orga = args.github_orga if args.github_orga else input('GitHub orga: ')
     github_repo = args.github_repo if args.github_repo else input('GitHub repo: ')
     github_user = None
@@ -37,7 +148,7 @@ def main():
         github_user = args.github_user if args.github_user else input('GitHub username: ')
         github_password = args.github_password if args.github_password else getpass.getpass('GitHub password: ')
 
-    if args.jira_url or args.jira_user:
+    if args.jira_url or args.jira_user or args.jira_jql or args.replay_backlinks or args.attachments:
         jira_user = args.jira_user if args.jira_user else input('Jira username: ')
         jira_password = args.jira_password if args.jira_password else getpass.getpass('Jira password: ')
 
@@ -50,9 +161,26 @@ def main():
         args.github_token,
     )
 
+    jira_to_github.set_github_api_url(args.github_api_url)
+    jira_to_github.set_backend(args.backend)
+    jira_to_github.set_concurrency(args.concurrency)
+    jira_to_github.set_attachments(args.attachments, args.attachments_ref, args.attachment_concurrency)
+    jira_to_github.set_http_config(
+        args.http_pool_size or max(10, jira_to_github.concurrency),
+        args.http_timeout,
+        args.http_retries
+    )
     jira_to_github.set_aliases_path(args.aliases_path)
+    if args.shard is not None:
+        jira_to_github.set_shard(args.shard[0], args.shard[1], args.shard_by)
+    jira_to_github.set_jira_workers(args.jira_workers)
     jira_to_github.set_cache_path(args.cache_path)
     jira_to_github.set_dry_run(args.dry_run)
+    jira_to_github.set_streaming(args.streaming)
+    jira_to_github.set_parse_workers(args.parse_workers)
+    jira_to_github.set_snapshot_path(args.snapshot_path)
+    jira_to_github.set_metrics_path(args.metrics_path, args.metrics_interval)
+    jira_to_github.set_rate_limit(args.max_request_rate, args.request_burst)
     jira_to_github.set_custom_github_message(args.custom_github_message)
     jira_to_github.set_custom_comment_github_message(args.custom_comment_github_message)
     jira_to_github.set_custom_jira_message(args.custom_jira_message)
@@ -61,21 +189,58 @@ def main():
         jira_user,
         jira_password
     )
+    jira_to_github.set_jira_source(args.jira_jql, args.jira_page_size, args.jira_concurrency)
+
+    if args.replay_backlinks:
+        jira_to_github.replay_backlinks()
+        return
+
+    if args.merge_shards:
+        jira_to_github.merge_shards(args.merge_shards)
+        return
+
+    if args.rewrite_references:
+        jira_to_github.rewrite_references()
+        jira_to_github.etags.save()
+        jira_to_github.metrics.write()
+        return
 
     jira_to_github.extract()
     if args.prettify:
         jira_to_github.prettify()
+    elif args.plan:
+        jira_to_github.plan()
+        jira_to_github.etags.save()
     elif args.check_rate_limit:
         jira_to_github.check_rate_limit()
+        jira_to_github.etags.save()
+    elif args.reconcile:
+        jira_to_github.reconcile()
+        jira_to_github.save_cache_data()
+    elif args.retry_errors:
+        jira_to_github.milestones()
+        jira_to_github.labels()
+        try:
+            jira_to_github.attachments()
+            jira_to_github.retry_errors()
+        except KeyboardInterrupt:
+            print('Interrupted, saving cache')
+        finally:
+            jira_to_github.save_cache_data()
+            jira_to_github.save_errors_data()
+            jira_to_github.metrics.write()
     else:
         jira_to_github.milestones()
+        jira_to_github.labels()
         try:
+            jira_to_github.attachments()
             jira_to_github.migrate()
         except KeyboardInterrupt:
             print('Interrupted, saving cache')
         finally:
             jira_to_github.save_cache_data()
             jira_to_github.save_errors_data()
+            jira_to_github.metrics.write()
 
 
 if __name__ == '__main__':
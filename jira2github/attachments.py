@@ -0,0 +1,130 @@
+import base64
+import json
+import os
+import threading
+
+
+##
+# Uploaded attachments, each Jira attachment being mapped to the sha256 of
+# its content and each content to the url of its single upload, so that a
+# file attached to many issues is uploaded once and a later run neither
+# downloads nor uploads it again
+#
+class AttachmentStore:
+
+    def __init__(self, path=None):
+        self.path = path
+        self.files = {}
+        self.attachments = {}
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+        if path is not None:
+            try:
+                with open(path, encoding='utf-8') as fp:
+                    data = json.load(fp)
+                self.files = data['files']
+                self.attachments = data['attachments']
+            except (FileNotFoundError, ValueError, KeyError):
+                pass
+
+    ##
+    # Url of the upload of a Jira attachment, None when not uploaded yet
+    #
+    def url(self, attachment_id):
+        with self._lock:
+            return self.files.get(self.attachments.get(attachment_id))
+
+    ##
+    # Claim the upload of a content, returning False when it has already
+    # been uploaded. A content being uploaded by another worker is waited
+    # for, and claimed again if that upload failed.
+    #
+    def claim(self, digest):
+        while True:
+            with self._lock:
+                if digest in self.files:
+                    return False
+                upload = self._uploads.get(digest)
+                if upload is None:
+                    self._uploads[digest] = threading.Event()
+                    return True
+
+            upload.wait()
+
+    ##
+    # End the upload of a claimed content, url being None when it failed
+    #
+    def release(self, digest, url):
+        with self._lock:
+            if url is not None:
+                self.files[digest] = url
+            self._uploads.pop(digest).set()
+
+    def add(self, attachment_id, digest):
+        with self._lock:
+            self.attachments[attachment_id] = digest
+
+    ##
+    # Add the uploads recorded by another store
+    #
+    def merge(self, path):
+        other = AttachmentStore(path)
+        with self._lock:
+            self.files.update(other.files)
+            self.attachments.update(other.attachments)
+
+    def save(self):
+        if self.path is None:
+            return
+
+        with self._lock:
+            data = {'files': dict(self.files), 'attachments': dict(self.attachments)}
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as fp:
+            json.dump(data, fp, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+##
+# Request body streaming a file in chunks, read again from the start when
+# the request is retried. Its length is known so that it is sent with a
+# Content-Length rather than chunked.
+#
+class FileBody:
+
+    def __init__(self, path, chunk_size):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        with open(self.path, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(self.chunk_size), b''):
+                yield chunk
+
+
+##
+# Json request body of the contents api, the file being base64 encoded
+# chunk by chunk into the content field
+#
+class ContentsBody(FileBody):
+
+    def __init__(self, path, chunk_size, fields):
+        # Whole base64 groups in every chunk
+        super().__init__(path, chunk_size - chunk_size % 3)
+        self.prefix = (json.dumps(fields)[:-1] + ', "content": "').encode('utf-8')
+        self.suffix = b'"}'
+
+    def __len__(self):
+        return len(self.prefix) + (self.size + 2) // 3 * 4 + len(self.suffix)
+
+    def __iter__(self):
+        yield self.prefix
+        for chunk in super().__iter__():
+            yield base64.b64encode(chunk)
+        yield self.suffix
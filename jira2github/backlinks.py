@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+
+from .journal import Journal
+
+
+##
+# Background queue of the comments linking Jira issues to their github
+# issue. Backlinks are posted by a small pool of workers, retried with an
+# exponential backoff, and recorded into a journal until they are posted
+# so that a later run can replay the pending ones.
+#
+class BacklinkQueue:
+
+    MAX_RETRIES = 5
+    BACKOFF = 1
+    MAX_BACKOFF = 60
+
+    def __init__(self, path, post, workers=2, sleep=time.sleep, metrics=None):
+        self.journal = Journal(path)
+        self.post = post
+        self.workers = workers
+        self.sleep = sleep
+        self.metrics = metrics
+        self.pending = {}
+        self.failed = {}
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+        for record in self.journal.replay():
+            self._apply(record)
+
+    ##
+    # Queue a backlink, recorded as pending until posted
+    #
+    def put(self, key, url):
+        self._record({'op': 'pending', 'key': key, 'url': url})
+        self._start()
+        self._queue.put((key, url))
+
+    ##
+    # Queue again every backlink not posted yet, returning their number
+    #
+    def replay(self):
+        with self._lock:
+            backlinks = list(self.pending.items()) + list(self.failed.items())
+
+        for key, url in backlinks:
+            self.put(key, url)
+
+        return len(backlinks)
+
+    ##
+    # Add the backlinks not posted yet of another journal
+    #
+    def merge(self, path):
+        for record in Journal(path).replay():
+            self._record(record)
+
+    ##
+    # Wait until every queued backlink has been posted or has failed
+    #
+    def join(self):
+        self._queue.join()
+
+    ##
+    # Rewrite the journal with the backlinks not posted yet
+    #
+    def save(self):
+        with self._lock:
+            self.journal.rewrite(
+                [{'op': 'pending', 'key': key, 'url': url} for key, url in self.pending.items()]
+                + [{'op': 'failed', 'key': key, 'url': url} for key, url in self.failed.items()]
+            )
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            key, url = self._queue.get()
+            try:
+                self._post(key, url)
+            finally:
+                self._queue.task_done()
+
+    ##
+    # Post a backlink, retrying failures with an exponential backoff
+    #
+    def _post(self, key, url):
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                self.post(key, url)
+            except Exception as e:
+                if attempt == self.MAX_RETRIES:
+                    print('Could not add Jira comment to {}: {}'.format(key, e))
+                    self._increment('jira_backlink_failures_total')
+                    self._record({'op': 'failed', 'key': key, 'url': url})
+                    return
+
+                self._increment('jira_backlink_retries_total')
+                self.sleep(min(self.BACKOFF * 2 ** attempt, self.MAX_BACKOFF))
+            else:
+                self._record({'op': 'done', 'key': key})
+                return
+
+    def _increment(self, name):
+        if self.metrics is not None:
+            self.metrics.increment(name)
+
+    def _record(self, record):
+        self.journal.append(record)
+        self._apply(record)
+
+    def _apply(self, record):
+        with self._lock:
+            self.pending.pop(record['key'], None)
+            self.failed.pop(record['key'], None)
+            if record['op'] == 'pending':
+                self.pending[record['key']] = record['url']
+            elif record['op'] == 'failed':
+                self.failed[record['key']] = record['url']
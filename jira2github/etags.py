@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import requests
+
+
+##
+# Cache of GitHub GET responses by url and token, so that requests are sent
+# with If-None-Match and a 304 Not Modified response, which does not count
+# against the rate limit, is replaced by the cached response. Cached bodies
+# are bounded to max_size characters, the least recently used responses being
+# evicted first, as pages of issues and comments would otherwise keep the whole
+# repository in memory and in the cache file.
+#
+class EtagCache:
+
+    MAX_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, path=None, max_size=MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.size = 0
+        self._lock = threading.Lock()
+
+        if path is not None:
+            try:
+                with open(path, encoding='utf-8') as fp:
+                    entries = json.load(fp, object_pairs_hook=OrderedDict)
+            except (FileNotFoundError, ValueError):
+                entries = {}
+            # Saved least recently used first
+            for key, entry in entries.items():
+                self._add(key, entry)
+
+    ##
+    # Cache key of an url requested with a token and media type, tokens not
+    # being stored
+    #
+    def key(self, url, token, accept=None):
+        if token is not None:
+            token = hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+        return ' '.join(part for part in [token, accept, url] if part is not None)
+
+    ##
+    # Request headers with the ETag of the cached response
+    #
+    def conditional(self, key, headers):
+        with self._lock:
+            entry = self.entries.get(key)
+
+        if entry is None:
+            return headers
+
+        return dict(headers or {}, **{'If-None-Match': entry['etag']})
+
+    ##
+    # Cache a 200 response, or rebuild the cached response of a 304 one
+    #
+    def resolve(self, key, response):
+        if response.status_code == 200 and 'ETag' in response.headers:
+            with self._lock:
+                self._add(key, {
+                    'etag': response.headers['ETag'],
+                    'link': response.headers.get('Link'),
+                    'body': response.text,
+                })
+            return response
+
+        if response.status_code != 304:
+            return response
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None:
+            return response
+
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.url = response.url
+        cached.headers = response.headers.copy()
+        cached.headers['ETag'] = entry['etag']
+        if entry['link'] is not None:
+            cached.headers['Link'] = entry['link']
+        cached.encoding = 'utf-8'
+        cached._content = entry['body'].encode('utf-8')
+        cached.request = response.request
+
+        return cached
+
+    ##
+    # Add an entry as the most recently used one, evicting the least recently
+    # used ones beyond max_size. The lock must be held.
+    #
+    def _add(self, key, entry):
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous['body'])
+        if len(entry['body']) > self.max_size:
+            return
+
+        self.entries[key] = entry
+        self.size += len(entry['body'])
+        while self.size > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted['body'])
+
+    ##
+    # Save the cache atomically
+    #
+    def save(self):
+        if self.path is None:
+            return
+
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as fp:
+                json.dump(self.entries, fp, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
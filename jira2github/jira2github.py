@@ -1,21 +1,82 @@
 import csv
+import datetime
+import glob
+import hashlib
+import html
 import json
+import mimetypes
 import os
+import pickle
 import re
 import requests
+import tempfile
+import threading
 import time
+import zlib
 import progressbar
+import queue
+from email.utils import parsedate_to_datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice, repeat
+from urllib.parse import quote, urlencode
 from jira import JIRA
-from html.entities import name2codepoint
-from lxml import objectify
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from html.entities import html5
+from lxml import etree, objectify
 from collections import defaultdict
+from .attachments import AttachmentStore, ContentsBody, FileBody
+from .backlinks import BacklinkQueue
+from .etags import EtagCache
+from .journal import Journal
+from .markup import JiraMarkup
+from .metrics import Metrics, timed
+from .planner import Planner
+from .ratelimit import TokenPool
+from .records import CommentRecord, IssueRecord
 
 
 class jira2github:
 
     TYPE_FLOAT = 'com.atlassian.jira.plugin.system.customfieldtypes:float'
+    ENTITY_PATTERN = re.compile('&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);')
     METHOD_GET = 'get'
     METHOD_POST = 'post'
+    METHOD_PATCH = 'patch'
+    METHOD_PUT = 'put'
+    STREAM_CHUNK_SIZE = 1024 * 1024
+    SNAPSHOT_VERSION = 2
+    MAX_RETRIES = 5
+    GITHUB_API_URL = 'https://api.github.com'
+    GITHUB_ACCEPT = 'application/vnd.github.beta.html+json'
+    GITHUB_IMPORT_ACCEPT = 'application/vnd.github.golden-comet-preview+json'
+    GITHUB_RAW_ACCEPT = 'application/vnd.github.raw+json'
+    JIRA_TITLE_KEY_PATTERN = re.compile(r'^\[([A-Za-z][A-Za-z0-9_]*-[0-9]+)\]')
+    JIRA_LINK_KEY_PATTERN = re.compile(r'/browse/([A-Za-z][A-Za-z0-9_]*-[0-9]+)')
+    # Jira keys outside of code, urls and links, whatever the number of migrated keys
+    REFERENCE_PATTERN = re.compile(
+        r'```.*?```|`[^`\n]*`'
+        r'|(?<![\w/.#=?&-])(?P<key>[A-Za-z][A-Za-z0-9_]*-[0-9]+)(?![\w-]|\]\()',
+        re.DOTALL,
+    )
+    GITHUB_ISSUE_PATH_PATTERN = '/{}/{}/issues/([0-9]+)$'
+    BACKEND_REST = 'rest'
+    BACKEND_IMPORT = 'import'
+    SHARD_BY_PROJECT = 'project'
+    SHARD_BY_ISSUE = 'issue'
+    ATTACHMENTS_BRANCH = 'branch'
+    ATTACHMENTS_RELEASE = 'release'
+    ATTACHMENTS_REF = 'jira-attachments'
+    ATTACHMENT_IMAGE_PATTERN = re.compile(r'!\[\]\(([^)\n]+)\)')
+    IMPORT_POLL_BATCH = 100
+    IMPORT_POLL_INTERVAL = 5
+    GITHUB_RATE_LIMIT_WINDOW = 3600
+    RETRY_ROUNDS = 4
+    RETRY_BACKOFF = 30
+    RETRY_MAX_BACKOFF = 600
+    JIRA_PAGE_SIZE = 100
+    JIRA_EXPAND = 'renderedFields,names,schema'
+    JIRA_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
 
     ##
     # Initialize github and Jira information
@@ -34,14 +95,54 @@ class jira2github:
         self.github_user = github_user
         self.github_repo = github_repo
         self.github_password = github_password
-        self.github_token = github_token
-        self.github_url = 'https://api.github.com/repos/{}/{}'.format(github_orga, github_repo)
+        # One or several tokens, requests being spread over their budgets
+        if isinstance(github_token, str):
+            github_token = [github_token]
+        self.github_tokens = list(github_token or [])
+        self.github_token = self.github_tokens[0] if self.github_tokens else None
+        self.set_github_api_url(None)
         self.dry_run = False
+        self.streaming = False
+        self.parse_workers = None
+        self.snapshot_path = None
+        self.errors_path = 'errors.json'
+        self.shard_index = 0
+        self.shard_count = 1
+        self.shard_by = self.SHARD_BY_ISSUE
+        self.concurrency = 1
+        self.backend = self.BACKEND_REST
         self.jira = None
+        self.jira_session = None
+        self.jira_jql = None
+        self.jira_page_size = self.JIRA_PAGE_SIZE
+        self.jira_concurrency = 1
+        self.jira_issues = None
+        self.jira_total = None
+        self.jira_token_pages = False
+        self.jira_workers = 2
+        self.backlinks = None
+        self.etags = EtagCache()
+        self.attachments_destination = None
+        self.attachments_ref = self.ATTACHMENTS_REF
+        self.attachment_concurrency = None
+        self.attachment_store = AttachmentStore()
+        self._upload_url = None
+        self._branch_lock = threading.Lock()
+        self.markup = JiraMarkup()
+        self.set_rate_limit(None, None)
+        self.metrics = Metrics()
+        self.set_http_config(None, None, None)
 
         self.projects = {}
         self.cached_data = {}
         self.migration_errors = {}
+        self.pending_imports = {}
+        self.partial_issues = {}
+        self.milestone_numbers = {}
+        self.label_names = set()
+        self.journal = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
 
     def set_jira_config(self, jira_url, jira_user, jira_password):
         if jira_user and jira_password:
@@ -49,6 +150,67 @@ class jira2github:
                 jira_url,
                 basic_auth=(jira_user, jira_password)
             )
+            # Attachments are streamed by a plain session, the Jira one
+            # reading whole responses
+            self.jira_session = requests.Session()
+            self.jira_session.auth = (jira_user, jira_password)
+
+    ##
+    # Set the number of workers adding backlink comments to Jira
+    #
+    def set_jira_workers(self, workers):
+        if workers is not None and workers > 0:
+            self.jira_workers = workers
+            if self.backlinks is not None:
+                self.backlinks.workers = workers
+
+    ##
+    # Fetch issues matching a jql query from Jira instead of reading the
+    # xml export, with at most concurrency pages requested at once
+    #
+    def set_jira_source(self, jql, page_size=None, concurrency=None):
+        self.jira_jql = jql
+        if page_size is not None and page_size > 0:
+            self.jira_page_size = page_size
+        if concurrency is not None and concurrency > 0:
+            self.jira_concurrency = concurrency
+
+    ##
+    # Only migrate the issues of one shard out of count, issues being
+    # assigned to shards by a hash of their project key or of their key.
+    # Each shard has its own cache and errors files, so this must be set
+    # before the cache path.
+    #
+    def set_shard(self, index, count, shard_by=None):
+        if count is None or count <= 1:
+            return
+
+        if not 0 <= index < count:
+            raise ValueError('Shard index must be between 0 and {}'.format(count - 1))
+
+        self.shard_index = index
+        self.shard_count = count
+        if shard_by is not None:
+            self.shard_by = shard_by
+        self.errors_path = self._shard_path(self.errors_path, index, count)
+
+    ##
+    # Path of the file of a shard, derived from the file of the whole
+    # migration
+    #
+    def _shard_path(self, path, index, count):
+        root, ext = os.path.splitext(path)
+        return '{}.shard-{}-of-{}{}'.format(root, index, count, ext)
+
+    ##
+    # Check if an issue belongs to the migrated shard
+    #
+    def _in_shard(self, proj, key):
+        if self.shard_count == 1:
+            return True
+
+        value = proj if self.shard_by == self.SHARD_BY_PROJECT else key
+        return zlib.crc32(value.encode('utf-8')) % self.shard_count == self.shard_index
 
     ##
     # Set cache path and reload cached data if needed
@@ -56,6 +218,8 @@ class jira2github:
     def set_cache_path(self, cache_path):
         if cache_path is None:
             cache_path = os.path.abspath('cache.json')
+        if self.shard_count > 1:
+            cache_path = self._shard_path(cache_path, self.shard_index, self.shard_count)
 
         self.cache_path = cache_path
 
@@ -66,8 +230,35 @@ class jira2github:
         except FileNotFoundError:
             pass
 
+        # Replay what has been migrated since the last cache save, then
+        # compact the journal into the cache file
+        self.journal = Journal(self.cache_path + '.journal')
+        for record in self.journal.replay():
+            self._apply_progress(record, journal=False)
+        self.save_cache_data()
+
+        partial = sum(len(issues) for issues in self.partial_issues.values())
+        if partial > 0:
+            print('Resuming {} issues with missing comments'.format(partial))
+        if len(self.pending_imports) > 0:
+            print('Resuming {} issue imports not checked yet'.format(len(self.pending_imports)))
+
+        self.etags = EtagCache(self.cache_path + '.etags')
+        self.attachment_store = AttachmentStore(self.cache_path + '.attachments')
+        self.backlinks = BacklinkQueue(
+            self.cache_path + '.backlinks',
+            self._post_jira_comment,
+            self.jira_workers,
+            self._sleep,
+            self.metrics,
+        )
+        unposted = len(self.backlinks.pending) + len(self.backlinks.failed)
+        if unposted > 0:
+            print('{} Jira backlinks not posted, run with --replay-backlinks to post them'.format(unposted))
+
     ##
-    # Set cache path and reload cached data if needed
+    # Set labels aliases path and compile aliases into a lookup table
+    # giving the github labels of each aliased Jira label
     #
     def set_aliases_path(self, aliases_path):
         self.aliases = dict()
@@ -76,6 +267,15 @@ class jira2github:
                 r = csv.reader(f, delimiter=',', quotechar='"')
                 self.aliases = dict(r)
 
+        self.label_aliases = dict()
+        for label, alias in self.aliases.items():
+            if alias == 'DELETED':
+                self.label_aliases[label] = ()
+            elif alias == 'same':
+                self.label_aliases[label] = (label,)
+            else:
+                self.label_aliases[label] = (alias,)
+
     ##
     # Set custom github message
     #
@@ -111,34 +311,547 @@ class jira2github:
             self.dry_run = dry_run
 
     ##
-    # Html entity decode
+    # Set GitHub api url, useful for GitHub Enterprise
+    #
+    def set_github_api_url(self, github_api_url):
+        self.github_api_url = (github_api_url or self.GITHUB_API_URL).rstrip('/')
+        self.github_url = '{}/repos/{}/{}'.format(self.github_api_url, self.github_orga, self.github_repo)
+        if self.github_api_url == self.GITHUB_API_URL:
+            self.github_html_url = 'https://github.com'
+        else:
+            self.github_html_url = re.sub('/api/v3$', '', self.github_api_url)
+
+    ##
+    # Create the http session shared by all GitHub requests, keeping
+    # connections alive and retrying idempotent requests on transport errors
+    #
+    def set_http_config(self, pool_size, timeout, retries):
+        self.http_timeout = timeout if timeout is not None else 30
+        retry = Retry(
+            total=retries if retries is not None else 3,
+            backoff_factor=0.5,
+            status_forcelist=(500, 502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size if pool_size is not None else 10,
+            max_retries=retry,
+        )
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Accept'] = self.GITHUB_ACCEPT
+        if self.github_token is not None:
+            self.session.headers['Authorization'] = 'Token {}'.format(self.github_token)
+        else:
+            self.session.auth = (self.github_user, self.github_password)
+
+    ##
+    # Set the maximum request rate (requests per second) and burst size of
+    # each token
+    #
+    def set_rate_limit(self, max_rate, burst):
+        self.token_pool = TokenPool(
+            self.github_tokens or [None],
+            max_rate if max_rate is not None else 1.0,
+            burst if burst is not None else 1,
+            sleep=self._sleep,
+        )
+
+    ##
+    # Export timings and request metrics into a json report, or into a
+    # Prometheus textfile when the path ends with .prom
+    #
+    def set_metrics_path(self, metrics_path, interval=None):
+        self.metrics.path = metrics_path
+        if interval is not None:
+            self.metrics.interval = interval
+
+    ##
+    # Select how issues are created: one request per issue and comment
+    # (rest) or one request per issue with its comments (import)
+    #
+    def set_backend(self, backend):
+        if backend is not None:
+            self.backend = backend
+
+    ##
+    # Upload Jira attachments to a branch or to the assets of a release,
+    # named ref, with at most concurrency attachments transferred at once
+    #
+    def set_attachments(self, destination, ref=None, concurrency=None):
+        self.attachments_destination = destination
+        if ref is not None:
+            self.attachments_ref = ref
+        if concurrency is not None and concurrency > 0:
+            self.attachment_concurrency = concurrency
+
+    ##
+    # Set the number of issues migrated concurrently
+    #
+    def set_concurrency(self, concurrency):
+        if concurrency is not None and concurrency > 0:
+            self.concurrency = concurrency
+
+    ##
+    # Enable streaming xml extraction
+    #
+    def set_streaming(self, streaming):
+        if streaming is True:
+            self.streaming = streaming
+
+    ##
+    # Set the number of processes parsing several xml exports, the number
+    # of cores by default
+    #
+    def set_parse_workers(self, parse_workers):
+        if parse_workers is not None:
+            self.parse_workers = max(1, parse_workers)
+
+    ##
+    # Set the path of the snapshot caching extracted projects between runs
+    #
+    def set_snapshot_path(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+
+    ##
+    # Html entity decode, named and numeric entities
     #
     def htmlentitydecode(self, s):
         if s is None:
             return ''
 
         s = s.replace(' '*8, '')
-        return re.sub('&(%s);' % '|'.join(name2codepoint),
-            lambda m: chr(name2codepoint[m.group(1)]), s)
+        if '&' not in s:
+            return s
+
+        return self.ENTITY_PATTERN.sub(self._decode_entity, s)
+
+    def _decode_entity(self, match):
+        entity = match.group(0)
+        if entity[1] == '#':
+            return html.unescape(entity)
+
+        return html5.get(entity[1:], entity)
 
     ##
-    # Extract issues from xml
+    # Convert a Jira date into an ISO 8601 date
+    #
+    def _iso_date(self, date):
+        try:
+            return parsedate_to_datetime(date).isoformat()
+        except (TypeError, ValueError):
+            return None
 
+    ##
+    # Extract issues from xml
+    #
+    @timed('extract')
     def extract(self):
-        all_xml = objectify.fromstring(open(self.xml_path).read())
+        if self.jira_jql is not None:
+            return self._extract_jira()
 
-        for item in all_xml.channel.item:
-            self._add_to_projects(item)
+        if self._load_snapshot():
+            return
+
+        paths = self._xml_paths()
+        workers = min(self.parse_workers or os.cpu_count() or 1, len(paths))
+        if workers > 1:
+            duplicates = self._extract_parallel(paths, workers)
+        else:
+            seen = set()
+            duplicates = sum(self._add_parsed(self._parse_export(path), seen) for path in paths)
+
+        if duplicates > 0:
+            print('Skipped {} issues found in several exports'.format(duplicates))
+
+        self._save_snapshot()
 
     ##
-    # Add issues and informations into projects list
+    # Export files to extract: the xml path itself, the xml files of a
+    # directory or the files matching a glob, in a deterministic order
     #
-    def _add_to_projects(self, item):
+    def _xml_paths(self):
+        if os.path.isfile(self.xml_path):
+            return [self.xml_path]
+
+        if os.path.isdir(self.xml_path):
+            paths = glob.glob(os.path.join(glob.escape(self.xml_path), '*.xml'))
+        else:
+            paths = glob.glob(self.xml_path)
+
+        if len(paths) == 0:
+            raise FileNotFoundError('No Jira xml export found at {}'.format(self.xml_path))
+
+        return sorted(paths)
+
+    ##
+    # Parse exports in a pool of processes, merging their items in the
+    # order of the files as if they were parsed one after the other
+    #
+    def _extract_parallel(self, paths, workers):
+        print('Parsing {} xml exports with {} processes...'.format(len(paths), workers))
+        seen = set()
+        duplicates = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for parsed in executor.map(
+                parse_export,
+                paths,
+                repeat(self.streaming),
+                repeat((self.shard_index, self.shard_count, self.shard_by)),
+            ):
+                duplicates += self._add_parsed(parsed, seen)
+
+        return duplicates
+
+    ##
+    # Add parsed items, skipping the issues of overlapping exports whose key
+    # has already been added, returning the number of skipped issues
+    #
+    def _add_parsed(self, parsed, seen):
+        duplicates = 0
+        for proj, record, counts in parsed:
+            if record.key in seen:
+                duplicates += 1
+                continue
+
+            seen.add(record.key)
+            self._add_record(proj, record, counts)
+
+        return duplicates
+
+    ##
+    # Parse the items of one export, yielding the project, record and
+    # histogram counts of the issues of the shard
+    #
+    def _parse_export(self, path):
+        if self.streaming:
+            items = self._stream_items(path)
+        else:
+            items = objectify.fromstring(open(path).read()).channel.item
+
+        for item in items:
+            parsed = self._parse_item(item)
+            if parsed is not None:
+                yield parsed
+
+    ##
+    # Key identifying the export and the settings used to parse it
+    #
+    def _snapshot_key(self):
+        exports = []
+        for path in self._xml_paths():
+            stat = os.stat(path)
+            exports.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+
+        return hashlib.sha256(json.dumps([
+            self.SNAPSHOT_VERSION,
+            exports,
+            self.custom_github_message,
+            self.custom_comment_github_message,
+            self.shard_index,
+            self.shard_count,
+            self.shard_by,
+        ]).encode('utf-8')).hexdigest()
+
+    ##
+    # Load extracted projects from the snapshot if it matches the export
+    #
+    def _load_snapshot(self):
+        if self.snapshot_path is None:
+            return False
+
         try:
-            proj = item.project.get('key')
-        except AttributeError:
-            proj = item.key.text.split('-')[0]
+            with open(self.snapshot_path, 'rb') as fp:
+                key = pickle.load(fp)
+                if key != self._snapshot_key():
+                    return False
+                self.projects = pickle.load(fp)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return False
+
+        print('Loaded extracted projects from snapshot {}'.format(self.snapshot_path))
+        return True
+
+    ##
+    # Save extracted projects into the snapshot, the key being stored first
+    # so that a stale snapshot is detected without loading it
+    #
+    def _save_snapshot(self):
+        if self.snapshot_path is None:
+            return
+
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as fp:
+            pickle.dump(self._snapshot_key(), fp, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(self.projects, fp, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.snapshot_path)
+
+    ##
+    # Read items from xml one channel/item at a time, dropping each item
+    # once processed so memory does not grow with the export size
+    #
+    def _stream_items(self, path):
+        parser = etree.XMLPullParser(events=('end',), tag='item', remove_blank_text=True)
+        parser.set_element_class_lookup(objectify.ObjectifyElementClassLookup())
+
+        with open(path, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(self.STREAM_CHUNK_SIZE), b''):
+                parser.feed(chunk)
+                yield from self._consume_items(parser)
+
+        parser.close()
+        yield from self._consume_items(parser)
+
+    def _consume_items(self, parser):
+        for _, item in parser.read_events():
+            channel = item.getparent()
+            if channel is None or channel.tag != 'channel':
+                continue
+
+            yield item
+
+            item.clear()
+            while item.getprevious() is not None:
+                channel.remove(item.getprevious())
+
+    ##
+    # Start fetching issues from Jira: the first page is fetched right away,
+    # the next ones by a background thread feeding jira_issues, so that the
+    # migration starts before the fetch is over
+    #
+    def _extract_jira(self):
+        if self.jira is None:
+            raise RuntimeError('A Jira url, user and password are needed to fetch issues from Jira')
+
+        # Jira Cloud only paginates searches with a token, which older jira
+        # packages do not support: they keep paginating with startAt
+        self.jira_token_pages = (
+            self.jira.server_info().get('deploymentType') == 'Cloud'
+            and hasattr(self.jira, 'enhanced_search_issues')
+        )
+        first = self._search_jira(0)
+        if self.shard_count == 1:
+            self.jira_total = first.get('total')
+        self.jira_issues = queue.Queue()
+        self._jira_error = None
+        self._jira_fetcher = threading.Thread(target=self._fetch_jira, args=(first,), daemon=True)
+        self._jira_fetcher.start()
 
+    ##
+    # Fetch every page after the first one, pages being requested by a
+    # pool of workers and added to projects in order
+    #
+    def _fetch_jira(self, first):
+        try:
+            with self.metrics.timer('jira_fetch'):
+                seen = set()
+                self._add_jira_page(first, seen)
+
+                if self.jira_token_pages:
+                    # Token pages can only be fetched one after the other
+                    page = first
+                    while page.get('nextPageToken') and not self._stop.is_set():
+                        page = self._search_jira(next_page_token=page['nextPageToken'])
+                        self._add_jira_page(page, seen)
+                    return
+
+                starts = iter(range(len(first['issues']), first['total'], first['maxResults'] or self.jira_page_size))
+                with ThreadPoolExecutor(max_workers=self.jira_concurrency) as executor:
+                    pages = [
+                        executor.submit(self._search_jira, start) for start in islice(starts, self.jira_concurrency)
+                    ]
+                    while len(pages) > 0 and not self._stop.is_set():
+                        page = pages.pop(0).result()
+                        pages.extend(executor.submit(self._search_jira, start) for start in islice(starts, 1))
+                        self._add_jira_page(page, seen)
+        except BaseException as e:
+            self._jira_error = e
+        finally:
+            self.jira_issues.put(None)
+
+    ##
+    # Search one page of issues, with rendered fields so that descriptions
+    # and comments are html as in the xml export
+    #
+    def _search_jira(self, start=0, next_page_token=None):
+        begin = time.perf_counter()
+        if next_page_token is not None:
+            page = self.jira.enhanced_search_issues(
+                self.jira_jql,
+                nextPageToken=next_page_token,
+                maxResults=self.jira_page_size,
+                expand=self.JIRA_EXPAND,
+                json_result=True,
+            )
+        else:
+            page = self.jira.search_issues(
+                self.jira_jql,
+                startAt=start,
+                maxResults=self.jira_page_size,
+                expand=self.JIRA_EXPAND,
+                json_result=True,
+            )
+        self.metrics.observe('jira_request_duration_seconds', time.perf_counter() - begin, endpoint='search')
+
+        return page
+
+    ##
+    # Add the issues of a page to projects and queue them for migration,
+    # skipping issues already seen when results moved between pages
+    #
+    def _add_jira_page(self, page, seen):
+        for issue in page['issues']:
+            if issue['key'] in seen:
+                continue
+            seen.add(issue['key'])
+
+            item = self._jira_item(issue, page.get('names', {}), page.get('schema', {}))
+            with self._lock:
+                added = self._add_to_projects(item)
+            if added is not None:
+                self.jira_issues.put(added)
+
+    ##
+    # Wait for the end of the Jira fetch
+    #
+    def _join_jira(self):
+        if self.jira_issues is None:
+            return
+
+        self._jira_fetcher.join()
+        if self._jira_error is not None:
+            raise self._jira_error
+
+    ##
+    # Iterate over fetched issues as they arrive
+    #
+    def _fetched_issues(self):
+        while True:
+            entry = self.jira_issues.get()
+            if entry is None:
+                break
+            yield entry
+
+        self._join_jira()
+
+    ##
+    # Convert an issue of the Jira rest api into an xml export item, so that
+    # it is extracted exactly as the issues of an export
+    #
+    def _jira_item(self, issue, names, schema):
+        fields = issue['fields']
+        rendered = issue.get('renderedFields') or {}
+
+        def add(parent, tag, text=None, **attributes):
+            element = etree.SubElement(parent, tag, {k: str(v) for k, v in attributes.items() if v is not None})
+            if text is not None:
+                element.text = str(text)
+            return element
+
+        def name(value):
+            return value['name'] if value else None
+
+        item = etree.Element('item')
+        add(item, 'title', '[{}] {}'.format(issue['key'], fields['summary']))
+        add(item, 'link', '{}/browse/{}'.format(self.jira.server_url.rstrip('/'), issue['key']))
+        add(item, 'project', fields['project']['name'], key=fields['project']['key'])
+        add(item, 'description', rendered.get('description') or fields.get('description'))
+        add(item, 'key', issue['key'], id=issue['id'])
+        add(item, 'type', name(fields['issuetype']))
+        if fields.get('priority'):
+            add(item, 'priority', name(fields['priority']))
+        add(item, 'status', name(fields['status']))
+        add(item, 'reporter', username=self._jira_user(fields.get('reporter')))
+        add(item, 'created', self._jira_date(fields['created']))
+        if fields.get('resolutiondate'):
+            add(item, 'resolved', self._jira_date(fields['resolutiondate']))
+        for version in fields.get('versions') or []:
+            add(item, 'version', version['name'])
+        for version in fields.get('fixVersions') or []:
+            add(item, 'fixVersion', version['name'])
+        for component in fields.get('components') or []:
+            add(item, 'component', component['name'])
+        if fields.get('labels'):
+            labels = add(item, 'labels')
+            for label in fields['labels']:
+                add(labels, 'label', label)
+        if fields.get('attachment'):
+            attachments = add(item, 'attachments')
+            for attachment in fields['attachment']:
+                add(
+                    attachments,
+                    'attachment',
+                    id=attachment['id'],
+                    name=attachment['filename'],
+                    size=attachment['size'],
+                )
+
+        customfields = add(item, 'customfields')
+        for field_id, value in sorted(fields.items()):
+            if not field_id.startswith('customfield_') or value is None:
+                continue
+
+            customfield = add(customfields, 'customfield', id=field_id, key=schema.get(field_id, {}).get('custom'))
+            add(customfield, 'customfieldname', names.get(field_id, field_id))
+            values = add(customfield, 'customfieldvalues')
+            if rendered.get(field_id):
+                value = rendered[field_id]
+            for element in value if isinstance(value, list) else [value]:
+                if isinstance(element, dict):
+                    element = element.get('value', element.get('name'))
+                add(values, 'customfieldvalue', element)
+
+        comments = add(item, 'comments')
+        rendered_comments = (rendered.get('comment') or {}).get('comments') or []
+        for index, comment in enumerate((fields.get('comment') or {}).get('comments') or []):
+            body = rendered_comments[index]['body'] if index < len(rendered_comments) else comment['body']
+            add(
+                comments,
+                'comment',
+                body,
+                id=comment['id'],
+                author=self._jira_user(comment.get('author')),
+                created=self._jira_date(comment['created']),
+            )
+
+        return objectify.fromstring(etree.tostring(item))
+
+    ##
+    # Jira user name, account id on Jira Cloud which has no user names
+    #
+    def _jira_user(self, user):
+        if not user:
+            return None
+
+        return user.get('name') or user.get('accountId')
+
+    ##
+    # Convert a Jira rest api date into the date format of xml exports
+    #
+    def _jira_date(self, date):
+        date = datetime.datetime.strptime(date, self.JIRA_DATE_FORMAT)
+        return '{:%a}, {} {:%b %Y %H:%M:%S %z}'.format(date, date.day, date)
+
+    ##
+    # Add issues and informations into projects list, only keeping the raw
+    # fields needed to render the issue later. Issues of other shards are
+    # skipped.
+    #
+    def _add_to_projects(self, item):
+        parsed = self._parse_item(item)
+        if parsed is None:
+            return None
+
+        return self._add_record(*parsed)
+
+    ##
+    # Add a parsed record to its project and count its milestone, component
+    # and labels
+    #
+    def _add_record(self, proj, record, counts):
         if proj not in self.projects:
             self.projects[proj] = {
                 'Milestones': defaultdict(int),
@@ -147,71 +860,75 @@ class jira2github:
                 'Issues': []
             }
 
-        try:
-            resolved_at = '- _**Resolved at:**_ {resolved_at}'.format(resolved_at=item.resolved.text)
-        except AttributeError:
-            resolved_at = ''
+        self.projects[proj]['Issues'].append(record)
+        for histogram, value in counts:
+            self.projects[proj][histogram][value] += 1
 
-        body = '''
-> {custom_github_message}
+        return proj, record
 
-- _**Reporter:**_ {reporter}
-- _**Created at:**_ {created_at}
-{resolved_at}
+    ##
+    # Parse an item into its project, record and histogram counts, or None
+    # when the issue belongs to another shard
+    #
+    def _parse_item(self, item):
+        try:
+            proj = item.project.get('key')
+        except AttributeError:
+            proj = item.key.text.split('-')[0]
 
-{description}
-        '''
+        if not self._in_shard(proj, item.key.text):
+            return None
 
-        self.projects[proj]['Issues'].append(
-            {
-                'title': item.title.text,
-                'type': item.type.text,
-                'key': item.key.text,
-                'body': body.format(
-                    reporter=item.reporter.get('username'),
-                    created_at=item.created.text,
-                    description=self.htmlentitydecode(item.description.text),
-                    resolved_at=resolved_at,
-                    custom_github_message=self.custom_github_message.format(
-                        issue_link=item.link.text,
-                    ),
-                ),
-                'labels': [item.status.text, item.type.text],
-                'comments': [],
-            }
+        try:
+            resolved = item.resolved.text
+        except AttributeError:
+            resolved = None
+
+        record = IssueRecord(
+            item.key.text,
+            item.title.text,
+            item.type.text,
+            item.link.text,
+            item.reporter.get('username'),
+            item.created.text,
+            resolved,
+            item.description.text,
         )
+        counts = []
+
+        record.labels.append(item.status.text)
+        record.labels.append(item.type.text)
 
         try:
-            self.projects[proj]['Milestones'][item.fixVersion.text] += 1
-            # this prop will be deleted later:
-            self.projects[proj]['Issues'][-1]['milestone_name'] = item.fixVersion.text
+            counts.append(('Milestones', item.fixVersion.text))
+            record.milestone_name = item.fixVersion.text
         except AttributeError:
             pass
 
         try:
-            self.projects[proj]['Components'][item.component.text] += 1
-            self.projects[proj]['Issues'][-1]['labels'].append(item.component.text)
+            counts.append(('Components', item.component.text))
+            record.labels.append(item.component.text)
         except AttributeError:
             pass
 
         try:
             for version in item.version:
                 if re.match('^(\d+.){3}\d+$', version.text) is not None:
-                    self.projects[proj]['Labels'][version.text] += 1
-                    self.projects[proj]['Issues'][-1]['labels'].append(version.text)
+                    counts.append(('Labels', version.text))
+                    record.labels.append(version.text)
         except AttributeError:
             pass
 
         try:
-            self.projects[proj]['Labels'][item.priority.text] += 1
-            self.projects[proj]['Issues'][-1]['labels'].append(item.priority.text)
+            counts.append(('Labels', item.priority.text))
+            record.labels.append(item.priority.text)
         except AttributeError:
             pass
 
         try:
             for label in item.labels.label:
-                self.projects[proj]['Labels'][label.text] += 1
-                self.projects[proj]['Issues'][-1]['labels'].append(label.text)
+                counts.append(('Labels', label.text))
+                record.labels.append(label.text)
         except AttributeError:
             pass
 
@@ -225,24 +942,101 @@ class jira2github:
                     field_value = customfield.customfieldvalues.text
 
                 if customfield.customfieldname.text in ['Story Points']:
-                    self.projects[proj]['Labels'][field_value] += 1
-                    self.projects[proj]['Issues'][-1]['labels'].append(str(field_value))
+                    counts.append(('Labels', field_value))
+                    record.labels.append(str(field_value))
                 elif customfield.customfieldname.text in ['How to reproduce the issue ?']:
-                    body = '''
-* {field_name}
+                    record.fields.append((customfield.customfieldname.text, field_value))
+        except AttributeError:
+            pass
 
-{field_value}
-                    '''
-                    self.projects[proj]['Issues'][-1]['body'] += body.format(
-                        field_name=customfield.customfieldname.text,
-                        field_value=field_value
-                    )
+        try:
+            for attachment in item.attachments.attachment:
+                record.attachments.append(
+                    (attachment.get('id'), attachment.get('name'), int(attachment.get('size') or 0))
+                )
         except AttributeError:
             pass
 
         try:
+            for comment in item.comments.comment:
+                record.comments.append(
+                    CommentRecord(
+                        comment.get('id'),
+                        comment.get('author'),
+                        comment.get('created'),
+                        comment.text,
+                    )
+                )
+        except AttributeError:
+            pass
+
+        return proj, record, counts
+
+    ##
+    # Render the github issue of a record
+    #
+    def _render_issue(self, record, milestone=None):
+        if record.resolved is not None:
+            resolved_at = '- _**Resolved at:**_ {resolved_at}'.format(resolved_at=record.resolved)
+        else:
+            resolved_at = ''
 
-            body = '''
+        links = self._attachment_links(record)
+        if len(links) > 0:
+            attachments = '\n- _**Attachments:**_ {}'.format(
+                ', '.join('[{}]({})'.format(name, url) for name, url in links.items())
+            )
+        else:
+            attachments = ''
+
+        body = '''
+> {custom_github_message}
+
+- _**Reporter:**_ {reporter}
+- _**Created at:**_ {created_at}
+{resolved_at}{attachments}
+
+{description}
+        '''.format(
+            reporter=record.reporter,
+            created_at=record.created,
+            description=self._link_attachments(
+                self.markup.convert(self.htmlentitydecode(record.description)),
+                links,
+            ),
+            resolved_at=resolved_at,
+            attachments=attachments,
+            custom_github_message=self.custom_github_message.format(
+                issue_link=record.link,
+            ),
+        )
+
+        for field_name, field_value in record.fields:
+            body += '''
+* {field_name}
+
+{field_value}
+                    '''.format(
+                field_name=field_name,
+                field_value=field_value
+            )
+
+        return {
+            'title': record.title,
+            'type': record.type,
+            'key': record.key,
+            'body': body,
+            'labels': self._resolve_labels(record.labels),
+            'milestone': milestone,
+            'created_at': self._iso_date(record.created),
+            'closed_at': self._iso_date(record.resolved),
+        }
+
+    ##
+    # Render the github comments of a record
+    #
+    def _render_comments(self, record):
+        body = '''
 > {custom_comment_github_message}
 
 - _**Author:**_ {author}
@@ -250,24 +1044,29 @@ class jira2github:
 
 {description}
         '''
-            for comment in item.comments.comment:
-                self.projects[proj]['Issues'][-1]['comments'].append(
-                    body.format(
-                        author=comment.get('author'),
-                        created_at=comment.get('created'),
-                        description=self.htmlentitydecode(comment.text),
-                        custom_comment_github_message=self.custom_comment_github_message.format(
-                            issue_comment_link=item.link.text + '#comment-' + comment.get('id')
-                        ),
-                    )
-                )
-        except AttributeError:
-            pass
+
+        links = self._attachment_links(record)
+        return [
+            {
+                'body': body.format(
+                    author=comment.author,
+                    created_at=comment.created,
+                    description=self._link_attachments(self.markup.convert(self.htmlentitydecode(comment.text)), links),
+                    custom_comment_github_message=self.custom_comment_github_message.format(
+                        issue_comment_link=record.link + '#comment-' + comment.id
+                    ),
+                ),
+                'created_at': self._iso_date(comment.created),
+            }
+            for comment in record.comments
+        ]
 
     ##
     # Prettify data
     #
     def prettify(self):
+        self._join_jira()
+
         def hist(h):
             for key in h.keys():
                 print('%30s(%5d): ' % (key, h[key]) + h[key]*'#')
@@ -285,8 +1084,123 @@ class jira2github:
             print('')
 
     ##
-    # Check for github milestones
+    # Count the requests the migration still has to send and estimate its
+    # duration from the rate limits of the tokens, the configured pacing and
+    # the latency of the requests sent to list milestones and labels
     #
+    @timed('plan')
+    def plan(self):
+        self._join_jira()
+
+        milestones = len(self._missing_milestones())
+        labels = len(self._missing_labels())
+        # One upload per distinct file, attachments with the same name and
+        # size being most likely the same file, after checking the destination
+        attachments = len(set(self._pending_attachments().values()))
+        if attachments > 0:
+            attachments += 1
+        budgets = []
+        for limit in self._rate_limits():
+            core = (limit.get('resources') or {}).get('core') or {}
+            if 'remaining' in core:
+                budgets.append((core['remaining'], core['reset'] - time.time(), core['limit']))
+            else:
+                budgets.append((float('inf'), float('inf'), float('inf')))
+
+        counts = {}
+        for proj in iter(self.projects.keys()):
+            count = defaultdict(int)
+            for record in self.projects[proj]['Issues']:
+                progress = self.partial_issues.get(proj, {}).get(record.key)
+                if progress is not None:
+                    count['comments'] += progress['comments'] - progress['posted']
+                elif record.key not in self.cached_data.get(proj, {}):
+                    count['issues'] += 1
+                    if self.backend == self.BACKEND_REST:
+                        count['comments'] += len(record.comments)
+                    if self.jira is not None:
+                        count['backlinks'] += 1
+            if self.backend == self.BACKEND_IMPORT:
+                count['polls'] = -(-count['issues'] // self.IMPORT_POLL_BATCH)
+            counts[proj] = count
+
+        latency, measured = self.metrics.mean('request_duration_seconds')
+        max_rate = self.token_pool.limiters[0][1].max_rate
+        concurrency_rate = self.concurrency / latency if latency else float('inf')
+        planner = Planner(max_rate, budgets, self.GITHUB_RATE_LIMIT_WINDOW)
+        schedule = planner.schedule(
+            [milestones + labels + attachments] + [
+                count['issues'] + count['comments'] + count['polls'] for count in counts.values()
+            ],
+            concurrency_rate,
+        )
+
+        print('Migration plan:')
+        print('')
+        for index, (remaining, reset, limit) in enumerate(budgets):
+            if limit == float('inf'):
+                print('    Token {}: no rate limit'.format(index + 1))
+            else:
+                print('    Token {}: {}/{} requests remaining, reset in {}'.format(
+                    index + 1, remaining, limit, self._format_duration(reset)
+                ))
+        if max_rate == float('inf'):
+            pacing = 'no maximum rate'
+        else:
+            pacing = 'at most {:.2f} requests/s'.format(max_rate * len(budgets))
+        print('    Pacing: {}, {} concurrent requests of {} ({} requests measured)'.format(
+            pacing,
+            self.concurrency,
+            '{:.0f} ms'.format(latency * 1000) if latency else 'unknown latency',
+            measured,
+        ))
+        print('    Milestones: {}, labels: {}, attachments: {}, done in {}'.format(
+            milestones, labels, attachments, self._format_duration(schedule[0][0])
+        ))
+        for (proj, count), (finish, peak) in zip(counts.items(), schedule[1:]):
+            print('    {}: {} issues, {} comments{}, {} backlinks, peak {:.2f} requests/s, done in {}'.format(
+                proj,
+                count['issues'],
+                count['comments'],
+                ', {} import polls'.format(count['polls']) if self.backend == self.BACKEND_IMPORT else '',
+                count['backlinks'],
+                peak,
+                self._format_duration(finish),
+            ))
+        if self.backlinks is not None and len(self.backlinks.pending) + len(self.backlinks.failed) > 0:
+            print('    Backlinks of previous runs: {}'.format(len(self.backlinks.pending) + len(self.backlinks.failed)))
+
+        requests = milestones + labels + attachments + sum(
+            count['issues'] + count['comments'] + count['polls'] for count in counts.values()
+        )
+        finish = schedule[-1][0]
+        print('')
+        print('Total GitHub requests: {}'.format(requests))
+        if finish == float('inf'):
+            print('Estimated completion: never, no rate limit budget left')
+        else:
+            print('Estimated completion: {} ({:%Y-%m-%d %H:%M})'.format(
+                self._format_duration(finish),
+                datetime.datetime.now() + datetime.timedelta(seconds=finish),
+            ))
+
+        return {'requests': requests, 'seconds': finish}
+
+    def _format_duration(self, seconds):
+        if seconds == float('inf'):
+            return 'never'
+
+        minutes, seconds = divmod(int(round(seconds)), 60)
+        hours, minutes = divmod(minutes, 60)
+        days, hours = divmod(hours, 24)
+        duration = '{}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+
+        return '{}d {}'.format(days, duration) if days else duration
+
+    ##
+    # Index all github milestones by title and create the missing ones
+    #
+    @timed('milestones')
     def milestones(self):
         print('Making milestones...', self.github_url + '/milestones')
         print('')
@@ -294,80 +1208,730 @@ class jira2github:
         if self.dry_run:
             return
 
-        r = self._execute_request(
-            self.METHOD_GET,
+        missing = self._missing_milestones()
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for title, response in zip(missing, executor.map(self._create_milestone, missing)):
+                if response.status_code == 201:
+                    self.milestone_numbers[title] = response.json()['number']
+                else:
+                    failed.append(title)
+
+        # Milestones may have been created meanwhile by another shard
+        if len(failed) > 0:
+            for milestone in self._get_all_pages(self.github_url + '/milestones?state=all&per_page=100'):
+                self.milestone_numbers[milestone['title']] = milestone['number']
+            for title in failed:
+                if title not in self.milestone_numbers:
+                    print('Could not create milestone {}'.format(title))
+
+    ##
+    # Milestones of the extracted projects not existing on github yet
+    #
+    def _missing_milestones(self):
+        for milestone in self._get_all_pages(self.github_url + '/milestones?state=all&per_page=100'):
+            self.milestone_numbers[milestone['title']] = milestone['number']
+
+        titles = set()
+        with self._lock:
+            for proj in iter(self.projects.keys()):
+                titles.update(self.projects[proj]['Milestones'].keys())
+
+        return sorted(titles.difference(self.milestone_numbers))
+
+    ##
+    # Create a milestone first seen while fetching issues from Jira
+    #
+    def _ensure_milestone(self, title):
+        if title not in self.milestone_numbers:
+            response = self._create_milestone(title)
+            if response.status_code != 201:
+                print('Could not create milestone {}: {}'.format(title, response.status_code))
+                return None
+            self.milestone_numbers[title] = response.json()['number']
+
+        return self.milestone_numbers[title]
+
+    def _create_milestone(self, title):
+        return self._execute_request(
+            self.METHOD_POST,
             self.github_url + '/milestones',
+            json.dumps({'title': title}),
         )
 
-        def find_in_milestones(response, title):
-            for milestone in response:
-                if mkey == milestone['title']:
-                    return True
-            return False
+    ##
+    # Fetch all items of a paginated github list
+    #
+    def _get_all_pages(self, url, headers=None):
+        while url is not None:
+            response = self._execute_request(self.METHOD_GET, url, headers=headers)
+            if response.status_code != 200:
+                raise RuntimeError('Could not fetch {}: {}'.format(url, response.status_code))
 
-        response_json = r.json()
+            for element in response.json():
+                yield element
 
-        for proj in iter(self.projects.keys()):
-            for mkey in iter(self.projects[proj]['Milestones'].keys()):
-                if find_in_milestones(response_json, mkey) is False:
-                    self.projects[proj]['Milestones'][mkey] = None
+            url = response.links.get('next', {}).get('url')
+
+    ##
+    # Resolve Jira labels into github labels using aliases
+    #
+    def _resolve_labels(self, labels):
+        return [
+            resolved
+            for label in labels
+            for resolved in self.label_aliases.get(label, (label,))
+        ]
+
+    ##
+    # Create every label the issues will use, before posting them, so that
+    # github does not create them lazily with default colors
+    #
+    @timed('labels')
+    def labels(self):
+        print('Making labels...', self.github_url + '/labels')
+        print('')
+
+        if self.dry_run:
+            return
+
+        missing = self._missing_labels()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for name, response in zip(missing, executor.map(self._create_label, missing)):
+                if response.status_code != 201:
+                    print('Could not create label {}: {}'.format(name, response.status_code))
+                self.label_names.add(name.lower())
+
+    ##
+    # Labels of the extracted issues not existing on github yet, issue status
+    # and type included although they are not counted in the Labels histogram
+    #
+    def _missing_labels(self):
+        for label in self._get_all_pages(self.github_url + '/labels?per_page=100'):
+            self.label_names.add(label['name'].lower())
+
+        names = set()
+        with self._lock:
+            for proj in iter(self.projects.keys()):
+                for record in self.projects[proj]['Issues']:
+                    names.update(self._resolve_labels(record.labels))
+
+        return sorted(name for name in names if name.lower() not in self.label_names)
+
+    ##
+    # Create the labels first seen while fetching issues from Jira
+    #
+    def _ensure_labels(self, labels):
+        for name in self._resolve_labels(labels):
+            if name.lower() not in self.label_names:
+                response = self._create_label(name)
+                if response.status_code != 201:
+                    print('Could not create label {}: {}'.format(name, response.status_code))
+                self.label_names.add(name.lower())
+
+    def _create_label(self, name):
+        return self._execute_request(
+            self.METHOD_POST,
+            self.github_url + '/labels',
+            json.dumps({
+                'name': name,
+                'color': hashlib.md5(name.encode('utf-8')).hexdigest()[:6],
+            }),
+        )
+
+    ##
+    # Upload the Jira attachments of the extracted issues before migrating
+    # them, so that issues link to their uploaded files. Each attachment is
+    # streamed from Jira into a temporary file while being hashed, and each
+    # distinct content is uploaded once, whatever the number of issues it is
+    # attached to.
+    #
+    @timed('attachments')
+    def attachments(self):
+        if self.attachments_destination is None or self.dry_run:
+            return
+        if self.jira is None:
+            raise RuntimeError('A Jira url, user and password are needed to download attachments')
+
+        self._join_jira()
+        pending = self._pending_attachments()
+        print('Uploading {} attachments to {} {}...'.format(
+            len(pending), self.attachments_destination, self.attachments_ref
+        ))
+        print('')
+        if len(pending) == 0:
+            return
+
+        self._ensure_attachments_destination()
+        results = defaultdict(int)
+        failed = []
+        inflight = set()
+
+        def collect(futures):
+            for future in futures:
+                attachment_id, name, result = future.result()
+                results[result] += 1
+                if result not in ('uploaded', 'duplicate'):
+                    failed.append('{} {} ({})'.format(attachment_id, name, result))
+
+        workers = self.attachment_concurrency or self.concurrency
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.jira_session.mount('https://', adapter)
+        self.jira_session.mount('http://', adapter)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for attachment_id, (name, _) in pending.items():
+                if len(inflight) >= workers * 2:
+                    finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                    collect(finished)
+
+                inflight.add(executor.submit(self._migrate_attachment, attachment_id, name))
+
+            collect(inflight)
+
+        self.attachment_store.save()
+        print('Attachments: {} uploaded, {} duplicates, {} failed'.format(
+            results['uploaded'], results['duplicate'], len(failed)
+        ))
+        if len(failed) > 0:
+            print('Could not upload: {}'.format(', '.join(failed)))
+
+    ##
+    # Names and sizes of the attachments not uploaded yet by attachment id
+    #
+    def _pending_attachments(self):
+        pending = {}
+        if self.attachments_destination is None:
+            return pending
+
+        with self._lock:
+            for proj in iter(self.projects.keys()):
+                for record in self.projects[proj]['Issues']:
+                    for attachment_id, name, size in record.attachments:
+                        if self.attachment_store.url(attachment_id) is None:
+                            pending[attachment_id] = (name, size)
+
+        return pending
+
+    ##
+    # Create the branch or the release receiving the attachments when it
+    # does not exist yet
+    #
+    def _ensure_attachments_destination(self):
+        ref = quote(self.attachments_ref, safe='')
+        if self.attachments_destination == self.ATTACHMENTS_RELEASE:
+            response = self._execute_request(self.METHOD_GET, self.github_url + '/releases/tags/' + ref)
+            if response.status_code == 404:
+                response = self._execute_request(
+                    self.METHOD_POST,
+                    self.github_url + '/releases',
+                    json.dumps({'tag_name': self.attachments_ref, 'name': 'Jira attachments'}),
+                )
+            if response.status_code not in (200, 201):
+                raise RuntimeError('Could not create release {}: {}'.format(
+                    self.attachments_ref, response.status_code
+                ))
+            self._upload_url = response.json()['upload_url'].split('{', 1)[0]
+            return
+
+        response = self._execute_request(self.METHOD_GET, self.github_url + '/branches/' + ref)
+        if response.status_code != 404:
+            return
+
+        # New branch starting from the head of the default branch
+        default_branch = self._execute_request(self.METHOD_GET, self.github_url).json()['default_branch']
+        head = self._execute_request(
+            self.METHOD_GET,
+            self.github_url + '/git/ref/heads/' + quote(default_branch, safe=''),
+        )
+        response = self._execute_request(
+            self.METHOD_POST,
+            self.github_url + '/git/refs',
+            json.dumps({'ref': 'refs/heads/' + self.attachments_ref, 'sha': head.json()['object']['sha']}),
+        )
+        if response.status_code != 201:
+            raise RuntimeError('Could not create branch {}: {}'.format(self.attachments_ref, response.status_code))
+
+    ##
+    # Download an attachment and upload its content unless an identical
+    # file has already been uploaded, returning the attachment id, its name
+    # and the result
+    #
+    def _migrate_attachment(self, attachment_id, name):
+        path = None
+        try:
+            path, digest = self._download_attachment(attachment_id, name)
+            if not self.attachment_store.claim(digest):
+                self.attachment_store.add(attachment_id, digest)
+                return attachment_id, name, 'duplicate'
+
+            url = None
+            try:
+                url, status = self._upload_attachment(path, digest, name)
+            finally:
+                self.attachment_store.release(digest, url)
+            if url is None:
+                return attachment_id, name, status
+
+            self.attachment_store.add(attachment_id, digest)
+            return attachment_id, name, 'uploaded'
+        except requests.HTTPError as e:
+            return attachment_id, name, e.response.status_code
+        except (requests.RequestException, OSError) as e:
+            return attachment_id, name, type(e).__name__
+        finally:
+            if path is not None:
+                os.remove(path)
+
+    ##
+    # Stream an attachment into a temporary file, returning its path and the
+    # sha256 of its content
+    #
+    def _download_attachment(self, attachment_id, name):
+        url = '{}/secure/attachment/{}/{}'.format(
+            self.jira.server_url.rstrip('/'), quote(attachment_id, safe=''), quote(name, safe='')
+        )
+        start = time.perf_counter()
+        digest = hashlib.sha256()
+        fd, path = tempfile.mkstemp(prefix='jira2github-')
+        try:
+            with os.fdopen(fd, 'wb') as fp, self.jira_session.get(
+                url, stream=True, timeout=self.http_timeout
+            ) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(self.STREAM_CHUNK_SIZE):
+                    digest.update(chunk)
+                    fp.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        self.metrics.observe('jira_request_duration_seconds', time.perf_counter() - start, endpoint='attachment')
+
+        return path, digest.hexdigest()
+
+    ##
+    # Upload a file to the attachments branch or release, returning its url,
+    # None with the response status when the upload failed
+    #
+    def _upload_attachment(self, path, digest, name):
+        if self.attachments_destination == self.ATTACHMENTS_RELEASE:
+            asset = '{}-{}'.format(digest[:16], name)
+            response = self._execute_request(
+                self.METHOD_POST,
+                self._upload_url + '?' + urlencode({'name': asset}),
+                FileBody(path, self.STREAM_CHUNK_SIZE),
+                {'Content-Type': mimetypes.guess_type(name)[0] or 'application/octet-stream'},
+            )
+            if response.status_code == 201:
+                return response.json()['browser_download_url'], response.status_code
+            # Uploaded by a previous run whose store was lost
+            if response.status_code == 422 and 'already_exists' in response.text:
+                return '{}/{}/{}/releases/download/{}/{}'.format(
+                    self.github_html_url, self.github_orga, self.github_repo,
+                    quote(self.attachments_ref), quote(asset),
+                ), response.status_code
+            return None, response.status_code
+
+        # Files are stored under their hash, commits to a branch being
+        # serialized as github rejects concurrent ones
+        file_path = '{}/{}'.format(digest, quote(name))
+        with self._branch_lock:
+            response = self._execute_request(
+                self.METHOD_PUT,
+                self.github_url + '/contents/' + file_path,
+                ContentsBody(path, self.STREAM_CHUNK_SIZE, {
+                    'message': 'Add Jira attachment {}'.format(name),
+                    'branch': self.attachments_ref,
+                }),
+            )
+        # Files are only rejected when they exist, which is then the same
+        # content uploaded by a previous run whose store was lost
+        if response.status_code == 422:
+            existing = self._execute_request(
+                self.METHOD_GET,
+                self.github_url + '/contents/' + file_path + '?' + urlencode({'ref': self.attachments_ref}),
+            )
+            if existing.status_code != 200:
+                return None, response.status_code
+        elif response.status_code != 201:
+            return None, response.status_code
+
+        return '{}/{}/{}/blob/{}/{}?raw=true'.format(
+            self.github_html_url, self.github_orga, self.github_repo, quote(self.attachments_ref), file_path
+        ), response.status_code
+
+    ##
+    # Urls of the uploaded attachments of a record by file name, the last
+    # attachment winning when several have the same name
+    #
+    def _attachment_links(self, record):
+        links = {}
+        for attachment_id, name, _ in record.attachments:
+            url = self.attachment_store.url(attachment_id)
+            if url is not None:
+                links[name] = url
+
+        return links
+
+    ##
+    # Point the images of a converted text to their uploaded attachment
+    #
+    def _link_attachments(self, text, links):
+        if not links or not text:
+            return text
+
+        def replace(match):
+            name = match.group(1)
+            if name not in links:
+                return match.group(0)
+            return '![{}]({})'.format(name, links[name])
+
+        return self.ATTACHMENT_IMAGE_PATTERN.sub(replace, text)
+
+    ##
+    # Rebuild the cache from the issues existing on github, the Jira key of
+    # each issue being taken from its title or from its link to Jira. Issues
+    # of the extracted projects with fewer comments on github than in Jira
+    # are resumed from their last posted comment.
+    #
+    @timed('reconcile')
+    def reconcile(self):
+        print('Reconciling cache with github issues...', self.github_url + '/issues')
+        print('')
+
+        self._join_jira()
+        records = {}
+        with self._lock:
+            for proj in iter(self.projects.keys()):
+                for record in self.projects[proj]['Issues']:
+                    records[record.key] = (proj, record)
+
+        cached_data = {}
+        partial_issues = {}
+        duplicates = []
+        for issue in self._get_all_pages(
+            self.github_url + '/issues?state=all&sort=created&direction=asc&per_page=100',
+            {'Accept': self.GITHUB_RAW_ACCEPT},
+        ):
+            if 'pull_request' in issue:
+                continue
+
+            match = self.JIRA_TITLE_KEY_PATTERN.match(issue['title'] or '') \
+                or self.JIRA_LINK_KEY_PATTERN.search(issue.get('body') or '')
+            if match is None:
+                continue
+
+            key = match.group(1)
+            proj, record = records.get(key, (key.rsplit('-', 1)[0], None))
+            if key in cached_data.get(proj, {}):
+                duplicates.append(issue['html_url'])
+                continue
+
+            cached_data.setdefault(proj, {})[key] = issue['html_url']
+            if record is not None and issue['comments'] < len(record.comments):
+                partial_issues.setdefault(proj, {})[key] = {
+                    'number': issue['number'],
+                    'comments': len(record.comments),
+                    'posted': issue['comments'],
+                }
+
+        with self._lock:
+            self.cached_data = cached_data
+            self.partial_issues = partial_issues
+
+        print('Issues found on github: {}'.format(sum(len(issues) for issues in cached_data.values())))
+        print('Issues with missing comments: {}'.format(sum(len(issues) for issues in partial_issues.values())))
+        if len(duplicates) > 0:
+            print('Duplicated issues: {}'.format(', '.join(duplicates)))
+
+    ##
+    # Rewrite the Jira keys mentioned by migrated issues and comments into
+    # links to their github issue, only updating the bodies which changed
+    #
+    @timed('rewrite_references')
+    def rewrite_references(self):
+        references = {}
+        numbers = set()
+        with self._lock:
+            for issues in self.cached_data.values():
+                for key, url in issues.items():
+                    # Dry runs cache the rendered issue instead of its url
+                    if isinstance(url, str):
+                        references[key] = self._reference(key, url)
+                        numbers.add(url.rstrip('/').rsplit('/', 1)[1])
+
+        print('Rewriting references to {} migrated issues...'.format(len(references)))
+        print('')
+
+        scanned = defaultdict(int)
+        rewritten = defaultdict(int)
+        failed = []
+        pending = set()
+
+        def collect(futures):
+            for future in futures:
+                url, response = future.result()
+                if response.status_code != 200:
+                    failed.append('{} ({})'.format(url, response.status_code))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for kind, url, body in self._referencing_bodies(numbers):
+                scanned[kind] += 1
+                body = body or ''
+                rewritten_body = self._rewrite_references(body, references)
+                if rewritten_body == body:
+                    continue
+
+                rewritten[kind] += 1
+                if self.dry_run:
+                    continue
+
+                if len(pending) >= self.concurrency * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+
+                pending.add(executor.submit(self._patch_body, url, rewritten_body))
+
+            collect(pending)
+
+        for kind in ['issue', 'comment']:
+            print('{}s: {} scanned, {} rewritten'.format(kind.capitalize(), scanned[kind], rewritten[kind]))
+        if len(failed) > 0:
+            print('Could not update: {}'.format(', '.join(failed)))
+
+    ##
+    # Bodies of migrated issues and comments with the url updating them
+    #
+    def _referencing_bodies(self, numbers):
+        headers = {'Accept': self.GITHUB_RAW_ACCEPT}
+        for issue in self._get_all_pages(self.github_url + '/issues?state=all&per_page=100', headers):
+            if 'pull_request' not in issue and str(issue['number']) in numbers:
+                yield 'issue', self.github_url + '/issues/' + str(issue['number']), issue.get('body')
+
+        for comment in self._get_all_pages(self.github_url + '/issues/comments?per_page=100', headers):
+            if comment['issue_url'].rstrip('/').rsplit('/', 1)[1] in numbers:
+                yield 'comment', self.github_url + '/issues/comments/' + str(comment['id']), comment.get('body')
+
+    ##
+    # Markdown reference to a migrated issue, a plain #number when it is in
+    # the migrated repository
+    #
+    def _reference(self, key, url):
+        match = re.search(
+            self.GITHUB_ISSUE_PATH_PATTERN.format(re.escape(self.github_orga), re.escape(self.github_repo)),
+            url,
+        )
+        if match is not None:
+            return '#' + match.group(1)
+
+        return '[{}]({})'.format(key, url)
+
+    ##
+    # Replace migrated Jira keys in one scan of the text, each key found
+    # being looked up among the migrated ones
+    #
+    def _rewrite_references(self, text, references):
+        def replace(match):
+            key = match.group('key')
+            if key is None:
+                return match.group(0)
+            return references.get(key, key)
+
+        return self.REFERENCE_PATTERN.sub(replace, text)
+
+    def _patch_body(self, url, body):
+        return url, self._execute_request(self.METHOD_PATCH, url, json.dumps({'body': body}))
 
     ##
-    # Migrate issue to github
+    # Migrate issue to github, each issue and its comments being posted by
+    # one of the concurrent workers
     #
+    @timed('migrate')
     def migrate(self):
-        for proj in iter(self.projects.keys()):
-            print('Creating issue for proj {}...'.format(proj))
-            bar = progressbar.ProgressBar(max_value=len(self.projects[proj]['Issues']))
-            self.migration_errors = {
-                'milestone': [],
-                'github': [],
-            }
-            for index, issue in enumerate(self.projects[proj]['Issues']):
-                # Check if this issue has already been created on github
-                if proj in self.cached_data and issue['key'] in self.cached_data[proj]:
-                    bar.update(index)
+        self.migration_errors = {
+            'milestone': [],
+            'github': [],
+        }
+        self._stop.clear()
+
+        # Imports submitted by a previous run are checked first
+        self._poll_imports(wait=True)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                if self.jira_issues is not None:
+                    print('Creating issues fetched from Jira...')
+                    self._migrate_issues(executor, self._fetched_issues(), self.jira_total)
+                else:
+                    for proj in iter(self.projects.keys()):
+                        print('Creating issue for proj {}...'.format(proj))
+                        issues = self.projects[proj]['Issues']
+                        self._migrate_issues(executor, ((proj, record) for record in issues), len(issues))
+            except BaseException:
+                self._stop.set()
+                raise
+
+        if self.backlinks is not None:
+            self.backlinks.join()
+
+    ##
+    # Migrate again only the issues recorded in the errors file. Issues which
+    # failed with a transient error are retried in rounds with an exponential
+    # backoff, while validation errors are kept without being retried.
+    #
+    @timed('retry_errors')
+    def retry_errors(self):
+        self._join_jira()
+        self._poll_imports(wait=True)
+        recorded = self._load_errors(self.errors_path)
+
+        keys = set()
+        permanent = 0
+        for error in recorded['github']:
+            if self._is_transient(error):
+                keys.add(self._error_key(error))
+            else:
+                permanent += 1
+        for title in recorded['milestone']:
+            keys.add(self._title_key(title))
+
+        with self._lock:
+            issues = [
+                (proj, record)
+                for proj in iter(self.projects.keys())
+                for record in self.projects[proj]['Issues']
+                if record.key in keys
+            ]
+        print('Retrying {} issues, skipping {} permanent errors'.format(len(issues), permanent))
+
+        # Errors of this run, appended to the recorded ones when saved
+        errors = {'milestone': [], 'github': []}
+        for attempt in range(self.RETRY_ROUNDS):
+            issues = [(proj, record) for proj, record in issues if not self._is_migrated(record.key)]
+            if len(issues) == 0:
+                break
+
+            if attempt > 0:
+                delay = min(self.RETRY_BACKOFF * 2 ** (attempt - 1), self.RETRY_MAX_BACKOFF)
+                print('Retrying {} issues in {} seconds'.format(len(issues), delay))
+                self._sleep(delay)
+
+            self.migration_errors = {'milestone': [], 'github': []}
+            self._stop.clear()
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                try:
+                    self._migrate_issues(executor, iter(issues), len(issues))
+                except StopIteration:
+                    pass
+            round_errors = self.migration_errors
+            errors = self._merge_errors(errors, round_errors)
+
+            # Issues without milestone or rejected as invalid would fail again
+            failed = {self._title_key(title) for title in round_errors['milestone']}
+            for error in round_errors['github']:
+                if not self._is_transient(error):
+                    failed.add(self._error_key(error))
+            issues = [(proj, record) for proj, record in issues if record.key not in failed]
+
+        if self.backlinks is not None:
+            self.backlinks.join()
+
+        self.migration_errors = errors
+
+    ##
+    # Queue issues, keeping at most two issues per worker in flight
+    #
+    def _migrate_issues(self, executor, issues, total):
+        bar = progressbar.ProgressBar(max_value=total if total is not None else progressbar.UnknownLength)
+
+        # Issues created in Jira while fetching come on top of the total of
+        # the first search page
+        def progress(done):
+            if total is not None and done > bar.max_value:
+                bar.max_value = done
+            bar.update(done)
+
+        pending = set()
+        done = 0
+        poll_at = self.IMPORT_POLL_BATCH
+        with self._lock:
+            importing = {issue['key'] for _, issue, _ in self.pending_imports.values()}
+
+        for proj, record in issues:
+            if self._stop.is_set():
+                break
+
+            # Check if this issue has already been created on github with all
+            # its comments, or is still being imported
+            if (proj in self.cached_data and record.key in self.cached_data[proj]
+                    and record.key not in self.partial_issues.get(proj, {})) or record.key in importing:
+                done += 1
+                progress(done)
+                continue
+
+            # Check for milestone
+            milestone = None
+            if record.milestone_name is not None:
+                milestone = self.milestone_numbers.get(record.milestone_name)
+                if milestone is None and self.jira_issues is not None and not self.dry_run:
+                    milestone = self._ensure_milestone(record.milestone_name)
+                if milestone is None and not self.dry_run:
+                    with self._lock:
+                        self.migration_errors['milestone'].append(record.title)
+                    done += 1
                     continue
 
-                # Check for milestone
-                if 'milestone_name' in issue:
-                    issue['milestone'] = self.projects[proj]['Milestones'][issue['milestone_name']]
-                    if issue['milestone'] is None:
-                        self.migration_errors['milestone'].append(issue['title'])
-                        continue
+            if len(pending) >= self.concurrency * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result()
+                done += len(finished)
+                progress(done)
 
-                    del issue['milestone_name']
-
-                if len(self.aliases) != 0:
-                    result = []
-                    for i, label in enumerate(issue['labels']):
-                        if label in self.aliases:
-                            if self.aliases[label] == 'DELETED':
-                                continue
-
-                            if self.aliases[label] != 'same':
-                                result.append(self.aliases[label])
-                                continue
-                        result.append(label)
-                    issue['labels'] = result
-
-                comments = issue['comments']
-                del issue['comments']
-
-                result = self._save_issue(proj, issue, comments)
-                if result is not True:
-                    self.migration_errors['github'].append(
-                        {
-                            'issue': issue,
-                            'result': result.json(),
-                            'status': result.status_code,
-                        }
-                    )
-                    if result.status_code == 403:
-                        raise StopIteration('Could not continue')
+            if self.jira_issues is not None and not self.dry_run:
+                self._ensure_labels(record.labels)
+
+            pending.add(executor.submit(self._migrate_issue, proj, record, milestone))
+
+            # Polled once per batch of submissions, imports still pending
+            # being polled again with the next batch
+            if len(self.pending_imports) >= poll_at:
+                self._poll_imports()
+                poll_at = len(self.pending_imports) + self.IMPORT_POLL_BATCH
 
-                bar.update(index)
-            bar.update(len(self.projects[proj]['Issues']))
+        for future in pending:
+            future.result()
+        self._poll_imports(wait=True)
+        bar.finish()
+
+        if self._stop.is_set():
+            raise StopIteration('Could not continue')
+
+    ##
+    # Render and save one issue with its comments, run by a worker
+    #
+    def _migrate_issue(self, proj, record, milestone):
+        if self._stop.is_set():
+            return
+
+        issue = self._render_issue(record, milestone)
+        comments = self._render_comments(record)
+        result = self._save_issue(proj, issue, comments)
+        if result is not True:
+            try:
+                content = result.json()
+            except ValueError:
+                content = {'message': result.text}
+            with self._lock:
+                self.migration_errors['github'].append(
+                    {
+                        'issue': issue,
+                        'result': content,
+                        'status': result.status_code,
+                        'rate_limited': self.token_pool.limiters[0][1].is_limited(result),
+                    }
+                )
+            if result.status_code == 403:
+                self._stop.set()
 
     ##
     # Save issue into github
@@ -377,117 +1941,535 @@ class jira2github:
             self._add_cache_data(proj, issue['key'], issue)
             return True
 
+        # Issue created by a previous run which stopped while posting comments
+        progress = self.partial_issues.get(proj, {}).get(issue['key'])
+        if progress is not None:
+            return self._save_comments(proj, issue['key'], progress['number'], comments, progress['posted'])
+
+        if self.backend == self.BACKEND_IMPORT:
+            return self._import_issue(proj, issue, comments)
+
         response_create = self._execute_request(
             self.METHOD_POST,
             self.github_url + '/issues',
-            json.dumps(issue),
+            json.dumps(self._issue_payload(issue)),
         )
 
-        # Sleep even if the response was ok
-        self._sleep()
-
         # Error while saving issue
         if response_create.status_code != 201:
             return response_create
 
-
         content = response_create.json()
+        self._add_cache_data(proj, issue['key'], content['html_url'], content['number'], len(comments))
         self._add_jira_comment(issue['key'], content['html_url'])
-        self._add_cache_data(proj, issue['key'], content['html_url'])
 
-        for comment in comments:
-            self._execute_request(
+        return self._save_comments(proj, issue['key'], content['number'], comments)
+
+    ##
+    # Post issue comments in order, starting at the given index
+    #
+    def _save_comments(self, proj, key, number, comments, start=0):
+        for index in range(start, len(comments)):
+            response_comment = self._execute_request(
                 self.METHOD_POST,
-                self.github_url + '/issues/' + str(content['number']) + '/comments',
-                json.dumps({'body': comment}),
+                self.github_url + '/issues/' + str(number) + '/comments',
+                json.dumps({'body': comments[index]['body']}),
             )
-            self._sleep()
+
+            # Stop there so that the next run posts the remaining comments in order
+            if response_comment.status_code != 201:
+                return response_comment
+
+            self._apply_progress({'op': 'comment', 'proj': proj, 'key': key, 'index': index})
 
         return True
 
+    ##
+    # Issue fields sent to github
+    #
+    def _issue_payload(self, issue):
+        payload = {
+            'title': issue['title'],
+            'body': issue['body'],
+            'labels': issue['labels'],
+        }
+        if issue.get('milestone') is not None:
+            payload['milestone'] = issue['milestone']
+
+        return payload
+
+    ##
+    # Submit issue and its comments in a single request to the issue
+    # import api, the result being collected later by _poll_imports
+    #
+    def _import_issue(self, proj, issue, comments):
+        payload = self._issue_payload(issue)
+        payload['closed'] = issue['closed_at'] is not None
+        for field in ['created_at', 'closed_at']:
+            if issue[field] is not None:
+                payload[field] = issue[field]
+
+        response_import = self._execute_request(
+            self.METHOD_POST,
+            self.github_url + '/import/issues',
+            json.dumps({
+                'issue': payload,
+                'comments': [
+                    {k: v for k, v in comment.items() if v is not None} for comment in comments
+                ],
+            }),
+            {'Accept': self.GITHUB_IMPORT_ACCEPT},
+        )
+
+        if response_import.status_code != 202:
+            return response_import
+
+        # Journaled at once, so that a later run polls the import instead
+        # of importing the issue again
+        self._apply_progress({
+            'op': 'import',
+            'proj': proj,
+            'key': issue['key'],
+            'id': response_import.json()['id'],
+            'title': issue['title'],
+            'submitted': datetime.date.today().isoformat(),
+        })
+
+        return True
+
+    ##
+    # Fetch the status of all pending imports in one request per pass,
+    # until every import is done when wait is enabled. Failed polls are
+    # retried with a backoff, imports still pending afterwards staying in
+    # the journal to be polled by the next run.
+    #
+    def _poll_imports(self, wait=False):
+        failures = 0
+        while len(self.pending_imports) > 0:
+            with self._lock:
+                since = min(submitted for _, _, submitted in self.pending_imports.values())
+
+            response = self._execute_request(
+                self.METHOD_GET,
+                self.github_url + '/import/issues?since=' + (since - datetime.timedelta(days=1)).isoformat(),
+                headers={'Accept': self.GITHUB_IMPORT_ACCEPT},
+            )
+            if response.status_code != 200:
+                failures += 1
+                if not wait:
+                    print('Could not check import statuses: {}'.format(response.status_code))
+                    return
+                if failures > self.MAX_RETRIES:
+                    print('Could not check import statuses: {}, {} imports will be checked by the next run'.format(
+                        response.status_code, len(self.pending_imports)
+                    ))
+                    return
+
+                delay = min(self.IMPORT_POLL_INTERVAL * 2 ** failures, self.RETRY_MAX_BACKOFF)
+                print('Could not check import statuses: {}, retrying in {} seconds'.format(response.status_code, delay))
+                self._sleep(delay)
+                continue
+            failures = 0
+
+            for status in response.json():
+                with self._lock:
+                    if status['id'] not in self.pending_imports or status['status'] == 'pending':
+                        continue
+                    proj, issue, _ = self.pending_imports[status['id']]
+
+                if status['status'] == 'imported':
+                    url = self._html_issue_url(status['issue_url'])
+                    self._add_cache_data(proj, issue['key'], url)
+                    self._add_jira_comment(issue['key'], url)
+                else:
+                    with self._lock:
+                        self.migration_errors['github'].append(
+                            {
+                                'issue': issue,
+                                'result': status,
+                                'status': 422,
+                            }
+                        )
+                self._apply_progress({'op': 'imported', 'proj': proj, 'key': issue['key'], 'id': status['id']})
+
+            if not wait or len(self.pending_imports) == 0:
+                break
+
+            self._sleep(self.IMPORT_POLL_INTERVAL)
+
+    ##
+    # Convert an issue api url into its html url
+    #
+    def _html_issue_url(self, issue_url):
+        return '{}/{}/{}/issues/{}'.format(
+            self.github_html_url,
+            self.github_orga,
+            self.github_repo,
+            issue_url.rstrip('/').rsplit('/', 1)[1],
+        )
+
     ##
     # Sleep
     #
-    def _sleep(self, seconds=20):
+    def _sleep(self, seconds):
+        self.metrics.increment('sleep_seconds_total', seconds)
         time.sleep(seconds)
 
     ##
-    # Save issue key and url into cach file
+    # Save issue key and url into cache
     #
-    def _add_cache_data(self, proj, key, url):
-        if proj not in self.cached_data:
-            self.cached_data[proj] = {}
+    def _add_cache_data(self, proj, key, url, number=None, comments=0):
+        self._apply_progress({
+            'op': 'issue',
+            'proj': proj,
+            'key': key,
+            'url': url,
+            'number': number,
+            'comments': comments,
+        })
 
-        self.cached_data[proj][key] = url
+    ##
+    # Record created issues and comments into the journal and the cache,
+    # keeping track of issues whose comments are not all posted yet
+    #
+    def _apply_progress(self, record, journal=True):
+        if journal and self.journal is not None:
+            self.journal.append(record)
+
+        proj = record['proj']
+        key = record['key']
+        with self._lock:
+            if record['op'] == 'import':
+                self.pending_imports[record['id']] = (
+                    proj,
+                    {'key': key, 'title': record['title']},
+                    datetime.date.fromisoformat(record['submitted']),
+                )
+            elif record['op'] == 'imported':
+                self.pending_imports.pop(record['id'], None)
+            elif record['op'] == 'issue':
+                self.cached_data.setdefault(proj, {})[key] = record['url']
+                if record['comments'] > record.get('posted', 0):
+                    self.partial_issues.setdefault(proj, {})[key] = {
+                        'number': record['number'],
+                        'comments': record['comments'],
+                        'posted': record.get('posted', 0),
+                    }
+            elif key in self.partial_issues.get(proj, {}):
+                progress = self.partial_issues[proj][key]
+                progress['posted'] = max(progress['posted'], record['index'] + 1)
+                if progress['posted'] >= progress['comments']:
+                    del self.partial_issues[proj][key]
 
     ##
-    # Save file cache
+    # Save file cache and compact the journal, only keeping the progress of
+    # partially migrated issues
     #
     def save_cache_data(self):
-        self._save_json(self.cache_path, self.cached_data)
+        with self._lock:
+            self._save_json(self.cache_path, self.cached_data)
+            if self.journal is not None:
+                self.journal.rewrite([
+                    dict(progress, op='issue', proj=proj, key=key, url=self.cached_data[proj][key])
+                    for proj, issues in self.partial_issues.items()
+                    for key, progress in issues.items()
+                ] + [
+                    {
+                        'op': 'import',
+                        'proj': proj,
+                        'key': issue['key'],
+                        'id': import_id,
+                        'title': issue['title'],
+                        'submitted': submitted.isoformat(),
+                    }
+                    for import_id, (proj, issue, submitted) in self.pending_imports.items()
+                ])
+
+        if self.backlinks is not None:
+            self.backlinks.save()
+        self.etags.save()
+        self.attachment_store.save()
 
     ##
     # Save errors data
     #
     def save_errors_data(self):
         if len(self.migration_errors) > 0:
-            print('This jira issues are on errors: ')
-            print('Milestone errors: {}'.format(len(self.migration_errors['milestone'])))
-            print('Issues errors: {}'.format(len(self.migration_errors['github'])))
-            self._save_json('errors.json', self.migration_errors)
+            self._save_errors(self._merge_errors(self._load_errors(self.errors_path), self.migration_errors))
+
+    def _save_errors(self, errors):
+        print('This jira issues are on errors: ')
+        print('Milestone errors: {}'.format(len(errors['milestone'])))
+        print('Issues errors: {} ({} transient)'.format(
+            len(errors['github']),
+            sum(1 for error in errors['github'] if self._is_transient(error)),
+        ))
+        self._save_json(self.errors_path, errors)
+
+    def _load_errors(self, path):
+        try:
+            with open(path, encoding='utf-8') as fp:
+                return json.load(fp)
+        except FileNotFoundError:
+            return {'milestone': [], 'github': []}
+
+    ##
+    # Append errors to the recorded ones: issues migrated since are dropped,
+    # and an issue failing again keeps its last error and its number of
+    # failed attempts
+    #
+    def _merge_errors(self, recorded, errors):
+        github_errors = {self._error_key(error): error for error in recorded.get('github', [])}
+        for error in errors.get('github', []):
+            key = self._error_key(error)
+            attempts = github_errors[key].get('attempts', 1) if key in github_errors else 0
+            github_errors[key] = dict(
+                error,
+                attempts=attempts + error.get('attempts', 1),
+                transient=self._is_transient(error),
+            )
+
+        titles = set(recorded.get('milestone', [])).union(errors.get('milestone', []))
+        return {
+            'milestone': sorted(title for title in titles if not self._is_migrated(self._title_key(title))),
+            'github': [error for key, error in github_errors.items() if not self._is_migrated(key)],
+        }
+
+    def _error_key(self, error):
+        return error['issue'].get('key', error['issue'].get('title'))
+
+    def _title_key(self, title):
+        match = self.JIRA_TITLE_KEY_PATTERN.match(title)
+        return match.group(1) if match is not None else title
+
+    ##
+    # Check if an issue has been created on github with all its comments
+    #
+    def _is_migrated(self, key):
+        with self._lock:
+            return any(key in issues for issues in self.cached_data.values()) \
+                and not any(key in issues for issues in self.partial_issues.values())
+
+    ##
+    # Server errors and rate limits may succeed later, unlike validation
+    # errors. A 403 is only a rate limit when its response said so, other
+    # ones being denied permissions.
+    #
+    def _is_transient(self, error):
+        if error['status'] == 403:
+            return error.get('rate_limited', False)
+
+        return error['status'] >= 500 or error['status'] == 429
+
+    ##
+    # Merge the caches, journals, backlinks and errors of count shards into
+    # the files of the whole migration
+    #
+    def merge_shards(self, count):
+        errors = self._load_errors(self.errors_path)
+        conflicts = 0
+        for index in range(count):
+            cache_path = self._shard_path(self.cache_path, index, count)
+            try:
+                with open(cache_path, encoding='utf-8') as fp:
+                    shard_data = json.load(fp)
+            except FileNotFoundError:
+                print('Missing shard cache {}'.format(cache_path))
+                continue
+
+            for proj, issues in shard_data.items():
+                for key, url in issues.items():
+                    if self.cached_data.get(proj, {}).get(key, url) != url:
+                        conflicts += 1
+                        print('Issue {} migrated twice: {} and {}'.format(key, self.cached_data[proj][key], url))
+                        continue
+                    self._apply_progress({'op': 'issue', 'proj': proj, 'key': key, 'url': url, 'comments': 0})
+
+            for record in Journal(cache_path + '.journal').replay():
+                self._apply_progress(record)
+            self.backlinks.merge(cache_path + '.backlinks')
+            self.attachment_store.merge(cache_path + '.attachments')
+
+            shard_errors = self._load_errors(self._shard_path(self.errors_path, index, count))
+            for kind in errors:
+                errors[kind].extend(shard_errors.get(kind, []))
+
+        # Only keep the last error of an issue, shards never sharing issues
+        github_errors = {}
+        for error in errors['github']:
+            github_errors[error['issue'].get('key', error['issue'].get('title'))] = error
+        errors['github'] = list(github_errors.values())
+        errors['milestone'] = sorted(set(errors['milestone']))
+
+        self.migration_errors = errors
+        self.save_cache_data()
+        self._save_errors(errors)
+        print('Merged {} shards: {} issues, {} conflicts'.format(
+            count,
+            sum(len(issues) for issues in self.cached_data.values()),
+            conflicts,
+        ))
 
     ##
     # Save json file
     #
     def _save_json(self, file_path, data):
-        with open(file_path, 'w') as fp:
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'w') as fp:
             json.dump(data, fp, ensure_ascii=False)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_path, file_path)
 
     ##
     # Check rate Limit
     #
     def check_rate_limit(self):
-        limit = self._execute_request(
-            self.METHOD_GET,
-            'https://api.github.com/rate_limit',
-        )
-        print(limit.json())
+        for limit in self._rate_limits():
+            print(limit)
 
     ##
-    # Add comments to jira
+    # Rate limit status of each token, which does not use the budget
+    #
+    def _rate_limits(self):
+        url = self.github_api_url + '/rate_limit'
+        for token, _ in self.token_pool.limiters:
+            key = self.etags.key(url, token)
+            limit = self._send_request(
+                self.METHOD_GET,
+                url,
+                None,
+                self._token_headers(token, self.etags.conditional(key, None)),
+            )
+            yield self.etags.resolve(key, limit).json()
+
+    ##
+    # Queue the comment linking a Jira issue to its github issue
     #
     def _add_jira_comment(self, jira_key, github_issue_url):
         if not self.jira or self.dry_run:
             return
 
+        if self.backlinks is None:
+            return self._post_jira_comment(jira_key, github_issue_url)
+
+        self.backlinks.put(jira_key, github_issue_url)
+
+    ##
+    # Add comments to jira, run by the backlink workers
+    #
+    def _post_jira_comment(self, jira_key, github_issue_url):
         message = self.custom_jira_message
         message += 'You can follow the activity of this ticket at {}'.format(github_issue_url)
 
+        start = time.perf_counter()
         self.jira.add_comment(jira_key, message)
+        self.metrics.observe('jira_request_duration_seconds', time.perf_counter() - start, endpoint='add_comment')
 
     ##
-    # Execute requests
+    # Post the Jira backlinks which were not posted by previous runs
     #
-    def _execute_request(self, method, url, data=None, headers={'Accept': 'application/vnd.github.beta.html+json'}):
-        params = {
-            'headers': headers,
-        }
+    def replay_backlinks(self):
+        if not self.jira:
+            raise RuntimeError('A Jira url, user and password are needed to replay backlinks')
 
-        if self.github_token is not None:
-            params['headers']['Authorization'] = 'Token {}'.format(self.github_token)
-        else:
-            params['auth'] = (self.github_user, self.github_password)
+        count = self.backlinks.replay()
+        print('Replaying {} Jira backlinks...'.format(count))
+        self.backlinks.join()
+        self.backlinks.save()
+        print('Jira backlinks not posted: {}'.format(len(self.backlinks.pending) + len(self.backlinks.failed)))
 
-        if data is not None:
-            params['data'] = data
-
-        if method == self.METHOD_POST:
-            return requests.post(
-                url,
-                **params
+    ##
+    # Execute requests, paced by the rate limiter and retried when GitHub
+    # rejects them because of a rate limit
+    #
+    def _execute_request(self, method, url, data=None, headers=None):
+        endpoint = self._endpoint(method, url)
+        for attempt in range(self.MAX_RETRIES + 1):
+            token, limiter = self.token_pool.select()
+            waited = limiter.acquire()
+            if waited > 0:
+                self.metrics.increment('rate_limit_wait_seconds_total', waited)
+
+            # Conditional GET, a 304 response being replaced by the cached one
+            request_headers = headers
+            if method == self.METHOD_GET:
+                key = self.etags.key(url, token, (headers or {}).get('Accept'))
+                request_headers = self.etags.conditional(key, headers)
+
+            start = time.perf_counter()
+            response = self._send_request(method, url, data, self._token_headers(token, request_headers))
+            self.metrics.observe(
+                'request_duration_seconds',
+                time.perf_counter() - start,
+                endpoint=endpoint,
+                status=response.status_code,
             )
+            if method == self.METHOD_GET:
+                if response.status_code == 304:
+                    self.metrics.increment('not_modified_total', endpoint=endpoint)
+                response = self.etags.resolve(key, response)
+            retries = getattr(response.raw, 'retries', None)
+            if retries is not None and len(retries.history) > 0:
+                self.metrics.increment('transport_retries_total', len(retries.history), endpoint=endpoint)
+            limiter.update(response.headers)
+            self.metrics.maybe_write()
+
+            if attempt == self.MAX_RETRIES or not limiter.is_limited(response):
+                return response
+
+            # Park the token and retry at once when another one has budget left
+            delay = limiter.backoff(response, attempt)
+            limiter.park(time.time() + delay)
+            self.metrics.increment('rate_limit_retries_total', endpoint=endpoint)
+            if self.token_pool.available():
+                continue
+
+            print('Rate limited, retrying in {} seconds'.format(delay))
+            self._sleep(delay)
+
+    ##
+    # Request headers authenticated with the given token
+    #
+    def _token_headers(self, token, headers):
+        if token is None:
+            return headers
+
+        return dict(headers or {}, Authorization='Token {}'.format(token))
+
+    ##
+    # Request method and url path without ids nor query, used as metrics label
+    #
+    def _endpoint(self, method, url):
+        path = url.split('?', 1)[0]
+        if path.startswith(self.github_url):
+            path = '/repos/:owner/:repo' + path[len(self.github_url):]
+        elif path.startswith(self.github_api_url):
+            path = path[len(self.github_api_url):]
 
-        return requests.get(
+        path = re.sub('/contents/.*', '/contents/:path', path)
+
+        return '{} {}'.format(method.upper(), re.sub('/[0-9]+', '/:number', path))
+
+    ##
+    # Send a single request through the shared session
+    #
+    def _send_request(self, method, url, data, headers):
+        return self.session.request(
+            method,
             url,
-            **params
+            data=data,
+            headers=headers,
+            timeout=self.http_timeout,
         )
+
+
+##
+# Parse one xml export in a worker process, returning its parsed items
+#
+def parse_export(path, streaming, shard):
+    jira_to_github = jira2github(path, None, None, None, None, None)
+    jira_to_github.set_streaming(streaming)
+    jira_to_github.set_shard(*shard)
+
+    return list(jira_to_github._parse_export(path))
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import time
+
+
+##
+# Append-only JSON lines journal of the migration progress. Every record
+# is flushed to the OS as soon as it is written, so a killed process loses
+# nothing, and fsynced periodically to survive a power loss.
+#
+class Journal:
+
+    FSYNC_INTERVAL = 1
+    FSYNC_RECORDS = 100
+
+    def __init__(self, path):
+        self.path = path
+        self.fp = None
+        self._unsynced = 0
+        self._synced_at = time.time()
+        self._lock = threading.Lock()
+
+    ##
+    # Read all records, ignoring a last line truncated by a crash
+    #
+    def replay(self):
+        try:
+            with open(self.path, encoding='utf-8') as fp:
+                for line in fp:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        pass
+        except FileNotFoundError:
+            return
+
+    ##
+    # Append a record
+    #
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self.fp is None:
+                self.fp = open(self.path, 'a', encoding='utf-8')
+                # Records are not appended to a line truncated by a crash
+                if not self._ends_with_newline():
+                    self.fp.write('\n')
+
+            self.fp.write(line)
+            self.fp.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.FSYNC_RECORDS or time.time() - self._synced_at >= self.FSYNC_INTERVAL:
+                self._sync()
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as fp:
+            if fp.seek(0, os.SEEK_END) == 0:
+                return True
+            fp.seek(-1, os.SEEK_END)
+            return fp.read(1) == b'\n'
+
+    def _sync(self):
+        os.fsync(self.fp.fileno())
+        self._unsynced = 0
+        self._synced_at = time.time()
+
+    ##
+    # Atomically replace the journal content with the given records
+    #
+    def rewrite(self, records):
+        with self._lock:
+            self._close()
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as fp:
+                for record in records:
+                    fp.write(json.dumps(record, ensure_ascii=False) + '\n')
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(tmp_path, self.path)
+
+    ##
+    # Flush pending records to disk and close the journal
+    #
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self.fp is not None:
+            self._sync()
+            self.fp.close()
+            self.fp = None
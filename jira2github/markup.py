@@ -0,0 +1,210 @@
+import re
+
+
+##
+# Converter of Jira wiki markup into GitHub flavored Markdown. The text is
+# split once on the {code}, {noformat} and {quote} macros and on the html
+# <pre> and <code> elements of rendered bodies, then every line outside of
+# code blocks is converted with a single match of its block prefix and a
+# single scan of its inline markup, so that conversion time is linear in
+# the size of the text.
+#
+class JiraMarkup:
+
+    MACRO_PATTERN = re.compile(r'\{(code|noformat|quote)(?::([^{}\n]*))?\}|<(?P<tag>pre|code)\b[^>]*>', re.I)
+    CLOSING_TAGS = {
+        'pre': re.compile(r'</pre\s*>', re.I),
+        'code': re.compile(r'</code\s*>', re.I),
+    }
+    BLOCK_PATTERN = re.compile(
+        r'(?:h(?P<heading>[1-6])\.|(?P<quote>bq\.)|(?P<list>[*#]+|-)(?=\s)|(?P<rule>-{4,}\s*$)|(?P<table>\|))\s*'
+    )
+    CELL_PATTERN = re.compile(r'\|\|?')
+    INLINE_PATTERN = re.compile(
+        r'\\(?P<escape>[\\*_\-+^~?{}\[\]!|])'
+        r'|\{\{(?P<monospace>[^{}\n]+)\}\}'
+        r'|\{(?:color|panel)(?::[^{}\n]*)?\}'
+        r'|\[(?:(?P<text>[^\[\]|\n]*)\|)?(?P<target>[^\[\]|\n]+)\]'
+        r'|!(?P<image>[^\s!|][^!|\n]*?)(?:\|[^!\n]*)?!'
+        r'|(?<!\w)(?:'
+        r'\*(?P<bold>[^*\s](?:[^*\n]*[^*\s])?)\*'
+        r'|_(?P<italic>[^_\s](?:[^_\n]*[^_\s])?)_'
+        r'|-(?P<strike>[^-\s](?:[^-\n]*[^-\s])?)-'
+        r'|\+(?P<inserted>[^+\s](?:[^+\n]*[^+\s])?)\+'
+        r'|\^(?P<superscript>[^^\s](?:[^^\n]*[^^\s])?)\^'
+        r'|~(?P<subscript>[^~\s](?:[^~\n]*[^~\s])?)~'
+        r'|\?\?(?P<citation>[^?\s](?:[^?\n]*[^?\s])?)\?\?'
+        r')(?!\w)'
+    )
+    URL_PATTERN = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*://|mailto:|#')
+
+    WRAPPERS = {
+        'bold': ('**', '**'),
+        'italic': ('_', '_'),
+        'strike': ('~~', '~~'),
+        'inserted': ('<ins>', '</ins>'),
+        'superscript': ('<sup>', '</sup>'),
+        'subscript': ('<sub>', '</sub>'),
+        'citation': ('<cite>', '</cite>'),
+    }
+
+    ##
+    # Convert a text, code blocks being kept verbatim in fenced blocks and
+    # html code elements being kept as they are
+    #
+    def convert(self, text):
+        if not text:
+            return text
+
+        parts = []
+        quoted = False
+        position = 0
+        length = len(text)
+        while position < length:
+            match = self.MACRO_PATTERN.search(text, position)
+            if match is None:
+                parts.append(self._quote(self._convert_text(text[position:]), quoted))
+                break
+
+            parts.append(self._quote(self._convert_text(text[position:match.start()]), quoted))
+            position = match.end()
+            if match.group('tag'):
+                closing = self.CLOSING_TAGS[match.group('tag').lower()].search(text, position)
+                position = closing.end() if closing is not None else length
+                parts.append(text[match.start():position])
+                continue
+            if match.group(1) == 'quote':
+                quoted = not quoted
+                parts.append('\n')
+                continue
+
+            end = text.find('{' + match.group(1) + '}', position)
+            if end < 0:
+                end = length
+            parts.append(self._quote(self._fence(text[position:end], match.group(1), match.group(2)), quoted))
+            position = end + len(match.group(1)) + 2
+
+        return ''.join(parts)
+
+    ##
+    # Fenced code block, longer than any backtick run of the code
+    #
+    def _fence(self, code, macro, parameters):
+        language = ''
+        if macro == 'code' and parameters:
+            for parameter in parameters.split('|'):
+                name, _, value = parameter.partition('=')
+                if not value:
+                    language = name.strip()
+                elif name.strip() == 'language':
+                    language = value.strip()
+
+        fence = '```'
+        while fence in code:
+            fence += '`'
+
+        return '\n{}{}\n{}\n{}\n'.format(fence, language, code.strip('\n'), fence)
+
+    def _quote(self, text, quoted):
+        if not quoted or not text.strip():
+            return text
+
+        return '\n'.join('> ' + line for line in text.strip('\n').split('\n'))
+
+    ##
+    # Convert the lines of a text without code blocks
+    #
+    def _convert_text(self, text):
+        lines = []
+        columns = 0
+        for line in text.split('\n'):
+            match = self.BLOCK_PATTERN.match(line)
+            if match is None:
+                columns = 0
+                lines.append(self._convert_inline(line))
+                continue
+
+            rest = self._convert_inline(line[match.end():])
+            if match.group('table'):
+                columns = self._table_row(lines, line[:match.end()] + rest, columns)
+                continue
+
+            columns = 0
+            if match.group('heading'):
+                lines.append('#' * int(match.group('heading')) + ' ' + rest)
+            elif match.group('quote'):
+                lines.append('> ' + rest)
+            elif match.group('rule'):
+                lines.append('---')
+            elif match.group('list') == '-' or match.group('list')[-1] == '*':
+                lines.append('  ' * (len(match.group('list')) - 1) + '- ' + rest)
+            else:
+                lines.append('   ' * (len(match.group('list')) - 1) + '1. ' + rest)
+
+        return '\n'.join(lines)
+
+    ##
+    # Append a table row, with a header row and a separator before the
+    # first row, returning the number of columns of the table
+    #
+    def _table_row(self, lines, line, columns):
+        line = line.rstrip()
+        header = line.startswith('||')
+        cells = self.CELL_PATTERN.split(line)[1:]
+        if len(cells) > 1 and not cells[-1].strip():
+            cells.pop()
+        row = '| ' + ' | '.join(cell.strip() for cell in cells) + ' |'
+
+        if columns:
+            lines.append(row)
+            return columns
+
+        if lines and lines[-1].strip():
+            lines.append('')
+        if header:
+            lines.append(row)
+        else:
+            lines.append('|' + ' |' * len(cells))
+        lines.append('|' + ' --- |' * len(cells))
+        if not header:
+            lines.append(row)
+
+        return len(cells)
+
+    def _convert_inline(self, text):
+        return self.INLINE_PATTERN.sub(self._replace, text)
+
+    def _replace(self, match):
+        kind = match.lastgroup
+        value = match.group(kind) if kind else None
+
+        if kind is None:
+            return ''
+        if kind == 'escape':
+            return '\\' + value
+        if kind == 'monospace':
+            fence = '``' if '`' in value else '`'
+            return fence + value + fence
+        if kind == 'image':
+            return '![]({})'.format(value)
+        if kind in ('text', 'target'):
+            return self._link(match)
+
+        start, end = self.WRAPPERS[kind]
+        return start + self._convert_inline(value) + end
+
+    ##
+    # Link to an url, user mentions being kept as plain names so that they
+    # do not notify unrelated GitHub users
+    #
+    def _link(self, match):
+        text = match.group('text')
+        target = match.group('target').strip()
+        if target.startswith('~'):
+            return text or target[1:]
+        if self.URL_PATTERN.match(target) is None:
+            return match.group(0)
+        if text is None:
+            return '<{}>'.format(target)
+
+        return '[{}]({})'.format(self._convert_inline(text), target)
@@ -0,0 +1,197 @@
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+##
+# Time a jira2github method as a migration phase
+#
+def timed(phase):
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer(phase):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+##
+# Phase timers, latency histograms and counters, exported as a json
+# report or as a Prometheus textfile
+#
+class Metrics:
+
+    PREFIX = 'jira2github_'
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+    def __init__(self, path=None, interval=60):
+        self.path = path
+        self.interval = interval
+        self.phases = defaultdict(float)
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self._written_at = time.time()
+        self._lock = threading.Lock()
+
+    ##
+    # Measure the wall-clock time of a phase
+    #
+    @contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(phase, time.perf_counter() - start)
+
+    def add_phase(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] += seconds
+
+    ##
+    # Increment a counter
+    #
+    def increment(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[(name, self._labels(labels))] += value
+
+    ##
+    # Add an observation to a histogram
+    #
+    def observe(self, name, value, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = {'buckets': [0] * len(self.BUCKETS), 'sum': 0.0, 'count': 0}
+
+            histogram = self.histograms[key]
+            histogram['sum'] += value
+            histogram['count'] += 1
+            for index, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+                    break
+
+    ##
+    # Mean and number of the observations of a histogram, whatever their
+    # labels, the mean being None without observations
+    #
+    def mean(self, name):
+        with self._lock:
+            histograms = [histogram for (key, _), histogram in self.histograms.items() if key == name]
+
+        count = sum(histogram['count'] for histogram in histograms)
+        if count == 0:
+            return None, 0
+
+        return sum(histogram['sum'] for histogram in histograms) / count, count
+
+    def _labels(self, labels):
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    ##
+    # Write the report if the export interval has elapsed, only one of the
+    # threads calling it at the same time writing it
+    #
+    def maybe_write(self):
+        if self.path is None:
+            return
+
+        with self._lock:
+            if time.time() - self._written_at < self.interval:
+                return
+            self._written_at = time.time()
+
+        self.write()
+
+    ##
+    # Write the report, as a Prometheus textfile when the path ends with
+    # .prom. A failed export is reported without raising, so that it never
+    # interrupts the migration.
+    #
+    def write(self):
+        if self.path is None:
+            return
+
+        with self._lock:
+            self._written_at = time.time()
+            if self.path.endswith('.prom'):
+                content = self.to_prometheus()
+            else:
+                content = json.dumps(self.to_dict(), indent=2)
+
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                fp.write(content)
+            # Readable by the exporter collecting the textfile, as before
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print('Could not write metrics to {}: {}'.format(self.path, e))
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def to_dict(self):
+        return {
+            'phases': dict(self.phases),
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ],
+            'histograms': [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': histogram['count'],
+                    'sum': histogram['sum'],
+                    'buckets': {
+                        str(bound): count for bound, count in zip(self.BUCKETS, self._cumulate(histogram['buckets']))
+                    },
+                }
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ],
+        }
+
+    def to_prometheus(self):
+        lines = ['# TYPE {}phase_duration_seconds gauge'.format(self.PREFIX)]
+        for phase, seconds in sorted(self.phases.items()):
+            lines.append('{}phase_duration_seconds{{phase="{}"}} {}'.format(self.PREFIX, phase, seconds))
+
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in typed:
+                lines.append('# TYPE {}{} counter'.format(self.PREFIX, name))
+                typed.add(name)
+            lines.append('{}{}{} {}'.format(self.PREFIX, name, self._format_labels(labels), value))
+
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if name not in typed:
+                lines.append('# TYPE {}{} histogram'.format(self.PREFIX, name))
+                typed.add(name)
+            for bound, count in zip(self.BUCKETS, self._cumulate(histogram['buckets'])):
+                bucket_labels = labels + (('le', '+Inf' if bound == float('inf') else str(bound)),)
+                lines.append('{}{}_bucket{} {}'.format(self.PREFIX, name, self._format_labels(bucket_labels), count))
+            lines.append('{}{}_sum{} {}'.format(self.PREFIX, name, self._format_labels(labels), histogram['sum']))
+            lines.append('{}{}_count{} {}'.format(self.PREFIX, name, self._format_labels(labels), histogram['count']))
+
+        return '\n'.join(lines) + '\n'
+
+    def _cumulate(self, buckets):
+        total = 0
+        for count in buckets:
+            total += count
+            yield total
+
+    def _format_labels(self, labels):
+        if not labels:
+            return ''
+
+        return '{' + ','.join('{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels) + '}'
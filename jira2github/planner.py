@@ -0,0 +1,86 @@
+import heapq
+
+
+##
+# Schedule of the remaining GitHub requests, simulating the pacing of the
+# rate limiters: each token spreads its remaining budget until its reset,
+# at most at the configured rate, and the whole migration cannot go faster
+# than the concurrent workers given the request latency
+#
+class Planner:
+
+    def __init__(self, max_rate, budgets, window=3600):
+        self.max_rate = max_rate
+        self.window = window
+        # Remaining budget, reset time in seconds from now and limit of each token
+        self.remaining = [remaining for remaining, _, _ in budgets]
+        self.limits = [limit for _, _, limit in budgets]
+        self.resets = [(reset, index) for index, (_, reset, _) in enumerate(budgets) if reset != float('inf')]
+        heapq.heapify(self.resets)
+        self.reset_at = [reset for _, reset, _ in budgets]
+        self.time = 0.0
+
+    ##
+    # Request rate of each token, spreading its budget until its reset
+    #
+    def _token_rates(self):
+        rates = []
+        for index, remaining in enumerate(self.remaining):
+            if remaining == float('inf'):
+                rates.append(self.max_rate)
+            elif remaining <= 0:
+                rates.append(0)
+            else:
+                rates.append(min(self.max_rate, remaining / max(self.reset_at[index] - self.time, 1)))
+        return rates
+
+    ##
+    # Finish time and peak request rate of consecutive batches of requests,
+    # the time being infinite when a batch can never be sent
+    #
+    def schedule(self, totals, concurrency_rate):
+        results = []
+        for total in totals:
+            left = total
+            peak = 0
+            while left > 0:
+                self._reset()
+                rates = self._token_rates()
+                rate = min(concurrency_rate, sum(rates))
+                next_reset = self.resets[0][0] if self.resets else float('inf')
+
+                if rate == float('inf'):
+                    break
+                if rate <= 0 and next_reset == float('inf'):
+                    self.time = float('inf')
+                    break
+
+                peak = max(peak, rate)
+                if rate > 0 and left / rate <= next_reset - self.time:
+                    duration, sent = left / rate, left
+                else:
+                    duration, sent = next_reset - self.time, rate * (next_reset - self.time)
+                self._consume(rates, sent)
+                left -= sent
+                self.time += duration
+
+            results.append((self.time, peak))
+
+        return results
+
+    ##
+    # Use the budgets of the tokens in proportion of their rates, as the
+    # token pool picks the token with the most headroom
+    #
+    def _consume(self, rates, sent):
+        total = sum(rates)
+        for index, token_rate in enumerate(rates):
+            if total > 0 and self.remaining[index] != float('inf'):
+                self.remaining[index] = max(self.remaining[index] - sent * token_rate / total, 0)
+
+    def _reset(self):
+        while self.resets and self.resets[0][0] <= self.time:
+            _, index = heapq.heappop(self.resets)
+            self.remaining[index] = self.limits[index]
+            self.reset_at[index] += self.window
+            heapq.heappush(self.resets, (self.reset_at[index], index))
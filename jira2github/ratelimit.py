@@ -0,0 +1,176 @@
+import threading
+import time
+
+
+##
+# Token bucket pacing GitHub requests, with a refill rate adapted to the
+# budget GitHub reports in the X-RateLimit-* response headers
+#
+class RateLimiter:
+
+    BACKOFF_BASE = 60
+    BACKOFF_MAX = 15 * 60
+
+    def __init__(self, max_rate=1.0, burst=1, sleep=time.sleep, clock=time.time):
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.burst = burst
+        self.tokens = burst
+        self.remaining = None
+        self.reset = None
+        self.parked_until = 0
+        self._sleep = sleep
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    ##
+    # Refill the bucket according to the elapsed time
+    #
+    def _refill(self, now):
+        if self.reset is not None and self.reset <= now:
+            self.remaining = None
+            self.reset = None
+            self.rate = self.max_rate
+
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    ##
+    # Take a token, waiting until one is available or until the primary
+    # rate limit is reset when the budget is exhausted
+    #
+    def acquire(self):
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+            if self.parked_until > now:
+                delay = max(delay, self.parked_until - now)
+            if self.remaining == 0:
+                delay = max(delay, self.reset - now + 1)
+            elif self.remaining is not None:
+                self.remaining -= 1
+
+        if delay > 0:
+            self._sleep(delay)
+
+        return delay
+
+    ##
+    # Adapt the refill rate to the remaining budget so that it is spread
+    # until the next reset
+    #
+    def update(self, headers):
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self.remaining = int(remaining)
+            self.reset = int(reset)
+            window = max(self.reset - now, 1)
+            self.rate = max(min(self.max_rate, self.remaining / window), 1 / window)
+
+    ##
+    # Stop using the budget until the given time, after a rate limited
+    # response
+    #
+    def park(self, until):
+        with self._lock:
+            self.parked_until = max(self.parked_until, until)
+
+    ##
+    # Remaining budget and bucket tokens, None while the budget is exhausted
+    # or parked
+    #
+    def headroom(self):
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if self.parked_until > now or self.remaining == 0:
+                return None
+
+            return (self.remaining if self.remaining is not None else float('inf'), self.tokens)
+
+    ##
+    # Time at which the budget can be used again
+    #
+    def available_at(self):
+        with self._lock:
+            available = self.parked_until
+            if self.remaining == 0:
+                available = max(available, self.reset + 1)
+
+            return available
+
+    ##
+    # Check if a response has been rejected by a primary or secondary rate limit
+    #
+    def is_limited(self, response):
+        if response.status_code not in (403, 429):
+            return False
+
+        if 'Retry-After' in response.headers:
+            return True
+
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            return True
+
+        return 'rate limit' in response.text.lower()
+
+    ##
+    # Delay before retrying a rate limited request
+    #
+    def backoff(self, response, attempt):
+        with self._lock:
+            self.tokens = min(self.tokens, 0)
+
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return max(int(retry_after), 1)
+            except ValueError:
+                pass
+
+        reset = response.headers.get('X-RateLimit-Reset')
+        if response.headers.get('X-RateLimit-Remaining') == '0' and reset is not None:
+            return max(int(reset) - self._clock(), 0) + 1
+
+        return min(self.BACKOFF_BASE * 2 ** attempt, self.BACKOFF_MAX)
+
+
+##
+# Pool of GitHub tokens, each one with its own rate limiter, requests being
+# routed to the token with the most remaining budget
+#
+class TokenPool:
+
+    def __init__(self, tokens, max_rate=1.0, burst=1, sleep=time.sleep, clock=time.time):
+        self.limiters = [(token, RateLimiter(max_rate, burst, sleep, clock)) for token in tokens]
+
+    ##
+    # Select the token with the most headroom, or the first one to be
+    # available again when every token is exhausted or parked
+    #
+    def select(self):
+        best = None
+        for token, limiter in self.limiters:
+            headroom = limiter.headroom()
+            if headroom is not None and (best is None or headroom > best[0]):
+                best = (headroom, token, limiter)
+
+        if best is not None:
+            return best[1], best[2]
+
+        return min(self.limiters, key=lambda entry: entry[1].available_at())
+
+    ##
+    # Check if a token can be used without waiting for a reset
+    #
+    def available(self):
+        return any(limiter.headroom() is not None for _, limiter in self.limiters)
@@ -0,0 +1,65 @@
+##
+# Raw fields of a Jira issue, github bodies being rendered from them only
+# when the issue is sent
+#
+class IssueRecord:
+
+    __slots__ = (
+        'key',
+        'title',
+        'type',
+        'link',
+        'reporter',
+        'created',
+        'resolved',
+        'description',
+        'labels',
+        'milestone_name',
+        'fields',
+        'comments',
+        'attachments',
+    )
+
+    def __init__(self, key, title, type, link, reporter, created, resolved, description):
+        self.key = key
+        self.title = title
+        self.type = type
+        self.link = link
+        self.reporter = reporter
+        self.created = created
+        self.resolved = resolved
+        self.description = description
+        self.labels = []
+        self.milestone_name = None
+        self.fields = []
+        self.comments = []
+        # Id, file name and size of each Jira attachment
+        self.attachments = []
+
+    # Pickle slots as a plain tuple, keeping snapshots small and fast to load
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+##
+# Raw fields of a Jira comment
+#
+class CommentRecord:
+
+    __slots__ = ('id', 'author', 'created', 'text')
+
+    def __init__(self, id, author, created, text):
+        self.id = id
+        self.author = author
+        self.created = created
+        self.text = text
+
+    def __getstate__(self):
+        return (self.id, self.author, self.created, self.text)
+
+    def __setstate__(self, state):
+        self.id, self.author, self.created, self.text = state
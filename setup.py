@@ -16,9 +16,10 @@ setup(
     packages=['jira2github'],
     install_requires=[
         'argparse==1.4.0',
-        'lxml==4.2.4',
-        'progressbar2==3.38.0',
-        'requests==2.19.1',
+        'jira==3.10.5',
+        'lxml==6.1.3',
+        'progressbar2==4.6.0',
+        'requests==2.34.2',
     ],
     tests_require=[
         'coverage',
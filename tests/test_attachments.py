@@ -0,0 +1,89 @@
+import contextlib
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+from benchmarks import bench_attachments, generator
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.fake_jira import FakeJira, attachment_content
+
+
+def attachments_of(jira_to_github):
+    return {
+        attachment_id: (name, size)
+        for project in jira_to_github.projects.values()
+        for record in project['Issues']
+        for attachment_id, name, size in record.attachments
+    }
+
+
+##
+# Each distinct attachment is uploaded once with its content
+#
+def check_uploads(github, jira_to_github, destination):
+    distinct = set(attachments_of(jira_to_github).values())
+    uploaded = bench_attachments.uploads(github, destination)
+    assert len(uploaded) == len(distinct), (len(uploaded), len(distinct))
+    for name, size in distinct:
+        assert hashlib.sha256(uploaded[name]).digest() == hashlib.sha256(attachment_content(name, size)).digest()
+
+    return uploaded
+
+
+##
+# Issues link to their uploaded attachments, images being displayed
+#
+def check_links(github, jira_to_github):
+    records = {
+        record.key: record
+        for project in jira_to_github.projects.values()
+        for record in project['Issues']
+    }
+    for issue in github.issues.values():
+        record = records[re.match(r'\[([^\]]+)\]', issue['title']).group(1)]
+        for attachment_id, name, _ in record.attachments:
+            url = jira_to_github.attachment_store.url(attachment_id)
+            assert '[{}]({})'.format(name, url) in issue['body'], (record.key, name)
+            if name.endswith('.png'):
+                assert '![{}]({})'.format(name, url) in issue['body'], (record.key, name)
+
+
+##
+# A second run transfers nothing, and a run which lost the store of the
+# previous ones finds the uploaded files again without uploading them
+#
+def check_resumed(xml_path, github, jira, destination, cache_path, uploaded):
+    downloaded = jira.downloaded_bytes
+    requests = github.requests
+    jira_to_github = bench_attachments.build(xml_path, github, jira, destination, 2)
+    jira_to_github.set_cache_path(cache_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        jira_to_github.attachments()
+    assert jira.downloaded_bytes == downloaded and github.requests == requests, 'attachments transferred twice'
+
+    jira_to_github = bench_attachments.build(xml_path, github, jira, destination, 2)
+    with contextlib.redirect_stdout(io.StringIO()):
+        jira_to_github.attachments()
+    assert all(jira_to_github.attachment_store.url(attachment_id) for attachment_id in attachments_of(jira_to_github))
+    assert bench_attachments.uploads(github, destination) == uploaded, 'attachments uploaded twice'
+
+
+def test_attachments():
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, items=40, comments=1, attachments=2)
+        for destination in ['branch', 'release']:
+            with FakeJira(xml_path) as jira, FakeGitHub() as github:
+                jira_to_github = bench_attachments.build(xml_path, github, jira, destination, 2)
+                with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                    jira_to_github.milestones()
+                    jira_to_github.labels()
+                    jira_to_github.attachments()
+                    jira_to_github.migrate()
+                jira_to_github.save_cache_data()
+
+                uploaded = check_uploads(github, jira_to_github, destination)
+                check_links(github, jira_to_github)
+                check_resumed(xml_path, github, jira, destination, jira_to_github.cache_path, uploaded)
@@ -0,0 +1,33 @@
+import contextlib
+import io
+import os
+import tempfile
+
+from benchmarks import bench_migrate, generator
+from benchmarks.fake_github import FakeGitHub
+
+
+ITEMS = 250
+IMPORT_DELAY = 0.3
+POLL_INTERVAL = 0.05
+
+
+##
+# Imports staying pending are polled once per batch of submissions while
+# migrating, then until they are done
+#
+def test_pending_imports_polled_by_batch():
+    with tempfile.TemporaryDirectory() as tmp, FakeGitHub(import_delay=IMPORT_DELAY) as server:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, items=ITEMS, comments=1)
+        jira_to_github = bench_migrate.build(xml_path, server.url, 'import', 4)
+        jira_to_github.IMPORT_POLL_INTERVAL = POLL_INTERVAL
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            jira_to_github.milestones()
+            jira_to_github.labels()
+            jira_to_github.migrate()
+
+        bench_migrate.verify(server, jira_to_github)
+        assert len(jira_to_github.pending_imports) == 0
+        batches = ITEMS // jira_to_github.IMPORT_POLL_BATCH
+        assert server.import_polls <= batches + IMPORT_DELAY / POLL_INTERVAL + 2, server.import_polls
@@ -0,0 +1,90 @@
+import contextlib
+import io
+import os
+import tempfile
+
+from benchmarks import bench_jira, generator
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.fake_jira import FakeJira
+
+
+def export(tmp, items=90):
+    xml_path = os.path.join(tmp, 'export.xml')
+    generator.generate_file(xml_path, projects=2, items=items, comments=2)
+    return xml_path
+
+
+##
+# GitHub has the same issues as when migrating the xml export, and each
+# one has been linked back from Jira
+#
+def check_migrated(jira, server, expected):
+    assert bench_jira.created_issues(server, jira.url) == expected
+    assert sum(len(comments) for comments in jira.comments.values()) == len(server.issues)
+
+
+##
+# Every issue of the fake Jira has been fetched
+#
+def check_fetched(jira, jira_to_github):
+    items = sum(len(project['Issues']) for project in jira_to_github.projects.values())
+    assert items == len(jira.issues), (items, len(jira.issues))
+
+
+def migrate(jira_to_github):
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        jira_to_github.extract()
+        jira_to_github.milestones()
+        jira_to_github.labels()
+        jira_to_github.migrate()
+
+
+def test_migrate_from_jira():
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = export(tmp)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            expected = bench_jira.expected_issues(xml_path)
+
+        for jira_concurrency in [1, 4]:
+            with FakeJira(xml_path, max_results=20) as jira, FakeGitHub() as server:
+                jira_to_github = bench_jira.build(jira.url, server.url, 20, jira_concurrency, 4)
+                migrate(jira_to_github)
+                check_migrated(jira, server, expected)
+                check_fetched(jira, jira_to_github)
+
+
+##
+# Issues created in Jira while fetching are migrated on top of the total
+# announced by the first search page
+#
+def test_issues_created_while_fetching():
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = export(tmp)
+        with FakeJira(xml_path, max_results=20, created=5) as jira, FakeGitHub() as server:
+            jira_to_github = bench_jira.build(jira.url, server.url, 20, 2, 2)
+            migrate(jira_to_github)
+            assert jira_to_github.jira_total == len(jira.issues) - 5
+            check_fetched(jira, jira_to_github)
+            assert len(server.issues) == len(jira.issues)
+
+
+##
+# Reconciling waits for every issue to be fetched from Jira, so that issues
+# fetched last are also found with missing comments
+#
+def test_reconcile_fetched_issues():
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = export(tmp)
+        with FakeJira(xml_path, max_results=10) as jira, FakeGitHub() as server:
+            migrate(bench_jira.build(jira.url, server.url, 10, 1, 4))
+            for issue in server.issues.values():
+                issue['comments'].pop()
+
+            jira.latency = 0.02
+            jira_to_github = bench_jira.build(jira.url, server.url, 10, 1, 4)
+            with contextlib.redirect_stdout(io.StringIO()):
+                jira_to_github.extract()
+                jira_to_github.reconcile()
+
+            partial = sum(len(issues) for issues in jira_to_github.partial_issues.values())
+            assert partial == len(server.issues)
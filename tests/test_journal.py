@@ -0,0 +1,120 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+
+import jira2github
+from benchmarks import bench_migrate, generator
+from benchmarks.fake_github import FakeGitHub
+from jira2github.journal import Journal
+
+
+TRUNCATED = '{"op": "comment", "proj": "P0", "ke'
+
+
+def write_journal(path, records, tail=TRUNCATED):
+    with open(path, 'w', encoding='utf-8') as fp:
+        for record in records:
+            fp.write(json.dumps(record) + '\n')
+        fp.write(tail)
+
+
+def read_journal(path):
+    with open(path, encoding='utf-8') as fp:
+        return [json.loads(line) for line in fp]
+
+
+def test_replay_ignores_truncated_line():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.json.journal')
+        records = [
+            {'op': 'issue', 'proj': 'P0', 'key': 'P0-1', 'url': 'u', 'number': 1, 'comments': 0},
+            {'op': 'comment', 'proj': 'P0', 'key': 'P0-2', 'index': 0},
+        ]
+        write_journal(path, records)
+        assert list(Journal(path).replay()) == records
+
+        # Records appended after the truncated line are kept
+        journal = Journal(path)
+        journal.append({'op': 'comment', 'proj': 'P0', 'key': 'P0-2', 'index': 1})
+        journal.close()
+        assert list(Journal(path).replay())[-1]['index'] == 1
+        assert list(Journal(os.path.join(tmp, 'missing')).replay()) == []
+
+
+##
+# Loading a cache replays its journal, then compacts it into the cache
+# file, the journal only keeping partially migrated issues and imports not
+# checked yet
+#
+def test_compaction_at_startup():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, 'cache.json')
+        write_journal(cache_path + '.journal', [
+            {'op': 'issue', 'proj': 'P0', 'key': 'P0-1', 'url': 'u1', 'number': 1, 'comments': 2},
+            {'op': 'comment', 'proj': 'P0', 'key': 'P0-1', 'index': 0},
+            {'op': 'comment', 'proj': 'P0', 'key': 'P0-1', 'index': 1},
+            {'op': 'issue', 'proj': 'P0', 'key': 'P0-2', 'url': 'u2', 'number': 2, 'comments': 3},
+            {'op': 'comment', 'proj': 'P0', 'key': 'P0-2', 'index': 0},
+            {'op': 'import', 'proj': 'P1', 'key': 'P1-3', 'id': 7, 'title': '[P1-3] a', 'submitted': '2026-01-02'},
+            {'op': 'import', 'proj': 'P1', 'key': 'P1-4', 'id': 8, 'title': '[P1-4] b', 'submitted': '2026-01-02'},
+            {'op': 'imported', 'proj': 'P1', 'key': 'P1-4', 'id': 8},
+        ])
+
+        jira_to_github = jira2github.jira2github(None, 'orga', 'repo', None, None, 'token')
+        with contextlib.redirect_stdout(io.StringIO()):
+            jira_to_github.set_cache_path(cache_path)
+
+        with open(cache_path, encoding='utf-8') as fp:
+            assert json.load(fp) == {'P0': {'P0-1': 'u1', 'P0-2': 'u2'}}
+        assert read_journal(cache_path + '.journal') == [
+            {'op': 'issue', 'proj': 'P0', 'key': 'P0-2', 'url': 'u2', 'number': 2, 'comments': 3, 'posted': 1},
+            {'op': 'import', 'proj': 'P1', 'key': 'P1-3', 'id': 7, 'title': '[P1-3] a', 'submitted': '2026-01-02'},
+        ]
+        assert jira_to_github.partial_issues == {'P0': {'P0-2': {'number': 2, 'comments': 3, 'posted': 1}}}
+        assert list(jira_to_github.pending_imports) == [7]
+
+
+##
+# A run killed while posting the comments of an issue only posts the
+# missing comments of that issue when resumed
+#
+def test_resume_partial_issue():
+    with tempfile.TemporaryDirectory() as tmp, FakeGitHub() as server:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, items=6, comments=3)
+        jira_to_github = bench_migrate.build(xml_path, server.url, 'rest', 2)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            jira_to_github.milestones()
+            jira_to_github.labels()
+            jira_to_github.migrate()
+
+        # Lose the last comments of an issue and its cache entry, the
+        # journal only recording the first comment before the crash
+        record = jira_to_github.projects['P0']['Issues'][2]
+        url = jira_to_github.cached_data['P0'].pop(record.key)
+        number = int(url.rsplit('/', 1)[1])
+        server.issues[number]['comments'] = server.issues[number]['comments'][:1]
+        cache_path = os.path.join(tmp, 'resumed.json')
+        with open(cache_path, 'w', encoding='utf-8') as fp:
+            json.dump(jira_to_github.cached_data, fp)
+        write_journal(cache_path + '.journal', [
+            {'op': 'issue', 'proj': 'P0', 'key': record.key, 'url': url, 'number': number, 'comments': 3},
+            {'op': 'comment', 'proj': 'P0', 'key': record.key, 'index': 0},
+        ])
+
+        issues = len(server.issues)
+        jira_to_github = bench_migrate.build(xml_path, server.url, 'rest', 2)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            jira_to_github.set_cache_path(cache_path)
+            assert jira_to_github.partial_issues['P0'][record.key]['posted'] == 1
+            jira_to_github.milestones()
+            jira_to_github.labels()
+            jira_to_github.migrate()
+        jira_to_github.save_cache_data()
+
+        assert len(server.issues) == issues
+        bench_migrate.verify(server, jira_to_github)
+        assert not any(jira_to_github.partial_issues.values())
+        assert read_journal(cache_path + '.journal') == []
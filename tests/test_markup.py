@@ -0,0 +1,58 @@
+from jira2github.markup import JiraMarkup
+
+
+##
+# Jira markup and the expected GitHub Markdown
+#
+GOLDEN = [
+    ('h1. Title', '# Title'),
+    ('h3.Subtitle', '### Subtitle'),
+    ('Some *bold*, _italic_ and -deleted- text', 'Some **bold**, _italic_ and ~~deleted~~ text'),
+    ('+inserted+ ^sup^ ~sub~ ??cite??', '<ins>inserted</ins> <sup>sup</sup> <sub>sub</sub> <cite>cite</cite>'),
+    ('*_bold italic_*', '**_bold italic_**'),
+    ('a well-known snake_case_name, 2*3*4 and a - b - c', 'a well-known snake_case_name, 2*3*4 and a - b - c'),
+    ('* not bold*', '- not bold*'),
+    ('\\*escaped\\*', '\\*escaped\\*'),
+    ('{{monospace}} and {{with `tick`}}', '`monospace` and ``with `tick```'),
+    ('[Google|https://google.com] [http://example.com] [mailto:a@b.c]',
+     '[Google](https://google.com) <http://example.com> <mailto:a@b.c>'),
+    ('[*bold* link|http://x.y]', '[**bold** link](http://x.y)'),
+    ('[~jdoe] and [Jane|~jdoe]', 'jdoe and Jane'),
+    ('[PROJ-12] and [anchor|#top]', '[PROJ-12] and [anchor](#top)'),
+    ('!screenshot.png! and !http://x.y/a.gif|thumbnail!', '![](screenshot.png) and ![](http://x.y/a.gif)'),
+    ('Wow! Great!', 'Wow! Great!'),
+    ('{color:red}red{color} {panel:title=T}in panel{panel}', 'red in panel'),
+    ('* one\n** two\n# first\n## second\n- dash', '- one\n  - two\n1. first\n   1. second\n- dash'),
+    ('above\n----\nbelow', 'above\n---\nbelow'),
+    ('bq. quoted', '> quoted'),
+    ('{quote}\nline 1\nline 2\n{quote}\nafter', '\n> line 1\n> line 2\n\nafter'),
+    ('{code:java}\nint *a* = [x|y];\n{code}', '\n```java\nint *a* = [x|y];\n```\n'),
+    ('{code:title=A.php|language=php}\n$a = 1;\n{code}', '\n```php\n$a = 1;\n```\n'),
+    ('{noformat}\n_raw_ ```fenced```\n{noformat}', '\n````\n_raw_ ```fenced```\n````\n'),
+    ('{code}\nunclosed *code*', '\n```\nunclosed *code*\n```\n'),
+    ('intro\n||A||B||\n|[x|http://a.b]|*2*|\n|3|4|\nafter',
+     'intro\n\n| A | B |\n| --- | --- |\n| [x](http://a.b) | **2** |\n| 3 | 4 |\nafter'),
+    ('|a|b|\n|c|d|', '| | |\n| --- | --- |\n| a | b |\n| c | d |'),
+    ('<p>Hello &amp; welcome</p>', '<p>Hello &amp; welcome</p>'),
+    ('<pre class="code-bash">\n# install the deps\nHello {{ user.name }}\n</pre>',
+     '<pre class="code-bash">\n# install the deps\nHello {{ user.name }}\n</pre>'),
+    ('<div class="code panel"><div class="codeContent panelContent">\n<pre class="code-java">int *a* = [x|y];\n</pre>\n'
+     '</div></div>\n* item',
+     '<div class="code panel"><div class="codeContent panelContent">\n<pre class="code-java">int *a* = [x|y];\n</pre>\n'
+     '</div></div>\n- item'),
+    ('<p>Run <code>a *b* -c-</code> then *bold*</p>', '<p>Run <code>a *b* -c-</code> then **bold**</p>'),
+    ('<PRE>\n* kept\n</PRE>', '<PRE>\n* kept\n</PRE>'),
+    ('<pre>unclosed\n# kept', '<pre>unclosed\n# kept'),
+    ('', ''),
+]
+
+
+def test_golden():
+    markup = JiraMarkup()
+    for text, expected in GOLDEN:
+        converted = markup.convert(text)
+        assert converted == expected, (text, converted, expected)
+
+
+def test_none():
+    assert JiraMarkup().convert(None) is None
@@ -0,0 +1,74 @@
+import contextlib
+import io
+import os
+import re
+import tempfile
+
+from benchmarks import bench_migrate, generator
+from benchmarks.fake_github import FakeGitHub
+
+
+def export(tmp, items=60):
+    xml_path = os.path.join(tmp, 'export.xml')
+    generator.generate_file(xml_path, projects=2, items=items, comments=3)
+    return xml_path
+
+
+def migrate(jira_to_github):
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        jira_to_github.milestones()
+        jira_to_github.labels()
+        jira_to_github.migrate()
+
+
+def created_keys(server):
+    return [re.match(r'\[([^\]]+)\]', issue['title']).group(1) for issue in server.issues.values()]
+
+
+##
+# Concurrent workers post every issue once, with its comments in order
+#
+def test_concurrent_migration():
+    for backend in ['rest', 'import']:
+        with tempfile.TemporaryDirectory() as tmp, FakeGitHub() as server:
+            jira_to_github = bench_migrate.build(export(tmp), server.url, backend, 4)
+            migrate(jira_to_github)
+
+            bench_migrate.verify(server, jira_to_github)
+            keys = created_keys(server)
+            assert len(keys) == len(set(keys)), backend
+
+
+##
+# A 403 stops the migration, the cache keeping the issues created before so
+# that the next run creates each remaining issue once
+#
+def test_forbidden_stops_migration():
+    with tempfile.TemporaryDirectory() as tmp, FakeGitHub() as server:
+        xml_path = export(tmp)
+        jira_to_github = bench_migrate.build(xml_path, server.url, 'rest', 1)
+        keys = [record.key for project in jira_to_github.projects.values() for record in project['Issues']]
+        forbidden = keys[len(keys) // 2]
+        server.failures[forbidden] = [403]
+
+        try:
+            migrate(jira_to_github)
+        except StopIteration:
+            pass
+        else:
+            raise AssertionError('migration not stopped')
+        jira_to_github.save_cache_data()
+
+        created = created_keys(server)
+        assert 0 < len(created) < len(keys)
+        assert forbidden not in created
+        cache_path = jira_to_github.cache_path
+
+        jira_to_github = bench_migrate.build(xml_path, server.url, 'rest', 1)
+        jira_to_github.set_cache_path(cache_path)
+        cached = {key for issues in jira_to_github.cached_data.values() for key in issues}
+        assert cached == set(created)
+
+        migrate(jira_to_github)
+        created = created_keys(server)
+        assert sorted(created) == sorted(keys)
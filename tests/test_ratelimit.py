@@ -0,0 +1,166 @@
+import requests
+
+from jira2github.ratelimit import RateLimiter, TokenPool
+
+
+##
+# Clock advanced by the sleeps of the limiter
+#
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.slept.append(delay)
+        self.now += delay
+
+
+def limiter(clock, max_rate=10.0, burst=1):
+    return RateLimiter(max_rate, burst, clock.sleep, clock)
+
+
+def response(status, headers=None, text=''):
+    result = requests.Response()
+    result.status_code = status
+    result.headers.update(headers or {})
+    result._content = text.encode('utf-8')
+    return result
+
+
+def rate_headers(remaining, reset):
+    return {'X-RateLimit-Remaining': str(remaining), 'X-RateLimit-Reset': str(int(reset))}
+
+
+def test_burst_then_max_rate():
+    clock = FakeClock()
+    rate_limiter = limiter(clock, max_rate=10.0, burst=2)
+    assert rate_limiter.acquire() == 0
+    assert rate_limiter.acquire() == 0
+    assert abs(rate_limiter.acquire() - 0.1) < 1e-9
+
+
+def test_update_spreads_remaining_budget():
+    clock = FakeClock()
+    rate_limiter = limiter(clock, max_rate=10.0)
+    rate_limiter.update(rate_headers(100, clock.now + 200))
+    assert rate_limiter.rate == 0.5
+    assert rate_limiter.remaining == 100
+
+    rate_limiter.acquire()
+    assert abs(rate_limiter.acquire() - 2) < 1e-9
+    assert rate_limiter.remaining == 98
+
+    # A large budget is still paced at the maximum rate
+    rate_limiter.update(rate_headers(100000, clock.now + 200))
+    assert rate_limiter.rate == 10.0
+
+
+def test_update_without_headers():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    rate_limiter.update({})
+    assert rate_limiter.remaining is None and rate_limiter.rate == 10.0
+
+
+def test_exhausted_budget_waits_for_reset():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    reset = clock.now + 30
+    rate_limiter.update(rate_headers(0, reset))
+    assert rate_limiter.headroom() is None
+    assert rate_limiter.available_at() == reset + 1
+
+    rate_limiter.acquire()
+    assert clock.now >= reset + 1
+
+    # The budget is reset with the maximum rate
+    assert rate_limiter.headroom() is not None
+    assert rate_limiter.remaining is None and rate_limiter.rate == 10.0
+
+
+def test_backoff_retry_after():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    assert rate_limiter.backoff(response(403, {'Retry-After': '17'}), 0) == 17
+    assert rate_limiter.backoff(response(403, {'Retry-After': '0'}), 0) == 1
+    assert rate_limiter.tokens <= 0
+
+
+def test_backoff_rate_limit_reset():
+    clock = FakeClock()
+    rate_limiter = limiter(clock)
+    headers = rate_headers(0, clock.now + 42)
+    assert rate_limiter.backoff(response(403, headers), 0) == 43
+
+
+def test_backoff_exponential():
+    rate_limiter = limiter(FakeClock())
+    assert rate_limiter.backoff(response(403), 0) == RateLimiter.BACKOFF_BASE
+    assert rate_limiter.backoff(response(403), 1) == RateLimiter.BACKOFF_BASE * 2
+    assert rate_limiter.backoff(response(403), 10) == RateLimiter.BACKOFF_MAX
+
+
+def test_is_limited():
+    rate_limiter = limiter(FakeClock())
+    assert rate_limiter.is_limited(response(403, {'Retry-After': '60'}))
+    assert rate_limiter.is_limited(response(403, rate_headers(0, 2000)))
+    assert rate_limiter.is_limited(response(403, text='{"message": "You have exceeded a secondary rate limit"}'))
+    assert rate_limiter.is_limited(response(429, {'Retry-After': '1'}))
+
+    # Permission errors are not rate limits
+    assert not rate_limiter.is_limited(response(403, rate_headers(4000, 2000), '{"message": "Must have admin rights"}'))
+    assert not rate_limiter.is_limited(response(404, {'Retry-After': '60'}))
+
+
+def pool(clock, tokens):
+    return TokenPool(tokens, 10.0, 1, clock.sleep, clock)
+
+
+def test_pool_selects_most_headroom():
+    clock = FakeClock()
+    token_pool = pool(clock, ['a', 'b', 'c'])
+    limiters = dict(token_pool.limiters)
+    limiters['a'].update(rate_headers(100, clock.now + 600))
+    limiters['b'].update(rate_headers(3000, clock.now + 600))
+    limiters['c'].update(rate_headers(500, clock.now + 600))
+    assert token_pool.select()[0] == 'b'
+
+    # Tokens with the same budget are routed by their bucket tokens
+    limiters['c'].update(rate_headers(3000, clock.now + 600))
+    limiters['b'].acquire()
+    assert token_pool.select()[0] == 'c'
+
+
+def test_pool_skips_parked_and_exhausted_tokens():
+    clock = FakeClock()
+    token_pool = pool(clock, ['a', 'b', 'c'])
+    limiters = dict(token_pool.limiters)
+    limiters['a'].update(rate_headers(0, clock.now + 600))
+    limiters['b'].park(clock.now + 60)
+    assert token_pool.select()[0] == 'c'
+    assert token_pool.available()
+
+    # A parked token is used again once its delay is over
+    limiters['c'].update(rate_headers(0, clock.now + 600))
+    clock.now += 61
+    assert token_pool.select()[0] == 'b'
+
+
+def test_pool_falls_back_to_earliest_available():
+    clock = FakeClock()
+    token_pool = pool(clock, ['a', 'b', 'c'])
+    limiters = dict(token_pool.limiters)
+    limiters['a'].update(rate_headers(0, clock.now + 600))
+    limiters['b'].park(clock.now + 120)
+    limiters['c'].update(rate_headers(0, clock.now + 300))
+    assert not token_pool.available()
+
+    token, rate_limiter = token_pool.select()
+    assert token == 'b'
+    rate_limiter.acquire()
+    assert clock.slept[-1] == 120
@@ -0,0 +1,90 @@
+import os
+import tempfile
+
+import jira2github
+from benchmarks import bench_migrate, generator
+from benchmarks.fake_github import FakeGitHub
+
+
+REFERENCES = {
+    'PROJ-1': '#1',
+    'PROJ-2': '#2',
+    'OTHER-3': '[OTHER-3](https://github.com/orga/other/issues/3)',
+}
+
+
+##
+# Texts mentioning Jira keys and their expected rewrite
+#
+GOLDEN = [
+    ('Duplicates PROJ-1', 'Duplicates #1'),
+    ('PROJ-1, PROJ-2.', '#1, #2.'),
+    ('(PROJ-2) and [PROJ-1]', '(#2) and [#1]'),
+    ('see OTHER-3', 'see [OTHER-3](https://github.com/orga/other/issues/3)'),
+    ('`PROJ-1` and\n```\nPROJ-2\n```', '`PROJ-1` and\n```\nPROJ-2\n```'),
+    ('https://jira.example.com/browse/PROJ-1 and [PROJ-1](http://x.y)',
+     'https://jira.example.com/browse/PROJ-1 and [PROJ-1](http://x.y)'),
+    ('a/PROJ-1 #PROJ-1 ?q=PROJ-1', 'a/PROJ-1 #PROJ-1 ?q=PROJ-1'),
+    ('PROJ-10 UNKNOWN-1 MYPROJ-1 PROJ-1-2 PROJ-1x', 'PROJ-10 UNKNOWN-1 MYPROJ-1 PROJ-1-2 PROJ-1x'),
+    ('', ''),
+]
+
+
+##
+# Rewrite references added to the issues and comments of a migration,
+# checking that only changed bodies are updated, and only once
+#
+def rewrite_migration(xml_path, concurrency):
+    with FakeGitHub() as server:
+        jira_to_github = bench_migrate.build(xml_path, server.url, 'rest', concurrency)
+        jira_to_github.milestones()
+        jira_to_github.labels()
+        jira_to_github.migrate()
+
+        numbers = {
+            key: url.rsplit('/', 1)[1]
+            for issues in jira_to_github.cached_data.values()
+            for key, url in issues.items()
+        }
+        keys = sorted(numbers)
+        expected = {}
+        changed = 0
+        for number, issue in server.issues.items():
+            key = keys[number % len(keys)]
+            mention = '\n\nDuplicates {}, not `{}` nor {}/browse/{} nor UNKNOWN-1.'.format(
+                key, key, generator.JIRA_URL, key
+            )
+            issue['body'] += mention
+            expected[number] = issue['body'].replace('Duplicates ' + key, 'Duplicates #' + numbers[key])
+            changed += 1
+            if issue['comments']:
+                issue['comments'][0] += '\n\n{} and {} are related'.format(key, keys[0])
+                changed += 1
+
+        jira_to_github.rewrite_references()
+        assert server.patches == changed, (server.patches, changed)
+        for number, issue in server.issues.items():
+            assert issue['body'] == expected[number], issue['body']
+            if issue['comments']:
+                assert issue['comments'][0].endswith(
+                    '#{} and #{} are related'.format(numbers[keys[number % len(keys)]], numbers[keys[0]])
+                ), issue['comments'][0]
+
+        jira_to_github.rewrite_references()
+        assert server.patches == changed, 'references rewritten twice'
+
+    return changed
+
+
+def test_golden():
+    jira_to_github = jira2github.jira2github(None, 'orga', 'repo', None, None, 'token')
+    for text, expected in GOLDEN:
+        rewritten = jira_to_github._rewrite_references(text, REFERENCES)
+        assert rewritten == expected, (text, rewritten, expected)
+
+
+def test_rewrite_migration():
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = os.path.join(tmp, 'export.xml')
+        generator.generate_file(xml_path, projects=2, items=20, comments=2)
+        assert rewrite_migration(xml_path, 2) > 0
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+
+from benchmarks import bench_retry, generator
+from benchmarks.fake_github import FakeGitHub
+
+
+##
+# Inject failures into the creation of some issues: most of them succeed at
+# the first or second retry, some are invalid, and one never succeeds.
+# Return the failed, invalid and lasting keys.
+#
+def inject_failures(server, keys, failures, seed):
+    failed = random.Random(seed).sample(keys, failures)
+    invalid = failed[:max(1, failures // 10)]
+    lasting = failed[len(invalid)]
+    for index, key in enumerate(failed):
+        if key in invalid:
+            server.failures[key] = [422] * 10
+        elif key == lasting:
+            server.failures[key] = [502] * 10
+        else:
+            server.failures[key] = [502] if index % 2 else [502, 503]
+
+    return failed, invalid, lasting
+
+
+##
+# Only transient errors have been retried, the errors file keeping the
+# remaining errors with their attempts
+#
+def check_retried(server, jira_to_github, keys, invalid, lasting):
+    assert len(server.issues) == len(keys) - len(invalid) - 1, len(server.issues)
+    for key in invalid:
+        assert len(server.failures[key]) == 9, 'invalid issue {} retried'.format(key)
+    assert len(server.failures[lasting]) == 10 - 1 - jira_to_github.RETRY_ROUNDS
+
+    with open(jira_to_github.errors_path, encoding='utf-8') as fp:
+        errors = {error['issue']['key']: error for error in json.load(fp)['github']}
+    assert set(errors) == set(invalid) | {lasting}, sorted(errors)
+    assert all(errors[key]['attempts'] == 1 and not errors[key]['transient'] for key in invalid)
+    assert errors[lasting]['attempts'] == 1 + jira_to_github.RETRY_ROUNDS and errors[lasting]['transient']
+
+
+def run(jira_to_github, phase):
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        jira_to_github.milestones()
+        jira_to_github.labels()
+        getattr(jira_to_github, phase)()
+        jira_to_github.save_errors_data()
+
+
+def test_retry_errors():
+    with tempfile.TemporaryDirectory() as tmp, FakeGitHub() as server:
+        xml_path = os.path.join(tmp, 'export.xml')
+        errors_path = os.path.join(tmp, 'errors.json')
+        generator.generate_file(xml_path, items=60, comments=1)
+        jira_to_github = bench_retry.build(xml_path, server, 2, errors_path, 0.01)
+        keys = sorted(record.key for project in jira_to_github.projects.values() for record in project['Issues'])
+        failed, invalid, lasting = inject_failures(server, keys, 10, 42)
+
+        run(jira_to_github, 'migrate')
+        jira_to_github.save_cache_data()
+        assert len(server.issues) == len(keys) - len(failed), len(server.issues)
+
+        jira_to_github = bench_retry.build(xml_path, server, 2, errors_path, 0.01)
+        run(jira_to_github, 'retry_errors')
+        check_retried(server, jira_to_github, keys, invalid, lasting)
+
+
+##
+# A 403 is only retried when its response was rate limited
+#
+def test_forbidden_errors():
+    with tempfile.TemporaryDirectory() as tmp, FakeGitHub() as server:
+        xml_path = os.path.join(tmp, 'export.xml')
+        errors_path = os.path.join(tmp, 'errors.json')
+        generator.generate_file(xml_path, items=3, comments=0)
+        jira_to_github = bench_retry.build(xml_path, server, 1, errors_path, 0.01)
+        limited, denied, invalid = sorted(record.key for record in jira_to_github.projects['P0']['Issues'])
+        with open(errors_path, 'w', encoding='utf-8') as fp:
+            json.dump({'milestone': [], 'github': [
+                {'issue': {'key': limited}, 'result': {}, 'status': 403, 'rate_limited': True},
+                {'issue': {'key': denied}, 'result': {}, 'status': 403, 'rate_limited': False},
+                {'issue': {'key': invalid}, 'result': {}, 'status': 422},
+            ]}, fp)
+
+        run(jira_to_github, 'retry_errors')
+
+        assert [issue['title'].split(']')[0][1:] for issue in server.issues.values()] == [limited]
+        with open(errors_path, encoding='utf-8') as fp:
+            errors = {error['issue']['key']: error for error in json.load(fp)['github']}
+        assert set(errors) == {denied, invalid}